@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+"""Aggregates command activity across participants and draws it as small multiples.
+
+Every participant's commands are classified into the EventLine lanes and counted
+per time bin, giving a participant x lane x time-bin table of counts. The data
+for each participant is parsed once and reused by every chart.
+
+Output:
+
+- An SVG file with one heatmap per participant, stacked, ex: activity.svg"""
+
+import os
+from array import array
+
+import svgwrite
+
+from events import DataLoader, PairClassifier, PARTICIPANTS
+from timeline_ift_forks import EventLine, Timeline
+
+
+class CommandActivity(object):
+    """Counts of commands per participant, EventLine lane and time bin.
+
+    The counts for each participant are kept in one flat array, lane-major, so that
+    count(p, lane, b) is counts[p][lane * bins + b]. Time bins start at the
+    participant's first coded segment."""
+
+    BIN_SECONDS = Timeline.SQUARE_WIDTH
+
+    def __init__(self, bin_seconds=BIN_SECONDS):
+        self.bin_seconds = bin_seconds
+        self.lanes = [k for k in EventLine.LANE.keys()]
+        self.participants = []
+        self.bins = {}
+        self.counts = {}
+
+        # The index in lanes of a command's lane, found once per (Command, EclipseCommand) pair.
+        lane_index = dict((k, i) for i, k in enumerate(self.lanes))
+        self._lane = PairClassifier(lambda event: lane_index.get(EventLine.classify(event)))
+
+    def add(self, pid, coded_events, commands):
+        """Counts one participant's commands. Commands before the first coded segment are left out,
+        and a participant without coded segments or commands is not counted at all."""
+        if not coded_events or not commands:
+            return
+        start = coded_events[0]['Time']
+        seconds = [(c['Time'] - start).total_seconds() for c in commands]
+        lanes = [self._lane(c) for c in commands]
+
+        bins = int(len(coded_events) * Timeline.SQUARE_WIDTH / self.bin_seconds) + 1
+        counts = array('l', [0]) * (len(self.lanes) * bins)
+        bin_seconds = float(self.bin_seconds)
+
+        for s, lane in zip(seconds, lanes):
+            if lane is not None and s >= 0:
+                b = int(s / bin_seconds)
+                if b < bins:
+                    counts[lane * bins + b] += 1
+
+        if pid not in self.counts:
+            self.participants.append(pid)
+        self.bins[pid] = bins
+        self.counts[pid] = counts
+
+    def count(self, pid, lane, b):
+        return self.counts[pid][self.lanes.index(lane) * self.bins[pid] + b]
+
+    def lane_counts(self, pid, lane):
+        """The counts of one lane for one participant, one per bin."""
+        bins = self.bins[pid]
+        i = self.lanes.index(lane)
+        return self.counts[pid][i * bins: (i + 1) * bins]
+
+    def lane_maximums(self):
+        """The largest count in any bin for each lane, over all participants."""
+        maximums = [0] * len(self.lanes)
+        for pid in self.participants:
+            bins = self.bins[pid]
+            counts = self.counts[pid]
+            for i in range(len(self.lanes)):
+                maximums[i] = max(maximums[i], max(counts[i * bins: (i + 1) * bins] or [0]))
+        return maximums
+
+    @staticmethod
+    def from_participants(participants, bin_seconds=BIN_SECONDS):
+        activity = CommandActivity(bin_seconds)
+        for p in participants:
+            activity.add(p, DataLoader.load_codedevents(p), DataLoader.load_commands(p))
+        return activity
+
+
+class ActivityChart(object):
+    """Draws a CommandActivity as one heatmap per participant, stacked vertically.
+
+    Each lane is a row of cells, one per time bin, in the lane's EventLine color. A cell's
+    opacity is its count relative to the busiest bin of that lane over all participants,
+    so the heatmaps can be compared with each other. Empty cells are not drawn."""
+
+    CELL_WIDTH = 4
+    LANE_HEIGHT = 3
+    GAP = 12
+
+    def __init__(self, activity, filename):
+        self.activity = activity
+        self.multiple_height = len(activity.lanes) * ActivityChart.LANE_HEIGHT + ActivityChart.GAP
+
+        width = Timeline.X_OFFSET + ActivityChart.CELL_WIDTH * max(activity.bins.values() or [0]) + Timeline.X_MARGIN
+        height = Timeline.Y_OFFSET + self.multiple_height * len(activity.participants)
+        self.svg = svgwrite.Drawing(filename=filename, size=("%dpx" % width, "%dpx" % height))
+
+    def _draw_multiple(self, pid, top, maximums):
+        activity = self.activity
+        bins = activity.bins[pid]
+        counts = activity.counts[pid]
+
+        group = self.svg.g()
+        for i, lane in enumerate(activity.lanes):
+            if not maximums[i]:
+                continue
+            y = top + i * ActivityChart.LANE_HEIGHT
+            lane_group = self.svg.g(fill=EventLine.COLOR[lane])
+            for b in range(bins):
+                n = counts[i * bins + b]
+                if n:
+                    lane_group.add(self.svg.rect(
+                        insert=(Timeline.X_OFFSET + b * ActivityChart.CELL_WIDTH, y),
+                        size=(ActivityChart.CELL_WIDTH, ActivityChart.LANE_HEIGHT),
+                        opacity="%.2f" % (float(n) / maximums[i])))
+            group.add(lane_group)
+
+        group.add(self.svg.text("P%02d" % pid,
+            insert=(0, top + ActivityChart.LANE_HEIGHT * len(activity.lanes) / 2),
+            font_family="sans-serif",
+            font_size="10"))
+        self.svg.add(group)
+
+    def draw(self):
+        maximums = self.activity.lane_maximums()
+
+        top = Timeline.Y_OFFSET
+        for pid in self.activity.participants:
+            self._draw_multiple(pid, top, maximums)
+            top += self.multiple_height
+
+        self.svg.save()
+
+
+if __name__ == "__main__":
+    participants = PARTICIPANTS
+
+    activity = CommandActivity.from_participants(participants)
+    ActivityChart(activity, os.path.join(Timeline.OUTPUT_DIR, "activity.svg")).draw()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+
+"""One command line for the timelines and the tables made from the participants' data.
+
+    python cli.py render [participants] [--format svg|svgz|png|json] [--commands | --density] [--watch]
+    python cli.py export [participants] [--what forks features patches methods sequences segments activity overview]
+    python cli.py stats [participants]
+    python cli.py bench [participants] [--repeat N]
+    python cli.py --db timeline.db stats [participants]
+
+Participants are numbers and ranges, ex: 2 3 5-8, and default to every participant.
+Each subcommand imports only the modules it needs, so --help and stats start quickly:
+svgwrite, for one, is only loaded to write SVG.
+
+Output:
+
+- render: a timeline of each participant, ex: 02-forks.svg, 02-forks.svgz, 02-forks.png
+- export: fork_outcomes.txt and .json, feature_cooccurrence.txt, patches.txt and .json,
+  method_visits.txt and .json, method_transitions.txt, command_sequences.txt, segments.txt,
+  activity.svg, overview.svg and .png
+- stats and bench: a tab-separated table on standard output"""
+
+import os
+import sys
+import time
+import argparse
+
+from events import PARTICIPANTS
+
+
+def participant_list(values):
+    """The participants named by values such as '2', '5-8' or '2,3', in order, without repeats."""
+    participants = []
+    for value in values:
+        for part in value.split(','):
+            if '-' in part:
+                first, last = part.split('-', 1)
+                numbers = range(int(first), int(last) + 1)
+            else:
+                numbers = [int(part)]
+            participants.extend(p for p in numbers if p not in participants)
+    return participants or list(PARTICIPANTS)
+
+
+def _load(participants, classify=None):
+    """ParticipantData for each participant that loads, printing why the others don't."""
+    from events import ParticipantData
+    loaded = []
+    for p in participants:
+        try:
+            loaded.append(ParticipantData.load(p, classify))
+        except IOError, e:
+            print >> sys.stderr, "Could not load P%02d: %s" % (p, e)
+    return loaded
+
+
+def render(args):
+    from timeline_ift_forks import EventLine, Timeline, TimelineWatcher, BatchRenderer
+
+    if args.watch:
+        TimelineWatcher(args.participants[0]).run()
+        return
+
+    sections = Timeline.default_sections
+    if args.commands:
+        sections = Timeline.live_sections
+    elif args.density:
+        sections = Timeline.density_sections
+    if args.format in ('svg', 'svgz'):
+        level = args.level if args.level is not None else Timeline.COMPRESS_LEVEL
+        errors = BatchRenderer(args.participants, prefetch=2, writer=True, extension='.' + args.format,
+            level=level, sections=sections).run()
+        return 1 if errors else 0
+
+    loaded = _load(args.participants, EventLine.classify)
+    for data in loaded:
+        timeline = Timeline.from_data(data, sections=sections())
+        timeline.lay_out()
+        filename = os.path.splitext(timeline.filename)[0] + '.' + args.format
+        if args.format == 'png':
+            timeline.save_png(filename, scale=args.scale)
+        else:
+            timeline.save_layout(filename)
+    return 1 if len(loaded) < len(args.participants) else 0
+
+
+def export(args):
+    from timeline_ift_forks import EventLine, Timeline
+    output_dir = Timeline.OUTPUT_DIR
+    loaded = _load(args.participants, EventLine.classify)
+
+    if 'forks' in args.what:
+        from fork_outcomes import ForkTable
+        table = ForkTable.from_data(loaded)
+        table.write_tab(os.path.join(output_dir, "fork_outcomes.txt"))
+        table.write_json(os.path.join(output_dir, "fork_outcomes.json"))
+
+    if 'features' in args.what:
+        from feature_types import FeatureTypeCooccurrence
+        FeatureTypeCooccurrence.from_data(loaded).write_tab(os.path.join(output_dir, "feature_cooccurrence.txt"))
+
+    if 'patches' in args.what:
+        from patches import PatchTable
+        table = PatchTable.from_data(loaded)
+        table.write_tab(os.path.join(output_dir, "patches.txt"))
+        table.write_json(os.path.join(output_dir, "patches.json"))
+
+    if 'methods' in args.what:
+        from method_visits import MethodVisits
+        visits = MethodVisits.from_data(loaded)
+        visits.write_tab(os.path.join(output_dir, "method_visits.txt"))
+        visits.write_transitions(os.path.join(output_dir, "method_transitions.txt"))
+        visits.write_json(os.path.join(output_dir, "method_visits.json"))
+
+    if 'sequences' in args.what:
+        from command_sequences import CommandSequences
+        sequences = CommandSequences.from_data(loaded, max_n=args.length, gap=args.gap)
+        sequences.write_tab(os.path.join(output_dir, "command_sequences.txt"))
+
+    if 'segments' in args.what:
+        from events import SegmentTable
+        with open(os.path.join(output_dir, "segments.txt"), 'w') as f:
+            f.write('\t'.join(['participant'] + SegmentTable.COLUMNS) + '\n')
+            for data in loaded:
+                for row in data.segment_table().rows():
+                    f.write('\t'.join(str(v) for v in (data.pid,) + row) + '\n')
+
+    if 'activity' in args.what:
+        from aggregate import CommandActivity, ActivityChart
+        activity = CommandActivity()
+        for data in loaded:
+            activity.add(data.pid, data.coded_events, data.commands)
+        ActivityChart(activity, os.path.join(output_dir, "activity.svg")).draw()
+
+    if 'overview' in args.what:
+        from overview import OverviewSheet
+        sheet = OverviewSheet.from_data(loaded)
+        sheet.save_svg(os.path.join(output_dir, "overview.svg"))
+        sheet.save_png(os.path.join(output_dir, "overview.png"))
+
+
+STATS_COLUMNS = ['participant', 'segments', 'foraging', 'forks', 'features', 'commands', 'minutes', 'commands_per_minute']
+
+
+def stats(args):
+    from fork_outcomes import ForkTable
+    print '\t'.join(STATS_COLUMNS)
+    for data in _load(args.participants):
+        events = data.coded_events
+        minutes = 0.0
+        if events and data.commands:
+            minutes = (data.commands[-1]['Time'] - events[0]['Time']).total_seconds() / 60
+        row = [
+            "P%02d" % data.pid,
+            len(events),
+            sum(1 for e in events if e['Foraging']),
+            sum(1 for fork in data.forks() if fork.name not in ForkTable.NOT_FORKS),
+            len(data.features),
+            len(data.commands),
+            "%.1f" % minutes,
+            "%.1f" % (len(data.commands) / minutes if minutes > 0 else 0)]
+        print '\t'.join(str(v) for v in row)
+
+
+BENCH_COLUMNS = ['participant', 'load_ms', 'lay_out_ms', 'svg_ms', 'png_ms']
+
+
+def bench(args):
+    from events import ParticipantData
+    from layout import write_svg
+    from timeline_ift_forks import EventLine, Timeline
+
+    def best(function):
+        """The fastest of args.repeat runs of function, in milliseconds, and its last result."""
+        times = []
+        for i in range(args.repeat):
+            start = time.time()
+            result = function()
+            times.append(time.time() - start)
+        return "%.1f" % (min(times) * 1000), result
+
+    def lay_out(data):
+        timeline = Timeline.from_data(data)
+        timeline.lay_out()
+        return timeline
+
+    def svg(data):
+        # A new timeline each time, so the SVG is the one that render writes.
+        timeline = Timeline.from_data(data)
+        timeline.render()
+        with open(os.devnull, 'wb') as f:
+            write_svg(timeline.svg_timeline, f)
+
+    def png(timeline):
+        timeline.save_png(os.devnull)
+
+    print '\t'.join(BENCH_COLUMNS)
+    for p in args.participants:
+        try:
+            load_ms, data = best(lambda: ParticipantData.load(p, EventLine.classify))
+        except IOError, e:
+            print >> sys.stderr, "Could not load P%02d: %s" % (p, e)
+            continue
+        lay_out_ms, timeline = best(lambda: lay_out(data))
+        svg_ms, ignored = best(lambda: svg(data))
+        png_ms, ignored = best(lambda: png(timeline))
+        print '\t'.join(["P%02d" % p, load_ms, lay_out_ms, svg_ms, png_ms])
+
+
+def parser():
+    parser = argparse.ArgumentParser(description="Timelines of the participants' information foraging sessions.")
+    parser.add_argument('--db', metavar='FILE', help="load the participants from a database made by sqlite_store.py")
+    subcommands = parser.add_subparsers()
+
+    def subcommand(name, function, help):
+        sub = subcommands.add_parser(name, help=help)
+        sub.add_argument('participants', nargs='*', help="participants, ex: 2 3 5-8 (default: all)")
+        sub.set_defaults(function=function)
+        return sub
+
+    sub = subcommand('render', render, "draw each participant's timeline")
+    sub.add_argument('--format', choices=['svg', 'svgz', 'png', 'json'], default='svg')
+    sub.add_argument('--level', type=int, help="gzip level of svgz files, 1-9 (default: Timeline.COMPRESS_LEVEL)")
+    sub.add_argument('--scale', type=float, default=0.5, help="size of png files relative to the svg")
+    lanes = sub.add_mutually_exclusive_group()
+    lanes.add_argument('--commands', action='store_true', help="draw a line per command in place of feature types")
+    lanes.add_argument('--density', action='store_true', help="draw a heatmap of commands per kind")
+    sub.add_argument('--watch', action='store_true', help="grow the timeline of the first participant's session as it goes on")
+
+    sub = subcommand('export', export, "write the tables and charts over all participants")
+    sub.add_argument('--what', nargs='+', choices=['forks', 'features', 'patches', 'methods', 'sequences', 'segments', 'activity', 'overview'],
+        default=['forks', 'features', 'patches', 'methods', 'sequences', 'segments', 'activity', 'overview'])
+    sub.add_argument('--length', type=int, default=4, help="longest command sequence to count")
+    sub.add_argument('--gap', type=float, default=30, help="most seconds between commands of a sequence")
+
+    subcommand('stats', stats, "print a table of counts per participant")
+
+    sub = subcommand('bench', bench, "print how long each stage takes per participant")
+    sub.add_argument('--repeat', type=int, default=3)
+    return parser
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    args.participants = participant_list(args.participants)
+    if args.db:
+        from events import DataLoader
+        from sqlite_store import SQLiteBackend
+        DataLoader.backend = SQLiteBackend(args.db)
+    return args.function(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,7 +3,7 @@
 """Takes Copy&Paste data from Excel and 
 exports a tab file for .import into SQLite"""
 
-from events import DataLoader
+from events import DataLoader, PARTICIPANTS
 
 def export_sqlite_csv(p, events):
     for ev in events:
@@ -11,8 +11,7 @@ def export_sqlite_csv(p, events):
 
 
 if __name__== "__main__":
-    participants = [2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12] # P11 has incomplete commands data
-    # participants = [2]
+    participants = PARTICIPANTS
 
     for p in participants:
         export_sqlite_csv(p, DataLoader.load_codedevents(p))
\ No newline at end of file
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+
+"""Finds the command sequences that participants used most, such as
+open call hierarchy > find next > file open.
+
+Each command becomes an integer code: its Eclipse command id for Eclipse commands,
+its Command otherwise, or any other token function such as EventLine.classify.
+Every n-gram up to max_n commands is counted in one pass, keyed by a rolling hash of
+its codes, so no tuple is made per n-gram. Commands more than gap seconds apart don't
+start a sequence together. The counts are kept per participant, for foraging and other
+segments, and over everyone.
+
+Each count table holds at most capacity sequences: when it is full, the less frequent
+half is dropped. The top sequences of a long stream are kept, with their counts at
+most what was dropped along the way, and memory stays bounded.
+
+Output:
+
+- A tab-separated file of the top sequences of each group, ex: command_sequences.txt"""
+
+import os
+from collections import Counter
+from itertools import izip
+
+from events import DataLoader, StringCodes, PairClassifier, ParticipantData, ParticipantTable, PARTICIPANTS
+from timeline_ift_forks import Timeline
+
+
+# The base and modulus of the rolling hash. The modulus is the Mersenne prime 2**61 - 1.
+BASE = 1000003
+MODULUS = (1 << 61) - 1
+
+
+def command_name(command):
+    if command['Command'] == 'EclipseCommand':
+        return command['EclipseCommand']
+    return command['Command']
+
+
+class SequenceCounts(object):
+    """Counts of n-grams by hash, with the codes of each, pruned to capacity entries."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = Counter()
+        self.codes = {}
+
+    def add(self, key, codes, count=1):
+        self.counts[key] += count
+        if key not in self.codes:
+            self.codes[key] = codes
+            if len(self.codes) > self.capacity:
+                self._prune()
+
+    def _prune(self):
+        kept = self.counts.most_common(self.capacity // 2)
+        self.counts = Counter(dict(kept))
+        self.codes = dict((key, self.codes[key]) for key, n in kept)
+
+    def top(self, k, n=None):
+        """The k most frequent (codes, count), of length n or of any length."""
+        found = []
+        for key, count in self.counts.most_common():
+            codes = self.codes[key]
+            if n is None or len(codes) == n:
+                found.append((codes, count))
+                if len(found) == k:
+                    break
+        return found
+
+
+class CommandSequences(ParticipantTable):
+    """The n-gram counts of every participant's commands, in groups: the participant's
+    number, 'foraging' and 'other' for the segment the sequence starts in, and 'all'.
+    Sequences that start outside every segment's 30 seconds count as 'other'.
+    They are counts rather than columns, so it writes them with its own write_tab."""
+
+    def __init__(self, max_n=3, gap=None, token=command_name, capacity=100000):
+        self.max_n = max_n
+        self.gap = gap
+        self.token = token
+        self.capacity = capacity
+        self.names = StringCodes()
+        self.groups = {}
+        # The code of a command's token, found once per (Command, EclipseCommand) pair.
+        self._code = PairClassifier(lambda command: self.names.code(self.token(command)))
+
+    def _group(self, name):
+        if name not in self.groups:
+            self.groups[name] = SequenceCounts(self.capacity)
+        return self.groups[name]
+
+    def add(self, data):
+        """Counts the n-grams of a ParticipantData. Commands whose token is None are left out."""
+        pid, commands = data.pid, data.commands
+        foraging = data.segment_table().foraging
+        width = self.max_n + 1
+
+        # Counted first by hash and whether the sequence starts in a foraging segment, then
+        # added to the groups once.
+        local = SequenceCounts(self.capacity)
+        window = [] # The codes since the last gap, and whether each is in a foraging segment
+        in_foraging = []
+        hashes = [] # hashes[n - 1] is the hash of the n-gram that ends at the latest command
+        last_time = None
+        for command, segment in izip(commands, data.command_segments()):
+            code = self._code(command)
+            if self.names.values[code] is None:
+                continue
+            t = command['Time']
+            if last_time is not None and self.gap is not None and (t - last_time).total_seconds() > self.gap:
+                window, in_foraging, hashes = [], [], []
+            last_time = t
+            window.append(code)
+            in_foraging.append(1 if segment >= 0 and foraging[segment] else 0)
+            if len(window) > self.max_n:
+                del window[0], in_foraging[0]
+            hashes = [code + 1] + [(h * BASE + code + 1) % MODULUS for h in hashes[0:self.max_n - 1]]
+
+            counts = local.counts
+            for n, h in enumerate(hashes, 1):
+                key = (h * width + n) * 2 + in_foraging[-n]
+                counts[key] += 1
+                if key not in local.codes:
+                    local.add(key, tuple(window[-n:]), 0)
+                    counts = local.counts # A new table when it was pruned
+
+        groups = [self._group(pid), self._group('all')]
+        in_segment = [self._group('other'), self._group('foraging')]
+        for key, count in local.counts.iteritems():
+            codes = local.codes[key]
+            for group in groups + [in_segment[key & 1]]:
+                group.add(key >> 1, codes, count)
+
+    @staticmethod
+    def load(p):
+        return ParticipantData(p, DataLoader.load_codedevents(p), DataLoader.load_commands(p), [])
+
+    def top(self, group, k=20, n=None):
+        """The k most frequent sequences of a group, of length n or of any length, as (names, count)."""
+        if group not in self.groups:
+            return []
+        values = self.names.values
+        return [(tuple(values[c] for c in codes), count) for codes, count in self.groups[group].top(k, n)]
+
+    def write_tab(self, filename, k=20):
+        """The top k sequences of each length in each group."""
+        groups = sorted(g for g in self.groups if not isinstance(g, str)) + ['foraging', 'other', 'all']
+        with open(filename, 'w') as f:
+            f.write('group\tlength\tcount\tsequence\n')
+            for group in groups:
+                for n in range(2, self.max_n + 1):
+                    for names, count in self.top(group, k, n):
+                        f.write("%s\t%d\t%d\t%s\n" % (group, n, count, ' > '.join(names)))
+
+
+if __name__ == "__main__":
+    participants = PARTICIPANTS
+    output_dir = Timeline.OUTPUT_DIR
+
+    sequences = CommandSequences.from_participants(participants, max_n=4, gap=30)
+    sequences.write_tab(os.path.join(output_dir, "command_sequences.txt"))
@@ -1,8 +1,19 @@
 #!/usr/bin/env python
 
 import os
-from collections import OrderedDict
-from datetime import time, datetime, date
+import re
+import mmap
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict
+from datetime import time, datetime, date, timedelta
+from array import array
+from itertools import izip
+
+# The length of a coded segment, in seconds.
+SEGMENT_SECONDS = 30
+
+# The participants whose sessions were coded. P11 has incomplete commands data.
+PARTICIPANTS = [2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
 
 
 class ForkException(Exception):
@@ -11,32 +22,242 @@ class ForkException(Exception):
 
 class VideoTime:
     @staticmethod
-    def convert_to_timestamp(video_time_stamp):
+    def convert_to_timestamp(video_time_stamp, day=None):
         (minute, s) = video_time_stamp.split(':')
 
+        # Use today's date as a placeholder for creating a datetime object for time subtraction
+        if day is None:
+            day = date.today()
+
         try:
             (second, millisecond) = s.split('.')
-            # Use today's date as a placeholder for creating a datetime object for time subtraction
-            return datetime.combine(date.today(), time(0, int(minute), int(second), int(millisecond) * 1000))
+            return datetime.combine(day, time(0, int(minute), int(second), int(millisecond) * 1000))
         except ValueError:
             second = s
-            return datetime.combine(date.today(), time(0, int(minute), int(second), int(0) * 1000))
-
-
-class Command:
-    def __init__(self, line):
-
-        fields = ['Participant',
-            'CommandID',
-            'Time',
-            'Command',
-            'ActiveFile',
-            'ASTMethod',
-            'EclipseCommand',
-            'Find',
-            'Replace',
-            'DocOffset',
-            'LineOfCode']
+            return datetime.combine(day, time(0, int(minute), int(second), int(0) * 1000))
+
+    @staticmethod
+    def converter():
+        """A one-argument converter for a whole column of timestamps that looks up the
+        placeholder date only once."""
+        day = date.today()
+        return lambda video_time_stamp: VideoTime.convert_to_timestamp(video_time_stamp, day)
+
+
+class ParseReport(object):
+    """Collects the rows that could not be converted while loading a file, and the rows
+    that were kept but had to be padded with empty fields.
+
+    Each error is a (line_number, field, message) tuple. Line numbers are 1-based
+    and count the header rows, so they match what an editor shows."""
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.errors = []
+        self.padded = []
+
+    def add(self, line_number, field, message):
+        self.errors.append((line_number, field, message))
+
+    def add_padded(self, line_number, message):
+        self.padded.append((line_number, 'row', message))
+
+    def lines(self):
+        return sorted(set(e[0] for e in self.errors))
+
+    def padded_lines(self):
+        return sorted(set(e[0] for e in self.padded))
+
+    def __len__(self):
+        return len(self.errors) + len(self.padded)
+
+    def __iter__(self):
+        """The errors and padded rows, in line order, as counted by len()."""
+        return iter(sorted(self.errors + self.padded))
+
+    @staticmethod
+    def _count(lines, what):
+        shown = ', '.join(str(n) for n in lines[0:10])
+        if len(lines) > 10:
+            shown += ', ...'
+        return "%d rows %s (lines %s)" % (len(lines), what, shown)
+
+    def __str__(self):
+        counts = []
+        if self.errors or not self.padded:
+            counts.append(ParseReport._count(self.lines(), 'skipped'))
+        if self.padded:
+            counts.append(ParseReport._count(self.padded_lines(), 'padded'))
+        return "%s: %s" % (os.path.basename(self.filename or ''), ', '.join(counts))
+
+    def details(self):
+        return '\n'.join("%s\t%s\t%s" % e for e in self)
+
+
+# Sentinel for a value that failed conversion in a column batch.
+_BAD_VALUE = object()
+
+_ROW_ERRORS = (ValueError, KeyError, IndexError, AttributeError)
+
+
+def _convert_column(values, convert, field, line_numbers, report, errors=_ROW_ERRORS):
+    """Converts a whole column in one pass. Only when that fails is the column converted
+    again row-by-row to find out which rows are bad, so clean files never pay for a
+    try/except per row. Bad values are replaced with _BAD_VALUE and added to the report."""
+    try:
+        return map(convert, values)
+    except errors:
+        converted = []
+        for value, line_number in izip(values, line_numbers):
+            try:
+                converted.append(convert(value))
+            except errors, e:
+                report.add(line_number, field, str(e))
+                converted.append(_BAD_VALUE)
+        return converted
+
+
+class StringCodes(object):
+    """Gives each distinct string of a column an integer code.
+
+    Every row with the same string shares one string object, values[code]."""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def code(self, value):
+        try:
+            return self.codes[value]
+        except KeyError:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+            return code
+
+    def code_column(self, column):
+        """The codes of a column of strings, as an array."""
+        return array('l', map(self.code, column))
+
+    def __len__(self):
+        return len(self.values)
+
+
+class CommandCodes(object):
+    """The string codes of the repetitive columns of commands, of the method names derived
+    from them, and of the (Command, EclipseCommand) pairs. Share one of these between all
+    participants of a batch so that their codes can be compared."""
+
+    COLUMNS = ['Command', 'ActiveFile', 'ASTMethod', 'EclipseCommand']
+
+    def __init__(self):
+        self.columns = dict((c, StringCodes()) for c in CommandCodes.COLUMNS)
+        self.methods = StringCodes()
+        self.pairs = StringCodes() # Of (Command code, EclipseCommand code)
+        self._method_of = {}
+
+    def method_code(self, ast_method, active_file):
+        """The code of the method name of an (ASTMethod, ActiveFile) pair, parsed only once per pair."""
+        key = (ast_method, active_file)
+        try:
+            return self._method_of[key]
+        except KeyError:
+            code = self.methods.code(Command.method_name({'ASTMethod': ast_method, 'ActiveFile': active_file}))
+            self._method_of[key] = code
+            return code
+
+    def method_codes(self, ast_methods, active_files):
+        return array('l', [self.method_code(a, f) for a, f in izip(ast_methods, active_files)])
+
+    def pair_codes(self, commands, eclipse_commands):
+        """The codes of the pairs of two columns of codes, Command's and EclipseCommand's."""
+        return array('l', map(self.pairs.code, izip(commands, eclipse_commands)))
+
+
+class PairClassifier(object):
+    """Memoizes a function of commands that looks at nothing but their Command and
+    EclipseCommand, such as EventLine.classify. Commands repeat a few of those pairs, so
+    the function is called once per pair. Rows of a CommandTable are looked up by the
+    integer code of their pair, other commands by the pair's strings."""
+
+    def __init__(self, function):
+        self.function = function
+        self._by_code = {} # CommandCodes: {pair code: result}
+        self._by_pair = {}
+
+    def __call__(self, command):
+        code = command.pair_code
+        if code is None:
+            known, key = self._by_pair, (command['Command'], command['EclipseCommand'])
+        else:
+            known, key = self._by_code.get(command.codes), code
+            if known is None:
+                known = self._by_code[command.codes] = {}
+        try:
+            return known[key]
+        except KeyError:
+            result = known[key] = self.function(command)
+            return result
+
+
+class MappedColumn(object):
+    """A column of fields that are left in a buffer, such as an mmap of a file. Only
+    where each one starts and ends is kept; a field is read and converted each time it
+    is asked for."""
+
+    def __init__(self, buffer, convert=str):
+        self.buffer = buffer
+        self.convert = convert
+        self.starts = array('l')
+        self.ends = array('l')
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, i):
+        return self.convert(self.buffer[self.starts[i]:self.ends[i]])
+
+    def append(self, start, end):
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def extend(self, other):
+        self.starts.extend(other.starts)
+        self.ends.extend(other.ends)
+
+    def select(self, rows):
+        """The fields of some rows, in a column of the same buffer."""
+        column = MappedColumn(self.buffer, self.convert)
+        column.starts = array('l', [self.starts[i] for i in rows])
+        column.ends = array('l', [self.ends[i] for i in rows])
+        return column
+
+
+class Command(object):
+    FIELDS = ['Participant',
+        'CommandID',
+        'Time',
+        'Command',
+        'ActiveFile',
+        'ASTMethod',
+        'EclipseCommand',
+        'Find',
+        'Replace',
+        'DocOffset',
+        'LineOfCode']
+
+    METHOD_NULL = "Other"
+
+    # Those of a CommandRow, from the CommandCodes it was loaded with.
+    codes = None
+    method_code = None
+    pair_code = None
+
+    def __init__(self, line, report=None, line_number=None):
+        """Converts one line of a commands file. A line that fails to convert is marked
+        with 'error', and the failure is added to report, if given."""
+
+        fields = Command.FIELDS
         line_data = line.rstrip('\n').split('\t', len(fields))
         self.record = OrderedDict(zip(fields, line_data))
 
@@ -47,10 +268,126 @@ class Command:
             self.record['DocOffset'] = int(self.record['DocOffset'])
             self.record['LineOfCode'] = self._strip_quotes(self.record['LineOfCode'])
         except ValueError, e:
-            print "Exception at index %d: %s" % (self.record['CommandID'], str(e))
+            if report is not None:
+                report.add(line_number, 'row', str(e))
             self.record['error'] = True
 
-    def _strip_quotes(self, field):
+    @classmethod
+    def from_record(cls, record):
+        """Wraps an already-converted record without re-tokenizing its source line."""
+        command = cls.__new__(cls)
+        command.record = record
+        return command
+
+    @staticmethod
+    def parse_rows(rows, line_numbers, report, codes=None):
+        """Converts tokenized rows of a commands file column by column.
+
+        Rows that fail any conversion are left out of the result and recorded in the report.
+        See CommandTable for codes."""
+        fields = Command.FIELDS
+        rows, line_numbers = _complete_rows(rows, line_numbers, len(fields), report)
+        columns = zip(*rows) or [()] * len(fields)
+        lines_of_code = [Command._strip_quotes(v) for v in columns[10]]
+        table = CommandTable(codes)
+        table.extend(Command._convert_columns(list(columns[1:10]) + [lines_of_code], line_numbers, report))
+        return table.commands()
+
+    # A row of a commands file, with the fields from CommandID to LineOfCode as groups.
+    # Other lines match with no groups.
+    MAPPED_ROW = re.compile(r'^(?:[^\t\n]*\t' + r'([^\t\n]*)\t' * 9 + r'([^\t\n]*)|[^\n]*)', re.M)
+
+    # The rows of a mapped file are converted this many at a time.
+    MAPPED_CHUNK = 10000
+
+    @staticmethod
+    def parse_mapped(buffer, header_rows, report, codes=None):
+        """Converts the rows of a whole commands file in buffer, such as an mmap of it, like
+        parse_rows. The fields up to DocOffset are found by one regular expression over the
+        buffer, without splitting the lines, and converted MAPPED_CHUNK rows at a time.
+        LineOfCode is left in the buffer: the table keeps it as a MappedColumn."""
+        table = CommandTable(codes, MappedColumn(buffer, Command._strip_quotes))
+        rows, line_numbers, lines_of_code = [], [], MappedColumn(buffer, Command._strip_quotes)
+        fields = range(1, 10)
+        for line_number, match in enumerate(Command.MAPPED_ROW.finditer(buffer), 1):
+            if match.start() == len(buffer):
+                break # The empty match after the last newline
+            if line_number <= header_rows:
+                continue
+            if match.start(10) < 0:
+                report.add(line_number, 'row', "expected %d fields, found %d" %
+                    (len(Command.FIELDS), len(match.group().split('\t'))))
+                continue
+
+            rows.append(match.group(*fields))
+            line_numbers.append(line_number)
+            lines_of_code.append(*match.span(10))
+            if len(rows) == Command.MAPPED_CHUNK:
+                table.extend(Command._convert_columns(zip(*rows) + [lines_of_code], line_numbers, report))
+                rows, line_numbers, lines_of_code = [], [], MappedColumn(buffer, Command._strip_quotes)
+
+        table.extend(Command._convert_columns((zip(*rows) or [()] * 9) + [lines_of_code], line_numbers, report))
+        return table.commands()
+
+    @staticmethod
+    def _convert_columns(columns, line_numbers, report):
+        """Converts columns of strings, one for each of FIELDS but Participant, leaving out
+        the rows that fail a conversion."""
+        command_ids = _convert_column(columns[0], int, 'CommandID', line_numbers, report)
+        times = _convert_column(columns[1], VideoTime.converter(), 'Time', line_numbers, report)
+        doc_offsets = _convert_column(columns[8], int, 'DocOffset', line_numbers, report)
+
+        columns = [command_ids, times] + list(columns[2:8]) + [doc_offsets, columns[9]]
+        good = [i for i in xrange(len(command_ids))
+            if command_ids[i] is not _BAD_VALUE and times[i] is not _BAD_VALUE and doc_offsets[i] is not _BAD_VALUE]
+        if len(good) < len(command_ids):
+            columns = [column.select(good) if isinstance(column, MappedColumn) else [column[i] for i in good]
+                for column in columns]
+        return columns
+
+    @staticmethod
+    def from_columns(columns, codes=None):
+        """Commands from already converted columns, one for each of FIELDS but Participant:
+        the rows of a CommandTable of them."""
+        table = CommandTable(codes)
+        table.extend(columns)
+        return table.commands()
+
+    @staticmethod
+    def method_name(event):
+        """The file and method an event happened in, ex: FoldPainter.java:paintFoldStart"""
+        if getattr(event, 'method_code', None) is not None:
+            return event.codes.methods.values[event.method_code]
+
+        ast_method = event['ASTMethod']
+
+        if ast_method and ast_method != 'null':
+
+            try:
+                index_semicolon = ast_method.index(';')
+                index_slash = ast_method.rfind('/', 0, index_semicolon)
+
+                filename = ast_method[index_slash + 1: index_semicolon ]
+
+                index_period = ast_method.index('.')
+                index_open = ast_method.index('(')
+                method = ast_method[index_period + 1: index_open]
+
+                if not method:
+                    method = "Constructor"
+
+                text_string = filename + ":" + method
+
+            except ValueError:
+                text_string = ast_method
+
+        else:
+            text_string = event['ActiveFile'] + ":" + Command.METHOD_NULL
+
+        return text_string
+
+    @staticmethod
+    def _strip_quotes(field):
         return field.rstrip('"').lstrip('"')
 
     def __len__(self):
@@ -77,6 +414,126 @@ class Command:
         r['Time'] = "00:%s.%03d" % (str(r['Time'].strftime("%M:%S")), r['Time'].microsecond/1000)
         return ('\t'.join(str(v) for v in r.values()[0:-1]))
 
+
+class CommandTable(object):
+    """The commands of a file, a column per field but Participant, so that loading them
+    makes no dict per row. CommandID and DocOffset are arrays of ints.
+
+    The columns of CommandCodes.COLUMNS are arrays of their codes in codes, which is a new
+    CommandCodes unless one is given. So are methods, the method name of each row, and
+    pairs, each row's (Command, EclipseCommand) pair. LineOfCode is a list of strings, or
+    the MappedColumn given for a table of a mapped file."""
+
+    def __init__(self, codes=None, lines_of_code=None):
+        self.codes = codes = codes or CommandCodes()
+        self.columns = OrderedDict((key, array('l') if key in ['CommandID', 'DocOffset'] + CommandCodes.COLUMNS else [])
+            for key in Command.FIELDS[1:])
+        if lines_of_code is not None:
+            self.columns['LineOfCode'] = lines_of_code
+        self.methods = array('l')
+        self.pairs = array('l')
+
+        # A field of a row is getters[key](row).
+        self.getters = dict((key, column.__getitem__) for key, column in self.columns.iteritems())
+        for key in CommandCodes.COLUMNS:
+            self.getters[key] = CommandTable._decoder(self.columns[key], codes.columns[key].values)
+
+    def extend(self, columns):
+        """Adds the rows of converted columns, one for each of FIELDS but Participant."""
+        keys = Command.FIELDS[1:]
+        codes = self.codes
+        first = len(self)
+        self.methods.extend(codes.method_codes(columns[keys.index('ASTMethod')], columns[keys.index('ActiveFile')]))
+        for key, column in izip(keys, columns):
+            if key in CommandCodes.COLUMNS:
+                column = codes.columns[key].code_column(column)
+            self.columns[key].extend(column)
+        self.pairs.extend(codes.pair_codes(self.columns['Command'][first:], self.columns['EclipseCommand'][first:]))
+
+    @staticmethod
+    def _decoder(column, values):
+        return lambda row: values[column[row]]
+
+    def __len__(self):
+        return len(self.columns['Time'])
+
+    def record(self, row):
+        """The fields of a row, as the record of a Command read from its line."""
+        return OrderedDict((key, self.getters[key](row)) for key in self.columns)
+
+    def commands(self):
+        return [CommandRow(self, row) for row in xrange(len(self))]
+
+
+class CommandRow(Command):
+    """A command that is a row of a CommandTable. Its fields are read from the table, and
+    its record is made from them each time it is asked for."""
+
+    __slots__ = ['table', 'row']
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    @property
+    def record(self):
+        return self.table.record(self.row)
+
+    @property
+    def codes(self):
+        return self.table.codes
+
+    @property
+    def method_code(self):
+        return self.table.methods[self.row]
+
+    @property
+    def pair_code(self):
+        return self.table.pairs[self.row]
+
+    def __len__(self):
+        return len(self.table.getters)
+
+    def __getitem__(self, key):
+        return self.table.getters[key](self.row)
+
+    def __setitem__(self, key, value):
+        raise TypeError("a row of a CommandTable can't be changed; copy it with Command.from_record(OrderedDict(command.record))")
+
+    def __contains__(self, key):
+        return key in self.table.getters
+
+
+def _complete_rows(rows, line_numbers, width, report):
+    """Drops rows that have fewer than width fields, recording each one in the report."""
+    if all(len(row) >= width for row in rows):
+        return rows, line_numbers
+
+    complete, complete_numbers = [], []
+    for row, line_number in izip(rows, line_numbers):
+        if len(row) >= width:
+            complete.append(row)
+            complete_numbers.append(line_number)
+        else:
+            report.add(line_number, 'row', "expected %d fields, found %d" % (width, len(row)))
+    return complete, complete_numbers
+
+
+def _pad_rows(rows, line_numbers, width, report):
+    """Pads rows that have fewer than width fields with empty ones, recording each one in
+    the report. Returns the rows and whether each one was padded."""
+    padded = [len(row) < width for row in rows]
+    if not any(padded):
+        return rows, padded
+
+    rows = list(rows)
+    for i in xrange(len(rows)):
+        if padded[i]:
+            report.add_padded(line_numbers[i], "expected %d fields, found %d" % (width, len(rows[i])))
+            rows[i] = list(rows[i]) + [''] * (width - len(rows[i]))
+    return rows, padded
+
+
 class CodeError(Exception):
     pass
 
@@ -155,32 +612,35 @@ class Fork(object):
 
 
 
-class CodedEvent:
-
-    def __init__(self, line):
-        # A list of every field in the MergedCoding spreadsheet, left-to-right.
-        fields = [
-            'Index',
-            'Time',
-            'Transcription',
-            'Foraging',
-            'Start', 'End', 'Ongoing',
-            'Code1', 'Code2', 'Code3',
-            'Number of forks',
-            'Fork Description',
-            'Retrospective fork',
-            'Retrospective fork agreement',
-            'Fork Names',
-            'Retrospective quote',
-            'Fork to Goal',
-            'Foraging Success',
-            'LearningDoing',
-        ]
+class CodedEvent(object):
+    # A list of every field in the MergedCoding spreadsheet, left-to-right.
+    FIELDS = [
+        'Index',
+        'Time',
+        'Transcription',
+        'Foraging',
+        'Start', 'End', 'Ongoing',
+        'Code1', 'Code2', 'Code3',
+        'Number of forks',
+        'Fork Description',
+        'Retrospective fork',
+        'Retrospective fork agreement',
+        'Fork Names',
+        'Retrospective quote',
+        'Fork to Goal',
+        'Foraging Success',
+        'LearningDoing',
+    ]
+
+    def __init__(self, line, report=None, line_number=None):
+        """Converts one line of a coded file. Fields that fail to convert are left out of
+        the record, and the failure is added to report, if given."""
+        fields = CodedEvent.FIELDS
         line_data = line.split('\t')
 
         self.record = OrderedDict()
         if self._is_coded_row(line_data):
-            self.valid = True
+            self._valid = True
 
             initial_record = OrderedDict(zip(fields, line_data))
 
@@ -190,16 +650,75 @@ class CodedEvent:
                 self.record['Foraging'] = self._convert_yesno_to_boolean(initial_record, 'Foraging')
                 self.record['Forks'] = self._unpack_fork_attributes(initial_record)
             except (KeyError, IndexError), e:
-                print "Key or Index Error at index %d: %s" % (self.record['Index'], str(e))
-                print self.record
+                if report is not None:
+                    report.add(line_number, 'row', str(e))
 
         else:
             self.record = None
-            self.valid = False
+            self._valid = False
+
+    @classmethod
+    def from_record(cls, record):
+        """Wraps an already-converted record without re-tokenizing its source line."""
+        event = cls.__new__(cls)
+        event.record = record
+        event._valid = True
+        return event
+
+    @staticmethod
+    def parse_rows(rows, line_numbers, report):
+        """Converts tokenized rows of a coded file column by column.
+
+        Rows that are not coded (no index or time) are skipped silently. Rows whose index or
+        time cannot be converted are left out and recorded in the report. A segment whose
+        Foraging or fork columns are bad is kept, with no foraging and no forks, so that the
+        position of every segment still matches its index; the problem is still reported.
+        So is a row that ends before its fork columns: it is padded with empty fields and
+        kept with no forks."""
+        fields = CodedEvent.FIELDS
+        coded = [(row, n) for row, n in izip(rows, line_numbers) if CodedEvent._is_coded_row(row)]
+        rows = [c[0] for c in coded]
+        line_numbers = [c[1] for c in coded]
+        rows, padded = _pad_rows(rows, line_numbers, fields.index('Foraging Success') + 1, report)
+        columns = zip(*rows) or [()] * len(fields)
+
+        index_column = columns[fields.index('Index')]
+        time_column = columns[fields.index('Time')]
+        errors = _ROW_ERRORS + (CodeError, ForkException)
+
+        indexes = _convert_column(index_column, int, 'Index', line_numbers, report)
+        times = _convert_column(time_column, VideoTime.converter(), 'Time', line_numbers, report)
+        foraging = _convert_column(
+            [{'Index': i, 'Time': t, 'Foraging': f} for i, t, f in izip(index_column, time_column, columns[fields.index('Foraging')])],
+            lambda r: CodedEvent._convert_yesno_to_boolean(r, 'Foraging'),
+            'Foraging', line_numbers, report, errors)
+        forks = _convert_column(
+            [{'Index': i, 'Fork Names': n, 'Fork to Goal': g, 'Foraging Success': f}
+                for i, n, g, f in izip(index_column, columns[fields.index('Fork Names')],
+                    columns[fields.index('Fork to Goal')], columns[fields.index('Foraging Success')])],
+            CodedEvent._unpack_fork_attributes,
+            'Forks', line_numbers, report, errors)
+
+        codedevent_list = []
+        for i in xrange(len(rows)):
+            if indexes[i] is _BAD_VALUE or times[i] is _BAD_VALUE:
+                continue
+            codedevent_list.append(CodedEvent.from_record(CodedEvent.make_record(indexes[i], times[i],
+                foraging[i] if foraging[i] is not _BAD_VALUE else False,
+                forks[i] if forks[i] is not _BAD_VALUE and not padded[i] else [])))
+        return codedevent_list
 
-        self.record
+    @staticmethod
+    def make_record(index, time, foraging, forks):
+        record = OrderedDict()
+        record['Index'] = index
+        record['Time'] = time
+        record['Foraging'] = foraging
+        record['Forks'] = forks
+        return record
 
-    def _unpack_fork_attributes(self, record):
+    @staticmethod
+    def _unpack_fork_attributes(record):
         """Associate fork data with a fork in the segment.
         The attributes for a fork are the Fork Type (ex: Verified), Success, and the Goal."""
 
@@ -214,7 +733,8 @@ class CodedEvent:
 
         return fork
 
-    def _convert_yesno_to_boolean(self, record, key):
+    @staticmethod
+    def _convert_yesno_to_boolean(record, key):
         if record[key].lower() == 'y' or record[key] == '1':
             return True
         elif record[key] == '' or record[key].lower() == 'n' or record[key] == '0':
@@ -223,15 +743,16 @@ class CodedEvent:
             raise CodeError("There's a problem with coding %s not being Y or N for index %s at %s."
                 % (key, record['Index'], str(record['Time'])))
 
-    def _is_coded_row(self, line_data):
-        if not line_data[0] or not line_data[1]:
+    @staticmethod
+    def _is_coded_row(line_data):
+        if len(line_data) < 2 or not line_data[0] or not line_data[1]:
             return False
         else:
             return True
 
     @property
     def valid(self):
-        return self.valid
+        return self._valid
 
     def __len__(self):
         return len(self.record)
@@ -262,37 +783,45 @@ class CodedEvent:
         return '\t'.join(str(v) for v in r.values())
 
 
-class Feature:
-    def __init__(self, line):
-        fields = ['Participant',
-            'Fork',
-            'Order',
-            'Retro Time',
-            'Start Time',
-            'End Time',
-            'Removed',
-            'Fork Success',
-            'Position',
-            'Proximity',
-            'Familiarity',
-            'JEdit Source',
-            'Method arguments/return type',
-            'Size of code',
-            'Domain Text',
-            'GUI Text',
-            'Contrast',
-            'Synonyms',
-            'Antonyms',
-            'Level of Abstraction',
-            'Comments',
-            'File Type',
-            'Hardcoded Numbers',
-            'Values of Variables',
-            'Examples',
-            'Exception',
-            'External Doc',
-            'Unknown',
-            'Patch']
+class Feature(object):
+    FIELDS = ['Participant',
+        'Fork',
+        'Order',
+        'Retro Time',
+        'Start Time',
+        'End Time',
+        'Removed',
+        'Fork Success',
+        'Position',
+        'Proximity',
+        'Familiarity',
+        'JEdit Source',
+        'Method arguments/return type',
+        'Size of code',
+        'Domain Text',
+        'GUI Text',
+        'Contrast',
+        'Synonyms',
+        'Antonyms',
+        'Level of Abstraction',
+        'Comments',
+        'File Type',
+        'Hardcoded Numbers',
+        'Values of Variables',
+        'Examples',
+        'Exception',
+        'External Doc',
+        'Unknown',
+        'Patch']
+
+    # The feature type columns, left-to-right. A row's FeatureType is a bitmask where
+    # bit i is set when the row has FEATURE_TYPES[i].
+    FEATURE_TYPES = FIELDS[FIELDS.index('Position'):-1]
+
+    def __init__(self, line, report=None, line_number=None):
+        """Converts one line of the feature types matrix. A line that fails to convert is
+        marked with 'error', and the failure is added to report, if given."""
+        fields = Feature.FIELDS
         line_data = line.rstrip('\n').split('\t', len(fields))
         initial_record = OrderedDict(zip(fields, line_data))
         self.record = OrderedDict()
@@ -306,20 +835,106 @@ class Feature:
                 self.record['FeatureType'] = self._copy_feature_types(fields, line_data)
                 self.record['Patch'] = initial_record['Patch']
             except ValueError, e:
-                print "ValueError at index %d: %s" % (self.record['Fork'], str(e))
+                if report is not None:
+                    report.add(line_number, 'row', str(e))
                 self.record['error'] = True
         else:
             raise ForkException("Fork has been removed: skipping this object.")
 
+    @classmethod
+    def from_record(cls, record):
+        """Wraps an already-converted record without re-tokenizing its source line."""
+        feature = cls.__new__(cls)
+        feature.record = record
+        return feature
+
+    @staticmethod
+    def parse_rows(rows, line_numbers, report):
+        """Converts tokenized rows of the feature types matrix column by column.
+
+        Removed forks are skipped silently. Rows that fail any conversion are left out of
+        the result and recorded in the report."""
+        fields = Feature.FIELDS
+        rows, line_numbers = _complete_rows(rows, line_numbers, len(fields), report)
+        kept = [(row, n) for row, n in izip(rows, line_numbers) if row[fields.index('Removed')] == 'n']
+        rows = [k[0] for k in kept]
+        line_numbers = [k[1] for k in kept]
+        columns = zip(*rows) or [()] * len(fields)
+
+        to_timestamp = VideoTime.converter()
+        forks = _convert_column(columns[fields.index('Fork')], int, 'Fork', line_numbers, report)
+        orders = _convert_column(columns[fields.index('Order')], int, 'Order', line_numbers, report)
+        starts = _convert_column(columns[fields.index('Start Time')], to_timestamp, 'Start Time', line_numbers, report)
+        ends = _convert_column(columns[fields.index('End Time')], to_timestamp, 'End Time', line_numbers, report)
+
+        first_type = fields.index('Position')
+        patch = fields.index('Patch')
+
+        feature_list = []
+        for i in xrange(len(rows)):
+            if forks[i] is _BAD_VALUE or orders[i] is _BAD_VALUE or starts[i] is _BAD_VALUE or ends[i] is _BAD_VALUE:
+                continue
+            row = rows[i]
+            feature_list.append(Feature.from_record(Feature.make_record(forks[i], orders[i], starts[i], ends[i],
+                Feature.encode(row[first_type:patch]), row[patch])))
+        return feature_list
+
+    @staticmethod
+    def make_record(fork, order, start, end, feature_type, patch):
+        record = OrderedDict()
+        record['Fork'] = fork
+        record['Order'] = order
+        record['Start'] = start
+        record['End'] = end
+        record['FeatureType'] = feature_type
+        record['Patch'] = patch
+        return record
+
     def _delete_unused_keys(self, record):
         del record['Fork Success'] # This field is not accurate to the spreadsheet.
         return record
 
     def _copy_feature_types(self, fields, line_data):
-        """Create an OrderedDict from the fields that correspond to the feature types."""
-        f = fields[fields.index('Position'):-1]
-        l = line_data[fields.index('Position'):-1]
-        return [k for k, v in OrderedDict(zip(f, l)).items() if v == 'y']
+        """Encode the fields that correspond to the feature types as a bitmask."""
+        return Feature.encode(line_data[fields.index('Position'):-1])
+
+    @staticmethod
+    def encode(flags):
+        """The bitmask of a row's feature type columns, which are 'y' when the row has that type."""
+        mask = 0
+        bit = 1
+        for v in flags[0:len(Feature.FEATURE_TYPES)]:
+            if v == 'y':
+                mask |= bit
+            bit <<= 1
+        return mask
+
+    @staticmethod
+    def bits(mask):
+        """The positions in FEATURE_TYPES of the types set in a bitmask, in order."""
+        i = 0
+        while mask:
+            if mask & 1:
+                yield i
+            mask >>= 1
+            i += 1
+
+    @staticmethod
+    def names(mask):
+        return [Feature.FEATURE_TYPES[i] for i in Feature.bits(mask)]
+
+    @staticmethod
+    def count(mask):
+        """The number of feature types set in a bitmask."""
+        return bin(mask).count('1')
+
+    @staticmethod
+    def patch_type(patch):
+        """The kind of patch, the part of Patch before its colon, ex: Editor for 'Editor: X.java'."""
+        return patch.split(":")[0].strip()
+
+    def has(self, feature_type):
+        return bool(self.record['FeatureType'] & (1 << Feature.FEATURE_TYPES.index(feature_type)))
 
     def _strip_quotes(self, field):
         return field.rstrip('"').lstrip('"')
@@ -352,13 +967,584 @@ class Feature:
         r['End'] = self._time_to_str(r['End'])
 
         # Flatten the Feature Types into the list.
-        values_list = [v for k, v in r.iteritems() if k != 'FeatureType'] + self.record['FeatureType']
+        values_list = [v for k, v in r.iteritems() if k != 'FeatureType'] + Feature.names(self.record['FeatureType'])
 
         return ('\t'.join(str(v) for v in values_list))
 
+class RecordView(object):
+    """A read-only view of some of the records in a list, without copying them.
+
+    The view either covers a contiguous slice [start, stop) of the list, or the records
+    at a sorted list of positions."""
+
+    def __init__(self, records, start=0, stop=None, positions=None):
+        self._records = records
+        self._positions = positions
+        self._start = start
+        self._stop = len(records) if stop is None else stop
+
+    @property
+    def positions(self):
+        if self._positions is None:
+            return xrange(self._start, self._stop)
+        return self._positions
+
+    def __len__(self):
+        if self._positions is None:
+            return max(0, self._stop - self._start)
+        return len(self._positions)
+
+    def __iter__(self):
+        records = self._records
+        for i in self.positions:
+            yield records[i]
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError("RecordView index out of range")
+        if self._positions is None:
+            return self._records[self._start + i]
+        return self._records[self._positions[i]]
+
+    def __nonzero__(self):
+        return len(self) > 0
+
+
+class ParticipantData(object):
+    """A participant's commands, coded events, forks and features, with indexes for queries.
+
+    Commands are indexed by time, method and (when a classify function such as
+    EventLine.classify is given) command class. Each index holds sorted positions into
+    the command list, so a filter costs a binary search plus the size of its result.
+    Queries return RecordViews of the loaded lists rather than copies."""
+
+    def __init__(self, pid, coded_events, commands, features, classify=None):
+        times = [c['Time'] for c in commands]
+        if any(times[i] > times[i + 1] for i in xrange(len(times) - 1)):
+            # The time index needs the commands in time order. The log almost always is already.
+            commands = sorted(commands, key=lambda c: c['Time'])
+            times = sorted(times)
+
+        self.pid = pid
+        self.coded_events = coded_events
+        self.commands = commands
+        self.features = features
+        self.classify = classify
+        self._times = times
+
+        self._segments = dict((e['Index'], i) for i, e in enumerate(coded_events))
+        self._segment_times = [e['Time'] for e in coded_events]
+        self._features_by_fork = {}
+        for i, f in enumerate(features):
+            self._features_by_fork.setdefault(f['Fork'], []).append(i)
+        self._features_by_start = sorted((f['Start'], i) for i, f in enumerate(features))
+        self._longest_feature = max([f['End'] - f['Start'] for f in features] + [timedelta(0)])
+        self.feature_masks = array('L', (f['FeatureType'] for f in features))
+
+        # Built on first use, since not every analysis needs them.
+        self._methods = None
+        self._classes = None
+        self._feature_segments = None
+        self._command_segments = None
+        self._segment_table = None
+
+    @staticmethod
+    def load(p, classify=None):
+        return ParticipantData(p, DataLoader.load_codedevents(p), DataLoader.load_commands(p),
+            DataLoader.load_feature_types(p), classify)
+
+    @property
+    def start_time(self):
+        return self.coded_events[0]['Time']
+
+    def extend(self, coded_events, commands):
+        """Appends rows read from a session that is still going on, keeping the indexes current."""
+        start = len(self.commands)
+        self.coded_events.extend(coded_events)
+        self.commands.extend(commands)
+
+        for i in xrange(len(self.coded_events) - len(coded_events), len(self.coded_events)):
+            self._segments[self.coded_events[i]['Index']] = i
+            self._segment_times.append(self.coded_events[i]['Time'])
+        if coded_events:
+            # Forks that had no segment yet may have one now.
+            self._feature_segments = None
+        if coded_events or commands:
+            self._command_segments = None
+            self._segment_table = None
+
+        for i in xrange(start, len(self.commands)):
+            c = self.commands[i]
+            self._times.append(c['Time'])
+            if self._methods is not None:
+                self._methods.setdefault(Command.method_name(c), []).append(i)
+            if self._classes is not None:
+                self._classes.setdefault(self.classify(c), []).append(i)
+
+    def _position_range(self, t0=None, t1=None):
+        """The positions of the commands with t0 <= time < t1."""
+        lo = 0 if t0 is None else bisect_left(self._times, t0)
+        hi = len(self._times) if t1 is None else bisect_left(self._times, t1)
+        return lo, max(lo, hi)
+
+    def _method_index(self):
+        if self._methods is None:
+            self._methods = {}
+            for i, c in enumerate(self.commands):
+                self._methods.setdefault(Command.method_name(c), []).append(i)
+        return self._methods
+
+    def _class_index(self):
+        if self._classes is None:
+            if self.classify is None:
+                raise ValueError("ParticipantData needs a classify function to filter by command class.")
+            self._classes = {}
+            for i, c in enumerate(self.commands):
+                self._classes.setdefault(self.classify(c), []).append(i)
+        return self._classes
+
+    def segment(self, index):
+        """The coded event (30 second segment) with the given Index."""
+        return self.coded_events[self._segments[index]]
+
+    def segment_range(self, index):
+        """The start and end time of the coded event with the given Index."""
+        start = self.segment(index)['Time']
+        return start, start + timedelta(0, SEGMENT_SECONDS)
+
+    def window_around(self, index, seconds):
+        """A time window of the given length centred on the segment with the given Index."""
+        start, end = self.segment_range(index)
+        middle = start + (end - start) / 2
+        return middle - timedelta(0, seconds / 2.0), middle + timedelta(0, seconds / 2.0)
+
+    def segments_between(self, t0, t1):
+        """The coded events whose 30 seconds overlap [t0, t1)."""
+        lo = bisect_right(self._segment_times, t0 - timedelta(0, SEGMENT_SECONDS))
+        hi = bisect_left(self._segment_times, t1)
+        return RecordView(self.coded_events, lo, max(lo, hi))
+
+    def features_between(self, t0, t1):
+        """The features whose Start to End overlaps [t0, t1). Only those that start at most the
+        longest feature before t0 can, so the scan is as long as the window plus that."""
+        lo = bisect_right(self._features_by_start, (t0 - self._longest_feature,))
+        hi = bisect_left(self._features_by_start, (t1,))
+        positions = sorted(i for start, i in self._features_by_start[lo:hi] if self.features[i]['End'] > t0)
+        return RecordView(self.features, positions=positions)
+
+    def command_before(self, t):
+        """The last command before time t, or None."""
+        i = bisect_left(self._times, t)
+        return self.commands[i - 1] if i > 0 else None
+
+    def forks(self, index=None):
+        """All forks, or the forks of the segment with the given Index."""
+        if index is not None:
+            return self.segment(index)['Forks']
+        return [fork for e in self.coded_events for fork in e['Forks']]
+
+    def features_for_fork(self, index):
+        return RecordView(self.features, positions=self._features_by_fork.get(index, []))
+
+    def feature_segments(self, features=None):
+        """The position in coded_events of the segment of each feature's fork, or -1 when the
+        fork has no coded segment, for features (by default all of them) in their order.
+
+        The features are joined to the segments on Fork = Index once, and the result is kept
+        apart from the features, so they are never written to."""
+        if self._feature_segments is None:
+            segments = self._segments
+            self._feature_segments = array('l', (segments.get(f['Fork'], -1) for f in self.features))
+        if features is None:
+            return self._feature_segments
+        if isinstance(features, RecordView) and features._records is self.features:
+            return array('l', (self._feature_segments[i] for i in features.positions))
+        return array('l', (self._segments.get(f['Fork'], -1) for f in features))
+
+    def command_segments(self):
+        """The position in coded_events of the segment each command is in, or -1 for commands
+        outside every segment's SEGMENT_SECONDS, in the order of commands.
+
+        Commands and segments are both in time order, so they are joined in one merge."""
+        if self._command_segments is None:
+            starts = self._segment_times
+            length = timedelta(0, SEGMENT_SECONDS)
+            positions = array('l')
+            segment = -1
+            for t in self._times:
+                while segment + 1 < len(starts) and starts[segment + 1] <= t:
+                    segment += 1
+                positions.append(segment if segment >= 0 and t < starts[segment] + length else -1)
+            self._command_segments = positions
+        return self._command_segments
+
+    def segment_table(self):
+        """The SegmentTable of this participant, made on first use."""
+        if self._segment_table is None:
+            self._segment_table = SegmentTable(self)
+        return self._segment_table
+
+    def methods(self):
+        return self._method_index().keys()
+
+    def commands_between(self, t0=None, t1=None):
+        """The commands with t0 <= time < t1."""
+        lo, hi = self._position_range(t0, t1)
+        return RecordView(self.commands, lo, hi)
+
+    def query(self, t0=None, t1=None, fork=None, method=None, kind=None):
+        """The commands that match all of the given filters.
+
+        fork restricts the time range to that segment's 30 seconds, method is a name
+        as returned by Command.method_name, and kind is a command class from classify."""
+        if fork is not None:
+            f0, f1 = self.segment_range(fork)
+            t0 = f0 if t0 is None else max(t0, f0)
+            t1 = f1 if t1 is None else min(t1, f1)
+
+        lo, hi = self._position_range(t0, t1)
+
+        candidates = []
+        if method is not None:
+            candidates.append(self._method_index().get(method, []))
+        if kind is not None:
+            candidates.append(self._class_index().get(kind, []))
+
+        if not candidates:
+            return RecordView(self.commands, lo, hi)
+
+        # Narrow the smallest index to the time range, then check it against the others.
+        candidates.sort(key=len)
+        smallest = candidates[0]
+        positions = smallest[bisect_left(smallest, lo):bisect_left(smallest, hi)]
+        for other in candidates[1:]:
+            other = set(other[bisect_left(other, lo):bisect_left(other, hi)])
+            positions = [i for i in positions if i in other]
+
+        return RecordView(self.commands, positions=positions)
+
+    def foraging_commands(self):
+        """The commands in segments that were coded as foraging."""
+        positions = []
+        for e in self.coded_events:
+            if e['Foraging']:
+                lo, hi = self._position_range(*self.segment_range(e['Index']))
+                positions.extend(xrange(lo, hi))
+        return RecordView(self.commands, positions=positions)
+
+
+class SegmentTable(object):
+    """What a participant did in each coded segment, one list per column, in the order of
+    coded_events.
+
+    commands counts the segment's commands, and methods and files the distinct methods
+    and ActiveFiles they touched. visits counts the method visits that start in the
+    segment: runs of commands in the same method, so a visit that goes on into the next
+    segment is only counted in the first. visit_starts holds the position in commands of
+    the first command of every visit, in or out of segments, for MethodVisits. With the
+    participant's classify function, classes
+    holds a Counter of the command classes of each segment, and edit_ratio and
+    search_ratio the share of its commands in EDIT_CLASSES and SEARCH_CLASSES (None for
+    segments without commands). The classes are those of EventLine.classify."""
+
+    COLUMNS = ['index', 'seconds', 'foraging', 'commands', 'methods', 'visits', 'files', 'edit_ratio', 'search_ratio']
+
+    EDIT_CLASSES = set(['edit'])
+    SEARCH_CLASSES = set(['text_search', 'find_next', 'search_declarations', 'file_search',
+        'search_references', 'call_hierarchy'])
+
+    def __init__(self, data):
+        events = data.coded_events
+        count = len(events)
+        self.participant = data.pid
+        self.index = [e['Index'] for e in events]
+        self.seconds = [(e['Time'] - events[0]['Time']).total_seconds() for e in events]
+        self.foraging = [e['Foraging'] for e in events]
+        self.commands = [0] * count
+        self.visits = [0] * count
+        self.visit_starts = array('l')
+        methods = [set() for i in xrange(count)]
+        files = [set() for i in xrange(count)]
+        self.classes = [Counter() for i in xrange(count)]
+
+        classify = data.classify
+        last_method = None
+        for i, (command, segment) in enumerate(izip(data.commands, data.command_segments())):
+            # Commands outside every segment still end the visit before them.
+            method = Command.method_name(command)
+            starts_visit = method != last_method
+            if starts_visit:
+                self.visit_starts.append(i)
+            last_method = method
+            if segment < 0:
+                continue
+            self.commands[segment] += 1
+            self.visits[segment] += starts_visit
+            methods[segment].add(method)
+            files[segment].add(command['ActiveFile'])
+            if classify:
+                self.classes[segment][classify(command)] += 1
+
+        self.methods = [len(m) for m in methods]
+        self.files = [len(f) for f in files]
+        self.edit_ratio = self._ratio(SegmentTable.EDIT_CLASSES) if classify else [None] * count
+        self.search_ratio = self._ratio(SegmentTable.SEARCH_CLASSES) if classify else [None] * count
+
+    def _ratio(self, kinds):
+        return [float(sum(n for k, n in classes.iteritems() if k in kinds)) / total if total else None
+            for classes, total in izip(self.classes, self.commands)]
+
+    def __len__(self):
+        return len(self.index)
+
+    def rows(self):
+        return izip(*[getattr(self, c) for c in SegmentTable.COLUMNS])
+
+
+class ParticipantTable(object):
+    """A table over many participants, filled with add(data) from each one's ParticipantData.
+
+    A table kept in columns names them in COLUMNS: each is an attribute holding a list,
+    which rows() and write_tab() read in that order. from_participants loads each
+    participant with load(p), which a table narrows to the files it needs."""
+
+    COLUMNS = []
+
+    def __init__(self):
+        for column in self.COLUMNS:
+            setattr(self, column, [])
+
+    def add(self, data):
+        raise NotImplementedError
+
+    @staticmethod
+    def load(p):
+        return ParticipantData.load(p)
+
+    @classmethod
+    def from_participants(cls, participants, **options):
+        """The table of participants loaded one at a time."""
+        return cls.from_data((cls.load(p) for p in participants), **options)
+
+    @classmethod
+    def from_data(cls, data_list, **options):
+        """The table of already loaded ParticipantData objects."""
+        table = cls(**options)
+        for data in data_list:
+            table.add(data)
+        return table
+
+    def __len__(self):
+        return len(getattr(self, self.COLUMNS[0]))
+
+    def rows(self):
+        return izip(*[getattr(self, c) for c in self.COLUMNS])
+
+    def write_tab(self, filename):
+        with open(filename, 'w') as f:
+            f.write('\t'.join(self.COLUMNS) + '\n')
+            for row in self.rows():
+                f.write('\t'.join(str(v) for v in row) + '\n')
+
+
+class TailReader(object):
+    """Reads the rows appended to a growing tab-separated file since the previous read.
+
+    The byte offset of the first unread line is kept between reads. A last line that has
+    not got its newline yet is left in the file for the next read."""
+
+    def __init__(self, filename, header_rows, maxsplit=-1):
+        self.filename = filename
+        self.header_rows = header_rows
+        self.maxsplit = maxsplit
+        self.offset = 0
+        self.lines_read = 0
+
+    def read_rows(self):
+        """Returns the new rows and their 1-based line numbers, like DataLoader.read_rows."""
+        try:
+            with open(self.filename, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read()
+        except IOError:
+            return [], [] # Not written yet
+
+        end = data.rfind('\n')
+        if end < 0:
+            return [], []
+        self.offset += end + 1
+
+        rows, line_numbers = [], []
+        for line in data[:end].split('\n'):
+            self.lines_read += 1
+            if self.lines_read > self.header_rows:
+                rows.append(line.split('\t', self.maxsplit))
+                line_numbers.append(self.lines_read)
+        return rows, line_numbers
+
+
+class RowIndex(object):
+    """The byte ranges of each participant's rows in a tab-separated file of many participants.
+
+    The ranges are kept in a sidecar file next to it, filename + SUFFIX, with the size and
+    modification time of the file they were found in, and end with a trailer of how many
+    ranges there are. They are found again, with one scan of the file, when it has changed
+    since or the sidecar is not whole. Reading a participant's rows then seeks to
+    them, however many other participants the file holds."""
+
+    SUFFIX = '.index'
+    END = 'end'
+
+    def __init__(self, filename, header_rows):
+        self.filename = filename
+        self.header_rows = header_rows
+        self.stamp = None
+        self.ranges = {} # participant: [(start, end, first line number)]
+        self.listing = None # The sidecar's text, whose lines are parsed into ranges as needed
+
+    @property
+    def sidecar(self):
+        return self.filename + RowIndex.SUFFIX
+
+    @staticmethod
+    def participant(line):
+        """The participant in the first field of line, or None."""
+        try:
+            return int(line[ : line.index('\t') ].strip())
+        except ValueError:
+            return None
+
+    def _stamp(self):
+        try:
+            stat = os.stat(self.filename)
+        except OSError, e:
+            raise IOError(e.errno, e.strerror, self.filename)
+        return "%d\t%r" % (stat.st_size, stat.st_mtime)
+
+    def refresh(self):
+        """Reads the sidecar, or scans the file and writes one, unless the ranges are
+        already those of the file as it is."""
+        stamp = self._stamp()
+        if stamp == self.stamp:
+            return
+        self.ranges = {}
+        self.listing = None
+        if not self._read_sidecar(stamp):
+            self._scan()
+            self._write_sidecar(stamp)
+        self.stamp = stamp
+
+    def _read_sidecar(self, stamp):
+        try:
+            with open(self.sidecar) as f:
+                listing = f.read()
+        except IOError:
+            return False
+        if not listing.startswith(stamp + '\n'):
+            return False
+        # The stamp and trailer lines around the ranges: a sidecar cut short, even at the end
+        # of a line, has no trailer or one that doesn't count the ranges left.
+        if not listing.endswith('\n%s\t%d\n' % (RowIndex.END, listing.count('\n') - 2)):
+            return False
+        self.listing = listing
+        return True
+
+    def ranges_of(self, p):
+        """The ranges of participant p. In the sidecar they are the lines that start with p,
+        one after the other, so only those are parsed. A sidecar whose lines don't parse is
+        taken as stale: the file is scanned again and the sidecar rewritten."""
+        if p not in self.ranges and self.listing is not None:
+            key = '\n%d\t' % p
+            runs = []
+            at = self.listing.find(key)
+            try:
+                while at >= 0:
+                    end = self.listing.index('\n', at + 1)
+                    start, stop, first_line = [int(v) for v in self.listing[at + len(key):end].split('\t')]
+                    runs.append((start, stop, first_line))
+                    at = end if self.listing.startswith(key, end) else -1
+            except ValueError:
+                self.listing = None
+                self._scan()
+                self._write_sidecar(self.stamp)
+                return self.ranges.get(p, [])
+            self.ranges[p] = runs
+        return self.ranges.get(p, [])
+
+    def _scan(self):
+        with open(self.filename, 'rb') as f:
+            data = f.read()
+
+        ranges = {}
+        offset = 0
+        line_number = 0
+        last = None
+        while offset < len(data):
+            end = data.find('\n', offset)
+            if end < 0:
+                end = len(data) # The last line has no newline
+            following = end + 1
+            line_number += 1
+
+            p = RowIndex.participant(data[offset:end]) if line_number > self.header_rows else None
+            if p is not None and p == last:
+                ranges[p][-1][1] = following # The next line of the same run
+            elif p is not None:
+                ranges.setdefault(p, []).append([offset, following, line_number])
+            last = p
+            offset = following
+        self.ranges = dict((p, [tuple(r) for r in runs]) for p, runs in ranges.items())
+
+    def _write_sidecar(self, stamp):
+        # Sorted, so that the ranges of a participant are on consecutive lines.
+        lines = [stamp] + ["%d\t%d\t%d\t%d" % ((p,) + r) for p in sorted(self.ranges) for r in self.ranges[p]]
+        lines.append("%s\t%d" % (RowIndex.END, len(lines) - 1))
+        temporary = "%s.%d" % (self.sidecar, os.getpid())
+        try:
+            with open(temporary, 'w') as f:
+                f.write('\n'.join(lines) + '\n')
+            os.rename(temporary, self.sidecar) # Whole, even with other processes writing it too
+        except (IOError, OSError):
+            pass # A read-only data directory: the ranges are kept for this run only
+
+    def read_rows(self, p, maxsplit=-1):
+        """The rows of participant p and their 1-based line numbers, like DataLoader.read_rows."""
+        self.refresh()
+        rows, line_numbers = [], []
+        with open(self.filename, 'rb') as f:
+            for start, end, first_line in self.ranges_of(p):
+                f.seek(start)
+                lines = f.read(end - start).split('\n')
+                if not lines[-1]:
+                    lines.pop()
+                rows.extend(line.split('\t', maxsplit) for line in lines)
+                line_numbers.extend(xrange(first_line, first_line + len(lines)))
+        return rows, line_numbers
+
+
 class DataLoader:
+    """Loads a participant's rows from the tab-separated files in DIR, or from backend.
+
+    backend is None or an object with the load_commands, load_codedevents and
+    load_feature_types of sqlite_store.SQLiteBackend, which gives the same records.
+    t0 and t1 select the rows of a time range: commands and coded events with
+    t0 <= Time < t1, and features whose Start to End overlaps [t0, t1)."""
     DIR = os.path.join("..", "timeline_forks_data", "data")
 
+    backend = None
+
+    # The string codes shared by every participant loaded in this run.
+    CODES = CommandCodes()
+
+    # The RowIndex of each file of many participants, by filename.
+    ROW_INDEXES = {}
+
+    # Commands files at least this large are memory-mapped, and their LineOfCode fields
+    # read only when used. The files must not be rewritten while their commands are in use.
+    MAP_BYTES = 8 * 1024 * 1024
+
     @staticmethod
     def line_matches_participant(line, p):
         try:
@@ -367,49 +1553,99 @@ class DataLoader:
             return False
 
     @staticmethod
-    def load_feature_types(p):
-        filename = DataLoader.feature_types()
-        command_list = []
+    def read_rows(filename, header_rows, maxsplit=-1, keep=None):
+        """Reads a whole tab-separated file in one go and splits it into rows of fields.
+
+        Returns the rows and their 1-based line numbers in the file. The header rows are
+        skipped, and when keep is given only lines for which keep(line) is true are split."""
         with open(filename) as f:
-            f.readline() # Read past header
-            f.readline() # Read past header
+            lines = f.read().split('\n')
+
+        if lines and not lines[-1]:
+            lines.pop() # The file ends with a newline
+
+        numbered = enumerate(lines[header_rows:], header_rows + 1)
+        if keep:
+            numbered = [(n, line) for n, line in numbered if keep(line)]
+        else:
+            numbered = list(numbered)
+
+        rows = [line.split('\t', maxsplit) for n, line in numbered]
+        line_numbers = [n for n, line in numbered]
+        return rows, line_numbers
 
-            for line in f:
-                if DataLoader.line_matches_participant(line, p):
-                    try:
-                        c = Feature(line)
-                        command_list.append(c)
-                    except ForkException:
-                        pass
-        return command_list
+    @staticmethod
+    def row_index(filename, header_rows):
+        if filename not in DataLoader.ROW_INDEXES:
+            DataLoader.ROW_INDEXES[filename] = RowIndex(filename, header_rows)
+        return DataLoader.ROW_INDEXES[filename]
+
+    @staticmethod
+    def _finish_report(report, print_summary):
+        if print_summary and len(report):
+            print str(report)
 
     @staticmethod
-    def load_commands(p):
+    def _between(records, key, t0, t1):
+        if t0 is None and t1 is None:
+            return records
+        return [r for r in records if (t0 is None or r[key] >= t0) and (t1 is None or r[key] < t1)]
+
+    @staticmethod
+    def load_feature_types(p, report=None, t0=None, t1=None):
+        if DataLoader.backend:
+            return DataLoader.backend.load_feature_types(p, t0, t1)
+
+        filename = DataLoader.feature_types()
+        print_summary = report is None
+        report = report if report is not None else ParseReport(filename)
+
+        rows, line_numbers = DataLoader.row_index(filename, 2).read_rows(p, len(Feature.FIELDS))
+        feature_list = Feature.parse_rows(rows, line_numbers, report)
+
+        DataLoader._finish_report(report, print_summary)
+        if t0 is not None or t1 is not None:
+            feature_list = [f for f in feature_list if (t1 is None or f['Start'] < t1) and (t0 is None or f['End'] > t0)]
+        return feature_list
+
+    @staticmethod
+    def load_commands(p, report=None, codes=None, t0=None, t1=None):
+        """Loads a participant's commands. Rows that cannot be converted are left out and
+        recorded in report; without a report, a one-line summary is printed instead.
+
+        The string columns are coded with codes, which defaults to DataLoader.CODES."""
+        if DataLoader.backend:
+            return DataLoader.backend.load_commands(p, codes or DataLoader.CODES, t0, t1)
+
         filename = DataLoader.commands(p)
-        command_list = []
-        with open(filename) as f:
-            f.readline() # Read past header
-            f.readline() # Read past the start timestamp
+        print_summary = report is None
+        report = report if report is not None else ParseReport(filename)
 
-            for line in f:
-                c = Command(line)
-                command_list.append(c)
-        return command_list
+        if os.path.getsize(filename) >= DataLoader.MAP_BYTES:
+            with open(filename, 'rb') as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            command_list = Command.parse_mapped(buffer, 2, report, codes or DataLoader.CODES) # Header and start timestamp
+        else:
+            rows, line_numbers = DataLoader.read_rows(filename, 2, len(Command.FIELDS)) # Header and start timestamp
+            command_list = Command.parse_rows(rows, line_numbers, report, codes or DataLoader.CODES)
+
+        DataLoader._finish_report(report, print_summary)
+        return DataLoader._between(command_list, 'Time', t0, t1)
 
     @staticmethod
-    def load_codedevents(p):
+    def load_codedevents(p, report=None, t0=None, t1=None):
+        if DataLoader.backend:
+            return DataLoader.backend.load_codedevents(p, t0, t1)
+
         filename = DataLoader.codedevents(p)
-        codedevent_list = []
-        with open(filename) as f:
-            f.readline() # Read past the first header row
-            f.readline() # Read past the second header row
+        print_summary = report is None
+        report = report if report is not None else ParseReport(filename)
 
-            for line in f:
-                ce = CodedEvent(line)
-                if ce.valid:
-                    codedevent_list.append(ce)
+        rows, line_numbers = DataLoader.read_rows(filename, 2) # Two header rows
+        codedevent_list = CodedEvent.parse_rows(rows, line_numbers, report)
 
-        return codedevent_list
+        DataLoader._finish_report(report, print_summary)
+        return DataLoader._between(codedevent_list, 'Time', t0, t1)
 
     @staticmethod
     def feature_types():
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+"""Counts how often feature types occur together across all participants.
+
+Each feature row's types are a bitmask (see Feature.FEATURE_TYPES), so the rows
+are first counted by distinct mask. The matrix is then built from the few
+distinct masks rather than from every row.
+
+Output:
+
+- A tab-separated feature type x feature type matrix, ex: feature_cooccurrence.txt"""
+
+import os
+from array import array
+from collections import Counter
+
+from events import DataLoader, Feature, PARTICIPANTS
+from timeline_ift_forks import Timeline
+
+
+class FeatureTypeCooccurrence(object):
+    """matrix[i][j] is the number of feature rows that have both FEATURE_TYPES[i] and
+    FEATURE_TYPES[j]. The diagonal is the number of rows with each type."""
+
+    def __init__(self, masks):
+        self.masks = masks
+        self.types = Feature.FEATURE_TYPES
+
+        size = len(self.types)
+        self.matrix = [[0] * size for i in range(size)]
+
+        for mask, n in Counter(masks).iteritems():
+            bits = list(Feature.bits(mask))
+            for i in bits:
+                row = self.matrix[i]
+                for j in bits:
+                    row[j] += n
+
+    @staticmethod
+    def from_participants(participants):
+        masks = array('L')
+        for p in participants:
+            masks.extend(f['FeatureType'] for f in DataLoader.load_feature_types(p))
+        return FeatureTypeCooccurrence(masks)
+
+    @staticmethod
+    def from_data(data_list):
+        """The matrix for already loaded ParticipantData objects."""
+        masks = array('L')
+        for data in data_list:
+            masks.extend(data.feature_masks)
+        return FeatureTypeCooccurrence(masks)
+
+    def count(self, feature_type, other=None):
+        i = self.types.index(feature_type)
+        j = i if other is None else self.types.index(other)
+        return self.matrix[i][j]
+
+    def types_per_row(self):
+        """How many rows have each number of feature types."""
+        return Counter(Feature.count(m) for m in self.masks)
+
+    def write_tab(self, filename):
+        with open(filename, 'w') as f:
+            f.write('\t'.join([''] + self.types) + '\n')
+            for name, row in zip(self.types, self.matrix):
+                f.write('\t'.join([name] + [str(n) for n in row]) + '\n')
+
+
+if __name__ == "__main__":
+    participants = PARTICIPANTS
+
+    cooccurrence = FeatureTypeCooccurrence.from_participants(participants)
+    cooccurrence.write_tab(os.path.join(Timeline.OUTPUT_DIR, "feature_cooccurrence.txt"))
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+"""Flattens every participant's forks into one table and summarizes their outcomes.
+
+The table has one row per fork, in columns (one list per attribute), so every
+summary is a grouped count over a few columns rather than a walk over the
+coded events.
+
+Output:
+
+- A tab-separated file with one row per fork, ex: fork_outcomes.txt
+- A JSON file with success rates, fork density and multi-fork statistics, ex: fork_outcomes.json"""
+
+import os
+import json
+from collections import Counter, OrderedDict
+from itertools import izip
+
+from events import DataLoader, ParticipantData, ParticipantTable, PARTICIPANTS
+from timeline_ift_forks import Timeline
+
+
+class ForkTable(ParticipantTable):
+    """Every fork of every participant, one list per column.
+
+    success is 'successful', 'unsuccessful', 'NA' or None, as in Fork. seconds is the
+    start of the fork's segment, relative to the participant's first segment."""
+
+    COLUMNS = ['participant', 'index', 'order', 'name', 'goal', 'success', 'seconds', 'foraging', 'forks_in_segment']
+
+    # Fork types that mean no fork happened in the segment.
+    NOT_FORKS = ['No', 'No Data', '']
+
+    def add(self, data):
+        """Adds the forks of a ParticipantData."""
+        pid, coded_events = data.pid, data.coded_events
+        if not coded_events:
+            return
+        start = coded_events[0]['Time']
+
+        for event in coded_events:
+            forks = event['Forks']
+            seconds = (event['Time'] - start).total_seconds()
+            real_forks = sum(1 for f in forks if f.name not in ForkTable.NOT_FORKS)
+            for fork in forks:
+                self.participant.append(pid)
+                self.index.append(fork.index)
+                self.order.append(fork.order)
+                self.name.append(fork.name)
+                self.goal.append(fork.goal)
+                self.success.append(fork.success)
+                self.seconds.append(seconds)
+                self.foraging.append(event['Foraging'])
+                self.forks_in_segment.append(real_forks)
+
+    @staticmethod
+    def load(p):
+        return ParticipantData(p, DataLoader.load_codedevents(p), [], [])
+
+    def is_fork(self):
+        """A column that is True for the rows that are real forks."""
+        return [n not in ForkTable.NOT_FORKS for n in self.name]
+
+    def success_rates(self, column):
+        """Counts of each outcome, and the success rate, of the real forks for each value
+        of a column. not_forks counts the rows of NOT_FORKS types, which are left out.
+
+        The rate is successful / (successful + unsuccessful). Forks without a
+        successful or unsuccessful outcome are counted but not part of the rate."""
+        keys = getattr(self, column)
+        keep = self.is_fork()
+        counts = Counter((k, s) for k, s, f in izip(keys, self.success, keep) if f)
+        forks = Counter(k for k, f in izip(keys, keep) if f)
+        not_forks = Counter(k for k, f in izip(keys, keep) if not f)
+
+        groups = OrderedDict()
+        for key in sorted(set(keys)):
+            successful = counts[(key, 'successful')]
+            unsuccessful = counts[(key, 'unsuccessful')]
+            decided = successful + unsuccessful
+            groups[key] = OrderedDict([
+                ('forks', forks[key]),
+                ('not_forks', not_forks[key]),
+                ('successful', successful),
+                ('unsuccessful', unsuccessful),
+                ('na', counts[(key, 'NA')]),
+                ('rate', float(successful) / decided if decided else None)])
+        return groups
+
+    def fork_density(self, bin_seconds=300):
+        """The number of real forks per time bin, for each participant and over everyone."""
+        bins = [int(s // bin_seconds) for s in self.seconds]
+        keep = self.is_fork()
+
+        per_participant = Counter((p, b) for p, b, k in izip(self.participant, bins, keep) if k)
+        overall = Counter(b for b, k in izip(bins, keep) if k)
+
+        last = max(bins or [-1]) + 1
+        density = OrderedDict()
+        for p in sorted(set(self.participant)):
+            density[p] = [per_participant[(p, b)] for b in range(last)]
+        density['all'] = [overall[b] for b in range(last)]
+        return density
+
+    def multi_fork_segments(self):
+        """How many segments had each number of real forks, and the outcomes of forks in
+        segments with one fork versus several."""
+        segments = Counter()
+        seen = set()
+        for p, i, n in izip(self.participant, self.index, self.forks_in_segment):
+            if (p, i) not in seen:
+                seen.add((p, i))
+                segments[n] += 1
+
+        outcomes = Counter(('multiple' if n > 1 else 'single', s)
+            for n, s, k in izip(self.forks_in_segment, self.success, self.is_fork()) if k)
+
+        stats = OrderedDict()
+        stats['segments_by_forks'] = OrderedDict((n, segments[n]) for n in sorted(segments))
+        for kind in ('single', 'multiple'):
+            stats[kind] = OrderedDict((str(s), outcomes[(kind, s)]) for s in ('successful', 'unsuccessful', 'NA', None))
+        return stats
+
+    def summary(self, bin_seconds=300):
+        summary = OrderedDict()
+        summary['forks'] = sum(self.is_fork())
+        summary['by_type'] = self.success_rates('name')
+        summary['by_goal'] = self.success_rates('goal')
+        summary['by_participant'] = self.success_rates('participant')
+        summary['density_bin_seconds'] = bin_seconds
+        summary['density'] = self.fork_density(bin_seconds)
+        summary['multi_fork_segments'] = self.multi_fork_segments()
+        return summary
+
+    def write_json(self, filename, bin_seconds=300):
+        with open(filename, 'w') as f:
+            json.dump(_with_string_keys(self.summary(bin_seconds)), f, indent=2)
+
+
+def _with_string_keys(value):
+    """JSON objects need string keys, but participants are ints and goals may be None."""
+    if isinstance(value, dict):
+        return OrderedDict((str(k), _with_string_keys(v)) for k, v in value.items())
+    return value
+
+
+if __name__ == "__main__":
+    participants = PARTICIPANTS
+    output_dir = Timeline.OUTPUT_DIR
+
+    table = ForkTable.from_participants(participants)
+    table.write_tab(os.path.join(output_dir, "fork_outcomes.txt"))
+    table.write_json(os.path.join(output_dir, "fork_outcomes.json"))
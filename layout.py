@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+
+"""The layout of a drawing as columns of primitives, and the emitters that write it out.
+
+The drawing classes of timeline_ift_forks lay out their rects, lines and text into a
+Layout instead of making SVG elements. The geometry is then computed once, and any
+number of emitters can write it in their own format.
+
+Output:
+
+- SVG, through svgwrite (SVGEmitter), written element by element, or gzipped as .svgz (save_svg)
+- JSON with the columns of every layer (JSONEmitter)"""
+
+import copy
+import gzip
+import json
+from array import array
+from itertools import izip
+from collections import OrderedDict
+
+from events import StringCodes
+
+
+class Layout(object):
+    """Primitives in columns: kind, x0, y0, x1, y1, style and label.
+
+    A rect spans (x0, y0) to (x1, y1), a line goes from (x0, y0) to (x1, y1), and a text
+    is anchored at (x0, y0). style is the code of a tuple of (SVG attribute, value) pairs
+    in styles, and label the code of a string in labels; rects and lines have the label ''.
+
+    The factory methods take the arguments of svgwrite's, with the element's attributes
+    as keywords: stroke_width is stroke-width."""
+
+    RECT, LINE, TEXT = range(3)
+    KINDS = ['rect', 'line', 'text']
+    COLUMNS = ['kind', 'x0', 'y0', 'x1', 'y1', 'style', 'label']
+
+    def __init__(self, styles=None, labels=None):
+        self.kind = array('B')
+        self.x0 = array('d')
+        self.y0 = array('d')
+        self.x1 = array('d')
+        self.y1 = array('d')
+        self.style = array('l')
+        self.label = array('l')
+
+        # Pass the tables of another layout to share their codes with it.
+        self.styles = styles or StringCodes()
+        self.labels = labels or StringCodes()
+
+    def __len__(self):
+        return len(self.kind)
+
+    def _add(self, kind, x0, y0, x1, y1, attributes, label=''):
+        self.kind.append(kind)
+        self.x0.append(x0)
+        self.y0.append(y0)
+        self.x1.append(x1)
+        self.y1.append(y1)
+        style = tuple(sorted((k.rstrip('_').replace('_', '-'), v) for k, v in attributes.items()))
+        self.style.append(self.styles.code(style))
+        self.label.append(self.labels.code(label))
+
+    def rect(self, insert, size, **attributes):
+        x, y = insert
+        self._add(Layout.RECT, x, y, x + size[0], y + size[1], attributes)
+
+    def line(self, start, end, **attributes):
+        self._add(Layout.LINE, start[0], start[1], end[0], end[1], attributes)
+
+    def text(self, text, insert, **attributes):
+        self._add(Layout.TEXT, insert[0], insert[1], insert[0], insert[1], attributes, unicode(text))
+
+    def append(self, other, dx=0, dy=0):
+        """Adds the primitives of another layout, moved by (dx, dy). Their styles and labels
+        are coded again in the tables of this layout."""
+        styles = [self.styles.code(s) for s in other.styles.values]
+        labels = [self.labels.code(l) for l in other.labels.values]
+        self.kind.extend(other.kind)
+        self.x0.extend(x + dx for x in other.x0)
+        self.y0.extend(y + dy for y in other.y0)
+        self.x1.extend(x + dx for x in other.x1)
+        self.y1.extend(y + dy for y in other.y1)
+        self.style.extend(styles[s] for s in other.style)
+        self.label.extend(labels[l] for l in other.label)
+
+    def primitives(self):
+        """(kind, x0, y0, x1, y1, style, label) for each primitive, with the style as a dict
+        of SVG attributes and the label as a string."""
+        styles = [dict(s) for s in self.styles.values]
+        labels = self.labels.values
+        for kind, x0, y0, x1, y1, style, label in izip(*[getattr(self, c) for c in Layout.COLUMNS]):
+            yield kind, x0, y0, x1, y1, styles[style], labels[label]
+
+
+def _number(value):
+    """A coordinate as it is written out: rounded to the millisecond, and without a
+    fraction when it is whole."""
+    value = round(value, 3)
+    if value == int(value):
+        return int(value)
+    return value
+
+
+class SVGEmitter(object):
+    """Adds layouts to an svgwrite Drawing, each in its own group.
+
+    With classes, the styles of a layout are written once, as CSS rules in the drawing,
+    and each element refers to its rule by class. Attributes that are not CSS properties,
+    such as dy, stay on the elements. The class names are only unique within a layout, so
+    use classes for a drawing of one layout, such as one stitched with Layout.append."""
+
+    # The style attributes that are also CSS properties.
+    CSS_PROPERTIES = set(['fill', 'fill-opacity', 'opacity', 'stroke', 'stroke-width', 'stroke-opacity',
+        'stroke-dasharray', 'font-family', 'font-size', 'text-anchor'])
+
+    def __init__(self, drawing, classes=False):
+        self.drawing = drawing
+        self.classes = classes
+
+    def _class_styles(self, layout):
+        """The attributes left on the elements of each style, with the class of the style."""
+        styles = []
+        rules = []
+        for code, style in enumerate(layout.styles.values):
+            name = "s%d" % code
+            rules.append(".%s { %s }" % (name, "; ".join("%s: %s" % (k, v) for k, v in style if k in SVGEmitter.CSS_PROPERTIES)))
+            attributes = dict((k, v) for k, v in style if k not in SVGEmitter.CSS_PROPERTIES)
+            attributes['class'] = name
+            styles.append(attributes)
+        self.drawing.defs.add(self.drawing.style("\n".join(rules)))
+        return styles
+
+    def group(self, layout, top=0):
+        """A group of the primitives of layout, moved down by top."""
+        svg = self.drawing
+        group = svg.g()
+        if top:
+            group.translate(0, top)
+
+        primitives = layout.primitives()
+        if self.classes:
+            styles = self._class_styles(layout)
+            primitives = ((k, x0, y0, x1, y1, styles[s], layout.labels.values[l])
+                for k, x0, y0, x1, y1, s, l in izip(*[getattr(layout, c) for c in Layout.COLUMNS]))
+
+        for kind, x0, y0, x1, y1, style, label in primitives:
+            if kind == Layout.RECT:
+                element = svg.rect(insert=(_number(x0), _number(y0)), size=(_number(x1 - x0), _number(y1 - y0)), **style)
+            elif kind == Layout.LINE:
+                element = svg.line(start=(_number(x0), _number(y0)), end=(_number(x1), _number(y1)), **style)
+            else:
+                element = svg.text(label, insert=(_number(x0), _number(y0)), **style)
+            group.add(element)
+        return group
+
+    def emit(self, layers, clip=None):
+        """Adds a group for each (top, layout) of layers. clip is an optional (x, y, width,
+        height) that the groups are clipped to."""
+        parent = self.drawing
+        if clip:
+            x, y, width, height = clip
+            clip_path = self.drawing.defs.add(self.drawing.clipPath(id="window"))
+            clip_path.add(self.drawing.rect(insert=(x, y), size=(width, height)))
+            parent = self.drawing.add(self.drawing.g(clip_path="url(#window)"))
+
+        for top, layout in layers:
+            parent.add(self.group(layout, top))
+
+
+# The elements that write_svg streams child by child. Others are written whole.
+_STREAMED = set(['svg', 'g'])
+
+_STYLESHEET = '<?xml-stylesheet href="%s" type="text/css" title="%s" alternate="%s" media="%s"?>\n'
+
+
+def _write_element(element, f):
+    if element.elementname not in _STREAMED:
+        f.write(element.tostring().encode('utf-8'))
+        return
+
+    # The tags of the element without its children, which svgwrite writes as <g ... />.
+    empty = copy.copy(element)
+    empty.elements = []
+    tag = empty.tostring().encode('utf-8')
+    if not tag.endswith(' />'):
+        f.write(tag)
+        return
+    f.write(tag[:-3] + '>')
+    for child in element.elements:
+        _write_element(child, f)
+    f.write('</%s>' % element.elementname)
+
+
+def write_svg(drawing, f):
+    """Writes an svgwrite Drawing to f as drawing.write does, but one element at a time
+    instead of building the whole document as one string first."""
+    f.write('<?xml version="1.0" encoding="utf-8" ?>\n')
+    for stylesheet in drawing._stylesheets:
+        f.write(_STYLESHEET % stylesheet)
+    _write_element(drawing, f)
+
+
+def save_svg(drawing, filename, level=6):
+    """Writes drawing to filename, through gzip at compression level 1-9 when filename
+    ends in .svgz. The gzip header has no timestamp, so the same drawing makes the same file."""
+    if filename.endswith('.svgz'):
+        f = gzip.GzipFile(filename, 'wb', level, mtime=0)
+    else:
+        f = open(filename, 'wb')
+    with f:
+        write_svg(drawing, f)
+
+
+class JSONEmitter(object):
+    """Writes layouts as JSON: the size of the drawing, and for each layer its top, its
+    styles and labels, and its columns."""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+    def _layer(self, top, layout):
+        layer = OrderedDict()
+        layer['top'] = top
+        layer['styles'] = [OrderedDict(s) for s in layout.styles.values]
+        layer['labels'] = layout.labels.values
+        for column in Layout.COLUMNS:
+            layer[column] = [_number(v) for v in getattr(layout, column)]
+        return layer
+
+    def dump(self, layers, f):
+        drawing = OrderedDict()
+        drawing['width'] = self.width
+        drawing['height'] = self.height
+        drawing['kinds'] = Layout.KINDS
+        drawing['layers'] = [self._layer(top, layout) for top, layout in layers]
+        json.dump(drawing, f, separators=(',', ':'))
+
+    def save(self, layers, filename):
+        with open(filename, 'w') as f:
+            self.dump(layers, f)
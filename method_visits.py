@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+"""Measures how long participants stayed in each method, and where they went next.
+
+A visit is a run of consecutive commands in the same method, as MethodBar draws it.
+It lasts from its first command to the first command of the next visit; the last
+visit of a participant ends at their last command. The visits of every participant
+are kept in columns, so dwell times, transitions and revisits are grouped counts over
+them rather than walks over the commands.
+
+Output:
+
+- A tab-separated file with one row per visit, ex: method_visits.txt
+- A tab-separated file of method to method transition counts, ex: method_transitions.txt
+- A JSON file with dwell times per method and file, transitions and revisits, for each
+  participant and over everyone, ex: method_visits.json"""
+
+import os
+import json
+from collections import Counter, OrderedDict
+from itertools import izip
+
+from events import DataLoader, Command, ParticipantData, ParticipantTable, PARTICIPANTS
+from timeline_ift_forks import Timeline
+
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+class MethodVisits(ParticipantTable):
+    """Every method visit of every participant, one list per column.
+
+    start and dwell are in seconds, start relative to the participant's first coded
+    segment. Commands from before that segment count as made at its start, as in
+    MethodsSection. file is the part of the method name before its colon."""
+
+    COLUMNS = ['participant', 'method', 'file', 'start', 'dwell', 'commands']
+
+    @staticmethod
+    def method_file(method):
+        return method.split(':', 1)[0]
+
+    def add(self, data):
+        """Adds the visits of a ParticipantData, as its SegmentTable finds them."""
+        pid, coded_events, commands = data.pid, data.coded_events, data.commands
+        if not coded_events or not commands:
+            return
+        start = coded_events[0]['Time']
+
+        def seconds(i):
+            return max(0.0, (commands[i]['Time'] - start).total_seconds())
+
+        # The first command of each visit, and the position after the last command.
+        firsts = data.segment_table().visit_starts
+        ends = list(firsts[1:]) + [len(commands)]
+        for first, end in izip(firsts, ends):
+            method = Command.method_name(commands[first])
+            self.participant.append(pid)
+            self.method.append(method)
+            self.file.append(MethodVisits.method_file(method))
+            self.start.append(seconds(first))
+            self.dwell.append(seconds(min(end, len(commands) - 1)) - seconds(first))
+            self.commands.append(end - first)
+
+    @staticmethod
+    def load(p):
+        return ParticipantData(p, DataLoader.load_codedevents(p), DataLoader.load_commands(p), [])
+
+    def dwell_times(self, column='method'):
+        """Visits, total and median dwell seconds for each value of a column, for each
+        participant and over everyone ('all'), with the longest total first."""
+        groups = {}
+        for p, key, dwell in izip(self.participant, getattr(self, column), self.dwell):
+            groups.setdefault((p, key), []).append(dwell)
+            groups.setdefault(('all', key), []).append(dwell)
+
+        def stats(dwells):
+            return OrderedDict([('visits', len(dwells)), ('seconds', round(sum(dwells), 3)),
+                ('median_seconds', round(_median(dwells), 3))])
+
+        by_participant = OrderedDict((p, {}) for p in sorted(set(self.participant)) + ['all'])
+        for (p, key), dwells in groups.iteritems():
+            by_participant[p][key] = stats(dwells)
+        for p, keys in by_participant.items():
+            by_participant[p] = OrderedDict(sorted(keys.items(), key=lambda (k, s): (-s['seconds'], k)))
+        return by_participant
+
+    def transitions(self):
+        """Counts of (participant, from method, to method) for consecutive visits."""
+        p = self.participant
+        m = self.method
+        return Counter((a, x, y) for a, b, x, y in izip(p, p[1:], m, m[1:]) if a == b)
+
+    def revisits(self):
+        """For each participant and method, how many of its visits came back to it."""
+        visits = Counter(izip(self.participant, self.method))
+        return Counter(dict((key, n - 1) for key, n in visits.iteritems() if n > 1))
+
+    def summary(self):
+        transitions = self.transitions()
+        revisits = self.revisits()
+        by_method = self.dwell_times('method')
+        by_file = self.dwell_times('file')
+
+        summary = OrderedDict()
+        for p in by_method:
+            pooled = p == 'all'
+            summary[p] = OrderedDict()
+            summary[p]['visits'] = sum(s['visits'] for s in by_method[p].values())
+            summary[p]['by_method'] = by_method[p]
+            summary[p]['by_file'] = by_file[p]
+
+            counts = Counter()
+            for (a, x, y), n in transitions.iteritems():
+                if pooled or a == p:
+                    counts[(x, y)] += n
+            summary[p]['transitions'] = [[x, y, n] for (x, y), n in sorted(counts.items(), key=lambda (k, n): (-n, k))]
+
+            revisited = Counter()
+            for (a, m), n in revisits.iteritems():
+                if pooled or a == p:
+                    revisited[m] += n
+            summary[p]['revisits'] = OrderedDict(sorted(revisited.items(), key=lambda (m, n): (-n, m)))
+        return summary
+
+    def write_transitions(self, filename):
+        with open(filename, 'w') as f:
+            f.write('participant\tfrom\tto\tcount\n')
+            for (p, x, y), n in sorted(self.transitions().items()):
+                f.write("%s\t%s\t%s\t%d\n" % (p, x, y, n))
+
+    def write_json(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(OrderedDict((str(p), s) for p, s in self.summary().items()), f, indent=2)
+
+
+if __name__ == "__main__":
+    participants = PARTICIPANTS
+    output_dir = Timeline.OUTPUT_DIR
+
+    visits = MethodVisits.from_participants(participants)
+    visits.write_tab(os.path.join(output_dir, "method_visits.txt"))
+    visits.write_transitions(os.path.join(output_dir, "method_transitions.txt"))
+    visits.write_json(os.path.join(output_dir, "method_visits.json"))
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+
+"""Draws a summary strip of every participant's session, all on one sheet, for triage.
+
+Each strip has a cell per 30 second segment in three rows: foraging, the outcome of the
+segment's first fork, and how often the participant switched methods in it. Runs of
+equal cells are drawn as one rect. The strips are laid out in worker processes and
+stitched into one Layout, so the sheet's styles are written once.
+
+Output:
+
+- An SVG and a PNG of the sheet, ex: overview.svg, overview.png"""
+
+import os
+import multiprocessing
+
+import svgwrite
+
+from events import ParticipantData, PARTICIPANTS
+from fork_outcomes import ForkTable
+from layout import Layout, SVGEmitter, save_svg
+from raster import PNGEmitter
+from timeline_ift_forks import EventLine, ForkOutcomeSegment, MethodVisitsSection, Timeline
+
+
+class SummaryStrip(object):
+    """Lays out the strip of one participant, with y = 0 at the top of the strip."""
+
+    CELL_WIDTH = 3
+    ROW_HEIGHT = 6
+    ROWS = 3
+    HEIGHT = ROWS * ROW_HEIGHT
+    LABEL_WIDTH = 40
+
+    # The fill of a segment by its number of method switches: the first ramp entry whose
+    # limit is at least the number. The same as the timeline's visits per segment.
+    SWITCH_RAMP = MethodVisitsSection.RAMP
+
+    def __init__(self, data):
+        self.data = data
+
+    def foraging_fills(self):
+        return ['beige' if e['Foraging'] else 'white' for e in self.data.coded_events]
+
+    def outcome_fills(self):
+        fills = []
+        for event in self.data.coded_events:
+            forks = [f for f in event['Forks'] if f.name not in ForkTable.NOT_FORKS]
+            fills.append(ForkOutcomeSegment.success_fill(forks[0]) if forks else 'white')
+        return fills
+
+    def method_switches(self):
+        """The number of times the method changed from one command to the next, per segment:
+        the method visits that start in it, but for the participant's first."""
+        switches = list(self.data.segment_table().visits)
+        first = self.data.command_segments()[0] if self.data.commands else -1
+        if first >= 0:
+            switches[first] -= 1
+        return switches
+
+    @staticmethod
+    def switch_fill(n):
+        for limit, fill in SummaryStrip.SWITCH_RAMP:
+            if limit is None or n <= limit:
+                return fill
+
+    def _draw_row(self, layout, row, fills):
+        """One rect per run of equal fills. White runs are left as background."""
+        start = 0
+        for i in range(1, len(fills) + 1):
+            if i == len(fills) or fills[i] != fills[start]:
+                if fills[start] != 'white':
+                    layout.rect(
+                        insert=(SummaryStrip.LABEL_WIDTH + start * SummaryStrip.CELL_WIDTH, row * SummaryStrip.ROW_HEIGHT),
+                        size=((i - start) * SummaryStrip.CELL_WIDTH, SummaryStrip.ROW_HEIGHT),
+                        fill=fills[start])
+                start = i
+
+    def lay_out(self):
+        layout = Layout()
+        self._draw_row(layout, 0, self.foraging_fills())
+        self._draw_row(layout, 1, self.outcome_fills())
+        self._draw_row(layout, 2, [SummaryStrip.switch_fill(n) for n in self.method_switches()])
+        layout.text("P%02d" % self.data.pid,
+            insert=(0, SummaryStrip.HEIGHT - 4),
+            font_family="sans-serif",
+            font_size="10")
+        return layout
+
+
+def _lay_out_strip(pid):
+    """The strip of a participant, or the error that stopped it from loading. Runs in a worker process."""
+    try:
+        return pid, SummaryStrip(ParticipantData.load(pid, EventLine.classify)).lay_out(), None
+    except Exception, e:
+        return pid, None, str(e)
+
+
+class OverviewSheet(object):
+    """The strips of many participants, one below the other, under a legend."""
+
+    GAP = 6
+    LEGEND_HEIGHT = 24
+
+    LEGEND = [('Foraging', 'beige'), ('Successful', 'palegreen'), ('Unsuccessful', 'orangered'),
+        ('NA', 'gold'), ('Method switches', SummaryStrip.SWITCH_RAMP[-1][1])]
+
+    def __init__(self):
+        self.layout = Layout()
+        self.strips = 0
+        self.segments = 0
+        self.errors = {}
+        self.legend_right = 0
+        self._draw_legend()
+
+    def _draw_legend(self):
+        x = SummaryStrip.LABEL_WIDTH
+        for label, fill in OverviewSheet.LEGEND:
+            self.layout.rect(insert=(x, 4), size=(10, 10), fill=fill, stroke="black", stroke_width=0.5)
+            self.layout.text(label, insert=(x + 14, 13), font_family="sans-serif", font_size="10")
+            self.legend_right = x + 14 + 6 * len(label)
+            x += 30 + 6 * len(label)
+
+    @property
+    def width(self):
+        """As wide as the longest strip or the legend, whichever is wider."""
+        strips_right = SummaryStrip.LABEL_WIDTH + self.segments * SummaryStrip.CELL_WIDTH
+        return max(self.legend_right, strips_right) + Timeline.X_MARGIN
+
+    @property
+    def height(self):
+        return OverviewSheet.LEGEND_HEIGHT + self.strips * (SummaryStrip.HEIGHT + OverviewSheet.GAP)
+
+    def add(self, strip):
+        top = self.height
+        self.layout.append(strip, dy=top)
+        self.strips += 1
+        right = max(strip.x1 or [SummaryStrip.LABEL_WIDTH])
+        self.segments = max(self.segments, int((right - SummaryStrip.LABEL_WIDTH) / SummaryStrip.CELL_WIDTH))
+
+    @staticmethod
+    def from_participants(participants, processes=None):
+        """Lays out the strips in that many worker processes, or in this one, and stitches
+        them together in the order of participants."""
+        if processes:
+            pool = multiprocessing.Pool(processes)
+            try:
+                strips = pool.map(_lay_out_strip, participants)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            strips = [_lay_out_strip(p) for p in participants]
+
+        sheet = OverviewSheet()
+        for pid, strip, error in strips:
+            if error:
+                sheet.errors[pid] = error
+            else:
+                sheet.add(strip)
+        return sheet
+
+    @staticmethod
+    def from_data(loaded):
+        """Lays out the strips of participants that are already loaded, in this process."""
+        sheet = OverviewSheet()
+        for data in loaded:
+            sheet.add(SummaryStrip(data).lay_out())
+        return sheet
+
+    def save_svg(self, filename):
+        drawing = svgwrite.Drawing(filename=filename, size=("%dpx" % self.width, "%dpx" % self.height))
+        drawing.add(SVGEmitter(drawing, classes=True).group(self.layout))
+        save_svg(drawing, filename)
+
+    def save_png(self, filename, scale=1.0):
+        emitter = PNGEmitter(self.width, self.height, scale)
+        emitter.emit([(0, self.layout)])
+        emitter.save(filename)
+
+
+if __name__ == "__main__":
+    participants = PARTICIPANTS
+
+    sheet = OverviewSheet.from_participants(participants, processes=multiprocessing.cpu_count())
+    for pid in participants:
+        if pid in sheet.errors:
+            print "Could not load P%02d: %s" % (pid, sheet.errors[pid])
+
+    sheet.save_svg(os.path.join(Timeline.OUTPUT_DIR, "overview.svg"))
+    sheet.save_png(os.path.join(Timeline.OUTPUT_DIR, "overview.png"))
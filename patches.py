@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+"""Summarizes where participants foraged: the patches of their feature rows.
+
+A patch type is the part of a feature's Patch before its colon, such as Editor,
+Package Explorer or Stack Trace, as PatchBar labels it. Every feature row of every
+participant is kept in columns, so time per patch, switches between patches and the
+outcomes and feature types seen in each patch are grouped counts over them.
+
+Output:
+
+- A tab-separated file with one row per feature, ex: patches.txt
+- A JSON file with time per patch type, patch switches and transitions, and the fork
+  outcomes and feature types of each patch type, ex: patches.json"""
+
+import os
+import json
+from collections import Counter, OrderedDict
+from itertools import izip
+
+from events import DataLoader, Feature, ParticipantData, ParticipantTable, PARTICIPANTS
+from fork_outcomes import ForkTable, _with_string_keys
+from timeline_ift_forks import Timeline
+
+
+class PatchTable(ParticipantTable):
+    """Every feature row of every participant, one list per column, in order of start
+    within each participant.
+
+    start is in seconds relative to the participant's first coded segment, and seconds
+    is how long the feature lasted. success is the outcome of the first real fork of the
+    feature's segment, or None when it has none."""
+
+    COLUMNS = ['participant', 'fork', 'patch', 'start', 'seconds', 'feature_type', 'success']
+
+    @staticmethod
+    def _outcome(coded_event):
+        for fork in coded_event['Forks']:
+            if fork.name not in ForkTable.NOT_FORKS:
+                return fork.success
+        return None
+
+    def add(self, data):
+        """Adds the features of a ParticipantData."""
+        if not data.coded_events:
+            return
+        start = data.start_time
+        outcomes = [PatchTable._outcome(e) for e in data.coded_events]
+        segments = data.feature_segments()
+
+        for i in sorted(xrange(len(data.features)), key=lambda i: data.features[i]['Start']):
+            f = data.features[i]
+            self.participant.append(data.pid)
+            self.fork.append(f['Fork'])
+            self.patch.append(Feature.patch_type(f['Patch']))
+            self.start.append((f['Start'] - start).total_seconds())
+            self.seconds.append((f['End'] - f['Start']).total_seconds())
+            self.feature_type.append(f['FeatureType'])
+            self.success.append(outcomes[segments[i]] if segments[i] >= 0 else None)
+
+    @staticmethod
+    def load(p):
+        return ParticipantData(p, DataLoader.load_codedevents(p), [], DataLoader.load_feature_types(p))
+
+    def time_per_patch(self):
+        """Features and seconds per patch type, for each participant and over everyone
+        ('all'), with the most time first."""
+        features = Counter()
+        seconds = Counter()
+        for p, patch, s in izip(self.participant, self.patch, self.seconds):
+            for key in ((p, patch), ('all', patch)):
+                features[key] += 1
+                seconds[key] += s
+
+        by_participant = OrderedDict((p, []) for p in sorted(set(self.participant)) + ['all'])
+        for (p, patch), n in features.iteritems():
+            by_participant[p].append((patch, OrderedDict([('features', n), ('seconds', round(seconds[(p, patch)], 3))])))
+        for p, patches in by_participant.items():
+            by_participant[p] = OrderedDict(sorted(patches, key=lambda (patch, s): (-s['seconds'], patch)))
+        return by_participant
+
+    def transitions(self):
+        """Counts of (participant, from patch, to patch) for consecutive features in
+        different patch types."""
+        p = self.participant
+        patch = self.patch
+        return Counter((a, x, y) for a, b, x, y in izip(p, p[1:], patch, patch[1:]) if a == b and x != y)
+
+    def outcomes(self):
+        """The fork outcomes of the features in each patch type."""
+        counts = Counter(izip(self.patch, self.success))
+        outcomes = OrderedDict()
+        for patch in sorted(set(self.patch)):
+            outcomes[patch] = OrderedDict((str(s), counts[(patch, s)]) for s in ('successful', 'unsuccessful', 'NA', None))
+        return outcomes
+
+    def feature_types(self):
+        """How many features of each patch type have each feature type. The rows are
+        counted by distinct (patch, mask) first, as in FeatureTypeCooccurrence."""
+        counts = {}
+        for (patch, mask), n in Counter(izip(self.patch, self.feature_type)).iteritems():
+            types = counts.setdefault(patch, Counter())
+            for i in Feature.bits(mask):
+                types[Feature.FEATURE_TYPES[i]] += n
+        return OrderedDict((patch, OrderedDict(sorted(counts[patch].items(), key=lambda (t, n): (-n, t))))
+            for patch in sorted(counts))
+
+    def summary(self):
+        transitions = self.transitions()
+        switches = Counter()
+        pooled = Counter()
+        for (p, x, y), n in transitions.iteritems():
+            switches[p] += n
+            pooled[(x, y)] += n
+
+        summary = OrderedDict()
+        summary['features'] = len(self)
+        summary['time'] = self.time_per_patch()
+        summary['switches'] = OrderedDict((p, switches[p]) for p in sorted(set(self.participant)))
+        summary['switches']['all'] = sum(switches.values())
+        summary['transitions'] = [[x, y, n] for (x, y), n in sorted(pooled.items(), key=lambda (k, n): (-n, k))]
+        summary['outcomes'] = self.outcomes()
+        summary['feature_types'] = self.feature_types()
+        return summary
+
+    def write_json(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(_with_string_keys(self.summary()), f, indent=2)
+
+
+if __name__ == "__main__":
+    participants = PARTICIPANTS
+    output_dir = Timeline.OUTPUT_DIR
+
+    table = PatchTable.from_participants(participants)
+    table.write_tab(os.path.join(output_dir, "patches.txt"))
+    table.write_json(os.path.join(output_dir, "patches.json"))
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+
+"""Draws layouts into a pixel buffer and writes it as a PNG, with nothing but the
+standard library, for quick thumbnails of many participants.
+
+Rects and lines are drawn; text is left out, or drawn as a small marker at its anchor.
+Each color channel is a bytearray of its own, so that blending a row of a rect is one
+bytearray.translate through a table of the blended values.
+
+Output:
+
+- A PNG thumbnail of each participant's timeline, ex: 02-forks.png"""
+
+import os
+import zlib
+import struct
+
+from layout import Layout
+
+
+# The SVG color names used by the timelines.
+COLORS = {
+    'beige': (245, 245, 220), 'black': (0, 0, 0), 'blue': (0, 0, 255), 'brown': (165, 42, 42),
+    'cyan': (0, 255, 255), 'darkgreen': (0, 100, 0), 'darkolivegreen': (85, 107, 47),
+    'darkseagreen': (143, 188, 143), 'darkslategrey': (47, 79, 79), 'deeppink': (255, 20, 147),
+    'gold': (255, 215, 0), 'green': (0, 128, 0), 'greenyellow': (173, 255, 47),
+    'grey': (128, 128, 128), 'indigo': (75, 0, 130), 'lightgray': (211, 211, 211),
+    'lightgreen': (144, 238, 144), 'lightsalmon': (255, 160, 122), 'lime': (0, 255, 0),
+    'magenta': (255, 0, 255), 'maroon': (128, 0, 0), 'mediumvioletred': (199, 21, 133),
+    'midnightblue': (25, 25, 112), 'olive': (128, 128, 0), 'olivedrab': (107, 142, 35),
+    'orange': (255, 165, 0), 'orangered': (255, 69, 0), 'orchid': (218, 112, 214),
+    'palegreen': (152, 251, 152), 'peachpuff': (255, 218, 185), 'pink': (255, 192, 203),
+    'red': (255, 0, 0), 'salmon': (250, 128, 114), 'seagreen': (46, 139, 87),
+    'skyblue': (135, 206, 235), 'slateblue': (106, 90, 205), 'springgreen': (0, 255, 127),
+    'steelblue': (70, 130, 180), 'tomato': (255, 99, 71), 'turquoise': (64, 224, 208),
+    'white': (255, 255, 255), 'yellow': (255, 255, 0),
+}
+
+
+def parse_color(color):
+    """An (r, g, b) tuple for a color name or #rrggbb. Unknown colors are grey."""
+    if color.startswith('#') and len(color) == 7:
+        return tuple(int(color[i:i + 2], 16) for i in (1, 3, 5))
+    return COLORS.get(color, COLORS['grey'])
+
+
+class Raster(object):
+    """An RGB image as three planes, one bytearray per channel, row after row."""
+
+    def __init__(self, width, height, background='white'):
+        self.width = width
+        self.height = height
+        self.planes = [bytearray(chr(c)) * (width * height) for c in parse_color(background)]
+        self._tables = {}
+
+    def _table(self, value, alpha):
+        """The translate table that blends value over each possible byte with alpha."""
+        key = (value, alpha)
+        try:
+            return self._tables[key]
+        except KeyError:
+            table = str(bytearray(int(round(value * alpha + b * (1 - alpha))) for b in range(256)))
+            self._tables[key] = table
+            return table
+
+    def fill(self, x0, y0, x1, y1, color, alpha=1.0):
+        """Fills the pixels [x0, x1) x [y0, y1), clipped to the image."""
+        x0, x1 = max(0, x0), min(self.width, x1)
+        y0, y1 = max(0, y0), min(self.height, y1)
+        if x0 >= x1 or y0 >= y1 or alpha <= 0:
+            return
+
+        n = x1 - x0
+        for plane, value in zip(self.planes, color):
+            if alpha >= 1:
+                run = bytearray(chr(value)) * n
+                for y in range(y0, y1):
+                    start = y * self.width + x0
+                    plane[start:start + n] = run
+            else:
+                table = self._table(value, alpha)
+                for y in range(y0, y1):
+                    start = y * self.width + x0
+                    plane[start:start + n] = plane[start:start + n].translate(table)
+
+    def rows(self):
+        """The image as PNG scanlines: filter type 0, then r, g, b for each pixel."""
+        width = self.width
+        red, green, blue = self.planes
+        for y in range(self.height):
+            start = y * width
+            row = bytearray(3 * width + 1)
+            row[1::3] = red[start:start + width]
+            row[2::3] = green[start:start + width]
+            row[3::3] = blue[start:start + width]
+            yield row
+
+    def write_png(self, f, level=6):
+        def chunk(tag, data):
+            f.write(struct.pack('>I', len(data)))
+            f.write(tag)
+            f.write(data)
+            f.write(struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
+
+        compressor = zlib.compressobj(level)
+        data = [compressor.compress(str(row)) for row in self.rows()]
+        data.append(compressor.flush())
+
+        f.write('\x89PNG\r\n\x1a\n')
+        chunk('IHDR', struct.pack('>IIBBBBB', self.width, self.height, 8, 2, 0, 0, 0))
+        chunk('IDAT', ''.join(data))
+        chunk('IEND', '')
+
+
+def _float(value, default):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class PNGEmitter(object):
+    """Draws layouts into a Raster of a drawing's size times scale.
+
+    Lines are drawn as rects as thick as their stroke, at least one pixel, so only
+    horizontal and vertical lines are drawn. Dashes are drawn solid. With markers, each
+    text is a small square in its fill color at its anchor; otherwise text is left out."""
+
+    MARKER_SIZE = 2
+
+    def __init__(self, width, height, scale=0.5, markers=False):
+        self.scale = scale
+        self.markers = markers
+        self.raster = Raster(int(round(width * scale)), int(round(height * scale)))
+
+    def _pixels(self, x0, y0, x1, y1, top, clip):
+        if clip:
+            cx, cy, cw, ch = clip
+            x0, x1 = max(x0, cx), min(x1, cx + cw)
+            y0, y1 = max(y0 + top, cy) - top, min(y1 + top, cy + ch) - top
+        s = self.scale
+        return (int(round(x0 * s)), int(round((y0 + top) * s)),
+            int(round(x1 * s)), int(round((y1 + top) * s)))
+
+    def _draw(self, kind, x0, y0, x1, y1, style, top, clip):
+        if kind == Layout.RECT:
+            color = style.get('fill', 'black')
+            alpha = _float(style.get('opacity'), 1.0) * _float(style.get('fill-opacity'), 1.0)
+        elif kind == Layout.LINE:
+            color = style.get('stroke', 'black')
+            alpha = _float(style.get('opacity'), 1.0) * _float(style.get('stroke-opacity'), 1.0)
+            half = _float(style.get('stroke-width'), 1.0) / 2
+            if x0 == x1:
+                x0, x1 = x0 - half, x1 + half
+            elif y0 == y1:
+                y0, y1 = y0 - half, y1 + half
+            else:
+                return
+        elif self.markers:
+            color = style.get('fill', 'black')
+            alpha = 1.0
+            size = PNGEmitter.MARKER_SIZE / self.scale
+            x1, y0 = x0 + size, y0 - size
+        else:
+            return
+
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        px0, py0, px1, py1 = self._pixels(x0, y0, x1, y1, top, clip)
+
+        # Keep thin lines and bars visible when scaled down.
+        if px1 == px0 and x1 > x0:
+            px1 = px0 + 1
+        if py1 == py0 and y1 > y0:
+            py1 = py0 + 1
+        self.raster.fill(px0, py0, px1, py1, parse_color(color), alpha)
+
+    def emit(self, layers, clip=None):
+        """Draws each (top, layout) of layers. clip is an optional (x, y, width, height)."""
+        for top, layout in layers:
+            for kind, x0, y0, x1, y1, style, label in layout.primitives():
+                self._draw(kind, x0, y0, x1, y1, style, top, clip)
+
+    def save(self, filename, level=6):
+        with open(filename, 'wb') as f:
+            self.raster.write_png(f, level)
+
+
+if __name__ == "__main__":
+    from events import ParticipantData, PARTICIPANTS
+    from timeline_ift_forks import EventLine, Timeline
+
+    participants = PARTICIPANTS
+
+    for p in participants:
+        try:
+            timeline = Timeline.from_data(ParticipantData.load(p, EventLine.classify))
+        except IOError, e:
+            print "Could not load P%02d: %s" % (p, e)
+            continue
+        timeline.lay_out()
+        timeline.save_png(os.path.join(Timeline.OUTPUT_DIR, "%02d-forks.png" % p))
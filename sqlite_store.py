@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+
+"""Keeps the participants' commands, coded events and features in an indexed SQLite
+database, as a DataLoader backend.
+
+The tables hold the rows already converted, with times as milliseconds into the
+session, so loading a participant reads only that participant's rows and parses
+nothing. Time ranges are selected by SQL through the (participant, time) indexes.
+
+    DataLoader.backend = SQLiteBackend("../timeline_forks_data/data/timeline.db")
+
+Output:
+
+- A database of every participant's rows, built from the text files, ex: timeline.db"""
+
+import os
+import sqlite3
+from datetime import datetime, date, time, timedelta
+from itertools import groupby
+
+from events import DataLoader, Command, CodedEvent, Feature, Fork, PARTICIPANTS
+
+
+SCHEMA = """
+CREATE TABLE commands (participant INTEGER, command_id INTEGER, time INTEGER, command TEXT,
+    active_file TEXT, ast_method TEXT, eclipse_command TEXT, find TEXT, replace TEXT,
+    doc_offset INTEGER, line_of_code TEXT);
+CREATE INDEX commands_time ON commands (participant, time);
+
+CREATE TABLE coded_events (participant INTEGER, idx INTEGER, time INTEGER, foraging INTEGER);
+CREATE INDEX coded_events_time ON coded_events (participant, time);
+
+CREATE TABLE forks (participant INTEGER, idx INTEGER, ord INTEGER, name TEXT, goal TEXT, success TEXT);
+CREATE INDEX forks_idx ON forks (participant, idx);
+
+CREATE TABLE features (participant INTEGER, fork INTEGER, ord INTEGER, start_time INTEGER,
+    end_time INTEGER, feature_type INTEGER, patch TEXT);
+CREATE INDEX features_time ON features (participant, start_time);
+"""
+
+
+def _milliseconds(t):
+    """A time of the session as milliseconds since the start of its placeholder day."""
+    return ((t.hour * 60 + t.minute) * 60 + t.second) * 1000 + t.microsecond // 1000
+
+
+def _range(column, t0, t1):
+    """The SQL condition and parameters that select t0 <= column < t1."""
+    condition = ''
+    parameters = []
+    if t0 is not None:
+        condition += " AND %s >= ?" % column
+        parameters.append(_milliseconds(t0))
+    if t1 is not None:
+        condition += " AND %s < ?" % column
+        parameters.append(_milliseconds(t1))
+    return condition, parameters
+
+
+class SQLiteBackend(object):
+    """Loads the records of DataLoader from a database made by build."""
+
+    FILENAME = os.path.join(DataLoader.DIR, "timeline.db")
+
+    def __init__(self, filename=FILENAME):
+        self.filename = filename
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.connection.text_factory = str
+
+    def _times(self, column):
+        # Times are on today's date, as VideoTime gives them.
+        day = datetime.combine(date.today(), time())
+        return [day + timedelta(0, 0, 0, ms) for ms in column]
+
+    def participants(self):
+        return [row[0] for row in self.connection.execute(
+            "SELECT DISTINCT participant FROM coded_events ORDER BY participant")]
+
+    def load_commands(self, p, codes=None, t0=None, t1=None):
+        condition, parameters = _range('time', t0, t1)
+        rows = self.connection.execute(
+            "SELECT command_id, time, command, active_file, ast_method, eclipse_command, find, replace,"
+            " doc_offset, line_of_code FROM commands WHERE participant = ?" + condition + " ORDER BY rowid",
+            [p] + parameters).fetchall()
+        columns = zip(*rows) or [()] * (len(Command.FIELDS) - 1)
+        columns[1] = self._times(columns[1])
+        return Command.from_columns(columns, codes)
+
+    def load_codedevents(self, p, t0=None, t1=None):
+        condition, parameters = _range('time', t0, t1)
+        rows = self.connection.execute(
+            "SELECT idx, time, foraging FROM coded_events WHERE participant = ?" + condition + " ORDER BY rowid",
+            [p] + parameters).fetchall()
+        fork_rows = self.connection.execute(
+            "SELECT idx, ord, name, goal, success FROM forks WHERE participant = ? AND idx IN"
+            " (SELECT idx FROM coded_events WHERE participant = ?" + condition + ") ORDER BY rowid",
+            [p, p] + parameters).fetchall()
+        forks = dict((idx, [Fork(*f) for f in group]) for idx, group in groupby(fork_rows, lambda f: f[0]))
+
+        times = self._times([row[1] for row in rows])
+        events = []
+        for (idx, ms, foraging), t in zip(rows, times):
+            events.append(CodedEvent.from_record(CodedEvent.make_record(idx, t, bool(foraging), forks.get(idx, []))))
+        return events
+
+    def load_feature_types(self, p, t0=None, t1=None):
+        # Features overlap the range when they start before t1 and end after t0.
+        condition = ''
+        parameters = []
+        if t1 is not None:
+            condition += " AND start_time < ?"
+            parameters.append(_milliseconds(t1))
+        if t0 is not None:
+            condition += " AND end_time > ?"
+            parameters.append(_milliseconds(t0))
+        rows = self.connection.execute(
+            "SELECT fork, ord, start_time, end_time, feature_type, patch FROM features WHERE participant = ?"
+            + condition + " ORDER BY rowid", [p] + parameters).fetchall()
+        starts = self._times([row[2] for row in rows])
+        ends = self._times([row[3] for row in rows])
+        return [Feature.from_record(Feature.make_record(fork, order, start, end, feature_type, patch))
+            for (fork, order, s, e, feature_type, patch), start, end in zip(rows, starts, ends)]
+
+    @staticmethod
+    def build(filename=FILENAME, participants=PARTICIPANTS):
+        """Makes a database of the participants' text files, replacing filename. Participants
+        whose files are missing are left out. Returns the participants that were added."""
+        if os.path.exists(filename):
+            os.remove(filename)
+        connection = sqlite3.connect(filename)
+        connection.executescript(SCHEMA)
+
+        backend, DataLoader.backend = DataLoader.backend, None
+        added = []
+        try:
+            for p in participants:
+                try:
+                    coded_events = DataLoader.load_codedevents(p)
+                    commands = DataLoader.load_commands(p)
+                    features = DataLoader.load_feature_types(p)
+                except IOError, e:
+                    print "Could not load P%02d: %s" % (p, e)
+                    continue
+                SQLiteBackend._insert(connection, p, coded_events, commands, features)
+                added.append(p)
+        finally:
+            DataLoader.backend = backend
+        connection.commit()
+        connection.close()
+        return added
+
+    @staticmethod
+    def _insert(connection, p, coded_events, commands, features):
+        connection.executemany("INSERT INTO commands VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((p, c['CommandID'], _milliseconds(c['Time']), c['Command'], c['ActiveFile'], c['ASTMethod'],
+              c['EclipseCommand'], c['Find'], c['Replace'], c['DocOffset'], c['LineOfCode']) for c in commands))
+        connection.executemany("INSERT INTO coded_events VALUES (?, ?, ?, ?)",
+            ((p, e['Index'], _milliseconds(e['Time']), int(e['Foraging'])) for e in coded_events))
+
+        # Stored so that Fork turns them back into the same goal and success.
+        connection.executemany("INSERT INTO forks VALUES (?, ?, ?, ?, ?, ?)",
+            ((p, f.index, f.order, f.name, 'none' if f.goal is None else f.goal, f.success or '')
+                for e in coded_events for f in e['Forks']))
+        connection.executemany("INSERT INTO features VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((p, f['Fork'], f['Order'], _milliseconds(f['Start']), _milliseconds(f['End']), f['FeatureType'], f['Patch'])
+                for f in features))
+
+
+if __name__ == "__main__":
+    participants = PARTICIPANTS
+
+    added = SQLiteBackend.build(SQLiteBackend.FILENAME, participants)
+    print "Wrote P%s to %s" % (", P".join("%02d" % p for p in added), SQLiteBackend.FILENAME)
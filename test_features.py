@@ -52,5 +52,679 @@ class TestFeatureTypeExtraction(unittest.TestCase):
         self.assertEquals(p2[1].tab(), "5	1	00:12:33.000	00:13:22.000	Editor: FoldPainter.java	Method arguments/return type	Domain Text	Comments")
 
 
+class TestBulkParsing(unittest.TestCase):
+
+    def setUp(self):
+        self.command_lines = [
+            '2\t1\t11:00.250\tFileOpenCommand\tFoldPainter.java\tnull\t\t\t\t0\t""',
+            '2\tX\t11:01.000\tSelectTextCommand\tFoldPainter.java\tnull\t\t\t\t0\t""',
+            '2\t3\t11:02.000\tInsert\tFoldPainter.java\tnull\t\t\t\t12\t"int x;"',
+            '2\t4\t11:03',
+        ]
+
+    def test_bulk_matches_per_row(self):
+        rows = [self.command_lines[0].split('\t', len(Command.FIELDS))]
+        bulk = Command.parse_rows(rows, [3], ParseReport())
+        self.assertEquals(bulk[0].record, Command(self.command_lines[0]).record)
+
+    def test_bad_rows_are_reported(self):
+        report = ParseReport('p02-commands.txt')
+        rows = [line.split('\t', len(Command.FIELDS)) for line in self.command_lines]
+        commands = Command.parse_rows(rows, [3, 4, 5, 6], report)
+
+        self.assertEquals([c['CommandID'] for c in commands], [1, 3])
+        self.assertEquals(commands[1]['LineOfCode'], 'int x;')
+        self.assertEquals(report.lines(), [4, 6])
+        self.assertEquals(str(report), 'p02-commands.txt: 2 rows skipped (lines 4, 6)')
+
+    def test_mapped_matches_rows(self):
+        report = ParseReport()
+        commands = Command.parse_mapped('h\nstart\n' + '\n'.join(self.command_lines) + '\n', 2, report)
+
+        self.assertEquals([c['CommandID'] for c in commands], [1, 3])
+        self.assertEquals(commands[1].table.columns['LineOfCode'].__class__, MappedColumn)
+        self.assertEquals(commands[1]['LineOfCode'], 'int x;')
+        self.assertEquals(commands[1].record['LineOfCode'], 'int x;')
+        self.assertEquals(commands[0].record, Command(self.command_lines[0]).record)
+        self.assertEquals(report.lines(), [4, 6])
+
+    def test_mapped_in_chunks(self):
+        text = 'h\nstart\n' + '\n'.join(self.command_lines[0:3] * 3) # No newline after the last row
+        chunk = Command.MAPPED_CHUNK
+        try:
+            Command.MAPPED_CHUNK = 2
+            commands = Command.parse_mapped(text, 2, ParseReport())
+        finally:
+            Command.MAPPED_CHUNK = chunk
+        self.assertEquals([c.record for c in commands], [c.record for c in Command.parse_mapped(text, 2, ParseReport())])
+        self.assertEquals([c['LineOfCode'] for c in commands], ['', 'int x;'] * 3)
+
+    def test_bad_forks_keep_segment_position(self):
+        line = '12\t16:30.0\t\t1\t\t\t\t\t\t\t\t\t\t\tERROR\t\tnone\tNA\t'
+        report = ParseReport()
+        events = CodedEvent.parse_rows([line.split('\t')], [14], report)
+
+        self.assertEquals(events[0]['Index'], 12)
+        self.assertEquals(events[0]['Forks'], [])
+        self.assertEquals(report.lines(), [14])
+
+    def test_short_coded_rows_are_padded(self):
+        report = ParseReport('p02-coded.txt')
+        events = CodedEvent.parse_rows(['13\t17:00.0\t\t1'.split('\t')], [15], report)
+
+        self.assertEquals((events[0]['Index'], events[0]['Foraging'], events[0]['Forks']), (13, True, []))
+        self.assertEquals((report.lines(), report.padded_lines()), ([], [15]))
+        self.assertEquals(list(report), [(15, 'row', 'expected 18 fields, found 4')])
+        self.assertEquals(len(report), 1)
+        self.assertEquals(str(report), 'p02-coded.txt: 1 rows padded (lines 15)')
+
+    def test_row_messages_go_to_the_report(self):
+        report = ParseReport()
+        command = Command(self.command_lines[1], report, 4)
+
+        self.assertTrue(command.record['error'])
+        self.assertEquals(report.lines(), [4])
+
+
+class TestCommandCodes(unittest.TestCase):
+
+    FOLD_PAINTER = 'Lorg/gjt/sp/jedit/textarea/FoldPainter;.paintFoldStart(Ljava/awt/Graphics2D;II)V'
+    BUFFER = 'Lorg/gjt/sp/jedit/Buffer;.insert(ILjava/lang/String;)V'
+
+    def commands(self, pid, methods, codes):
+        lines = ['%d\t%d\t11:%02d.000\tInsert\t%s\t%s\t\t\t\t0\t""' % (pid, i, i, active_file, ast_method)
+            for i, (active_file, ast_method) in enumerate(methods)]
+        return Command.parse_rows([line.split('\t', len(Command.FIELDS)) for line in lines], range(len(lines)), ParseReport(), codes)
+
+    def setUp(self):
+        codes = CommandCodes()
+        self.p2 = self.commands(2, [('FoldPainter.java', self.FOLD_PAINTER), ('TextArea.java', 'null'),
+            ('Buffer.java', self.BUFFER)], codes)
+        self.p3 = self.commands(3, [('Buffer.java', self.BUFFER), ('TextArea.java', 'null'),
+            ('FoldPainter.java', self.FOLD_PAINTER), ('FoldPainter.java', 'null')], codes)
+        self.uncoded = self.commands(3, [('Buffer.java', self.BUFFER), ('TextArea.java', 'null')], None)
+
+    def test_shared_codes_give_same_method_codes(self):
+        self.assertEquals([c.method_code for c in self.p2], [self.p3[2].method_code, self.p3[1].method_code, self.p3[0].method_code])
+        for a in self.p2:
+            for b in self.p3:
+                # The names parsed from the records, without the codes.
+                self.assertEquals(a.method_code == b.method_code, Command.method_name(a.record) == Command.method_name(b.record))
+
+    def test_classified_once_per_pair(self):
+        calls = []
+        def kind(command):
+            calls.append(command['Command'])
+            return command['Command'].lower()
+        classify = PairClassifier(kind)
+        commands = self.p2 + self.p3 + self.uncoded + [Command('2\t9\t11:09.000\tInsert\tX.java\tnull\t\t\t\t0\t""')]
+
+        self.assertEquals(set(classify(c) for c in commands), set(['insert']))
+        # Once by the code shared by P02 and P03, once by that of the other codes, once by the strings.
+        self.assertEquals(len(calls), 3)
+        self.assertEquals(self.p2[0].pair_code, self.p3[1].pair_code)
+
+    def test_same_method_agrees_with_method_names(self):
+        from layout import Layout
+        from timeline_ift_forks import MethodBar, VisitedMethods
+        commands = self.p2 + self.p3 + self.uncoded
+        for a in commands:
+            bar = MethodBar(Layout(), a, a['Time'], 0, VisitedMethods())
+            for b in commands:
+                self.assertEquals(bar.same_method(b), Command.method_name(a.record) == Command.method_name(b.record))
+
+
+class TestFeatureTypeMask(unittest.TestCase):
+
+    def test_encode_and_decode(self):
+        flags = [''] * len(Feature.FEATURE_TYPES)
+        flags[Feature.FEATURE_TYPES.index('Domain Text')] = 'y'
+        flags[Feature.FEATURE_TYPES.index('Comments')] = 'y'
+        mask = Feature.encode(flags)
+
+        self.assertEquals(Feature.names(mask), ['Domain Text', 'Comments'])
+        self.assertEquals(Feature.count(mask), 2)
+
+
+class TestFeatureTypeCooccurrence(unittest.TestCase):
+
+    def test_counts_from_masks(self):
+        from feature_types import FeatureTypeCooccurrence
+        mask = lambda *names: sum(1 << Feature.FEATURE_TYPES.index(n) for n in names)
+        start = datetime(2013, 1, 1)
+        features = [Feature.from_record(Feature.make_record(1, i, start, start, m, 'Editor: X.java'))
+            for i, m in enumerate([mask('Position', 'Contrast'), mask('Position'), mask('Position', 'Contrast'),
+                mask('Contrast', 'Comments'), 0], 1)]
+        cooccurrence = FeatureTypeCooccurrence.from_data([ParticipantData(2, [], [], features)])
+
+        self.assertEquals(cooccurrence.count('Position'), 3)
+        self.assertEquals(cooccurrence.count('Contrast'), 3)
+        self.assertEquals(cooccurrence.count('Comments'), 1)
+        self.assertEquals(cooccurrence.count('Position', 'Contrast'), 2)
+        self.assertEquals(cooccurrence.count('Contrast', 'Position'), 2)
+        self.assertEquals(cooccurrence.count('Contrast', 'Comments'), 1)
+        self.assertEquals(cooccurrence.count('Position', 'Comments'), 0)
+        self.assertEquals(cooccurrence.count('Synonyms'), 0)
+        self.assertEquals(sum(sum(row) for row in cooccurrence.matrix), 3 + 3 + 1 + 2 * 2 + 2 * 1)
+        self.assertEquals(cooccurrence.types_per_row(), {2: 3, 1: 1, 0: 1})
+
+
+class TestParticipantData(unittest.TestCase):
+
+    def setUp(self):
+        lines = [
+            '2\t1\t10:59.000\tFileOpenCommand\tFoldPainter.java\tnull\t\t\t\t0\t""',
+            '2\t2\t11:05.000\tInsert\tFoldPainter.java\tnull\t\t\t\t0\t""',
+            '2\t3\t11:20.000\tSelectTextCommand\tTextArea.java\tnull\t\t\t\t0\t""',
+            '2\t4\t11:40.000\tInsert\tTextArea.java\tnull\t\t\t\t0\t""',
+        ]
+        rows = [line.split('\t', len(Command.FIELDS)) for line in lines]
+        commands = Command.parse_rows(rows, range(3, 7), ParseReport())
+        coded = CodedEvent.parse_rows([
+            '1\t11:00.0\t\t1\t\t\t\t\t\t\t0\t\t\t\tNo Data\t\t\t\t'.split('\t'),
+            '2\t11:30.0\t\t0\t\t\t\t\t\t\t0\t\t\t\tNo Data\t\t\t\t'.split('\t')], [3, 4], ParseReport())
+        self.data = ParticipantData(2, coded, commands, [], lambda c: c['Command'])
+
+    def test_query_by_fork(self):
+        self.assertEquals([c['CommandID'] for c in self.data.query(fork=1)], [2, 3])
+
+    def test_query_combines_filters(self):
+        view = self.data.query(method='TextArea.java:Other', kind='Insert')
+        self.assertEquals([c['CommandID'] for c in view], [4])
+
+    def test_foraging_commands(self):
+        self.assertEquals([c['CommandID'] for c in self.data.foraging_commands()], [2, 3])
+
+    def test_commands_joined_to_segments(self):
+        self.assertEquals(list(self.data.command_segments()), [-1, 0, 0, 1])
+        table = self.data.segment_table()
+        self.assertEquals(table.commands, [2, 1])
+        self.assertEquals(table.files, [2, 1])
+        # The visit to FoldPainter.java starts before the first segment, and the one to
+        # TextArea.java goes on into the second.
+        self.assertEquals(table.visits, [1, 0])
+        self.assertEquals(list(table.visit_starts), [0, 2])
+        self.assertEquals(table.classes[0], {'Insert': 1, 'SelectTextCommand': 1})
+        self.assertTrue(self.data.segment_table() is table)
+
+    def test_feature_segments_leave_features_alone(self):
+        start = self.data.start_time
+        features = [Feature.from_record(OrderedDict([('Fork', fork), ('Order', 1), ('Start', start),
+            ('End', start), ('FeatureType', 0)])) for fork in [2, 7, 1]]
+        data = ParticipantData(2, self.data.coded_events, self.data.commands, features)
+        self.assertEquals(list(data.feature_segments()), [1, -1, 0])
+        self.assertEquals(list(data.feature_segments(RecordView(features, positions=[2]))), [0])
+        self.assertEquals(features[0].record.keys(), ['Fork', 'Order', 'Start', 'End', 'FeatureType'])
+
+    def test_features_between(self):
+        start = self.data.start_time
+        features = [Feature.from_record(Feature.make_record(1, 1, start + timedelta(0, s), start + timedelta(0, e), 1, 'Editor: X.java'))
+            for s, e in [(0, 100), (10, 15), (20, 30), (40, 45)]]
+        data = ParticipantData(2, self.data.coded_events, [], features)
+        between = lambda s, e: [f['Start'] for f in data.features_between(start + timedelta(0, s), start + timedelta(0, e))]
+        self.assertEquals(between(16, 20), [start])
+        self.assertEquals(between(12, 25), [start, start + timedelta(0, 10), start + timedelta(0, 20)])
+        self.assertEquals(between(100, 200), [])
+
+    def test_method_visits(self):
+        from method_visits import MethodVisits
+        visits = MethodVisits.from_data([self.data])
+        self.assertEquals(list(visits.rows()), [
+            (2, 'FoldPainter.java:Other', 'FoldPainter.java', 0.0, 20.0, 2),
+            (2, 'TextArea.java:Other', 'TextArea.java', 20.0, 20.0, 2)])
+        self.assertEquals(visits.transitions(), {(2, 'FoldPainter.java:Other', 'TextArea.java:Other'): 1})
+        self.assertEquals(visits.dwell_times('file')['all']['TextArea.java']['median_seconds'], 20.0)
+
+    def test_patch_table(self):
+        from patches import PatchTable
+        start = self.data.start_time
+        features = [Feature.from_record(Feature.make_record(fork, 1, start + timedelta(0, s), start + timedelta(0, s + 10), 1, patch))
+            for fork, s, patch in [(2, 40, 'Editor: TextArea.java'), (1, 0, 'Editor: X.java'), (1, 20, 'Stack Trace')]]
+        table = PatchTable.from_data([ParticipantData(2, self.data.coded_events, [], features)])
+        self.assertEquals(table.patch, ['Editor', 'Stack Trace', 'Editor'])
+        self.assertEquals(table.transitions(), {(2, 'Editor', 'Stack Trace'): 1, (2, 'Stack Trace', 'Editor'): 1})
+        self.assertEquals(table.time_per_patch()['all']['Editor'], {'features': 2, 'seconds': 20.0})
+        self.assertEquals(table.feature_types()['Editor'], {Feature.FEATURE_TYPES[0]: 2})
+
+    def test_command_sequences(self):
+        from command_sequences import CommandSequences
+        sequences = CommandSequences.from_data([self.data], max_n=2, gap=16)
+        # The 20 seconds before the last command break its sequence.
+        self.assertEquals(sorted(sequences.top('all', n=2)),
+            [(('FileOpenCommand', 'Insert'), 1), (('Insert', 'SelectTextCommand'), 1)])
+        self.assertEquals(sorted(sequences.top('other', n=1)), [(('FileOpenCommand',), 1), (('Insert',), 1)])
+
+    def test_sqlite_backend_gives_the_same_records(self):
+        from sqlite_store import SQLiteBackend, SCHEMA
+        backend = SQLiteBackend(':memory:')
+        backend.connection.executescript(SCHEMA)
+        SQLiteBackend._insert(backend.connection, 2, self.data.coded_events, self.data.commands, [])
+        self.assertEquals([c.record for c in backend.load_commands(2)], [c.record for c in self.data.commands])
+        self.assertEquals([e.record for e in backend.load_codedevents(2)], [e.record for e in self.data.coded_events])
+        t0 = self.data.coded_events[1]['Time']
+        self.assertEquals([c['CommandID'] for c in backend.load_commands(2, t0=t0)], [4])
+
+
+class TestForkTable(unittest.TestCase):
+
+    def setUp(self):
+        from fork_outcomes import ForkTable
+        start = datetime(1900, 1, 1, 0, 11)
+
+        def segment(index, seconds, forks):
+            return CodedEvent.from_record(CodedEvent.make_record(index, start + timedelta(0, seconds), True,
+                [Fork(index, i + 1, name, 'None', success) for i, (name, success) in enumerate(forks)]))
+
+        self.table = ForkTable.from_data([
+            ParticipantData(2, [
+                segment(1, 0, [('Verified', 'Successful')]),
+                segment(2, 30, [('Verified', 'Unsuccessful'), ('Undetected', 'Successful')]),
+                segment(3, 330, [('No Data', '')])], [], []),
+            ParticipantData(3, [
+                segment(1, 0, [('Unverified', 'NA')]),
+                segment(2, 60, [('No', '')])], [], [])])
+
+    def test_success_rates_leave_out_pseudo_forks(self):
+        by_participant = self.table.success_rates('participant')
+        self.assertEquals((by_participant[2]['forks'], by_participant[2]['not_forks']), (3, 1))
+        self.assertAlmostEquals(by_participant[2]['rate'], 2.0 / 3)
+        self.assertEquals(by_participant[3], {'forks': 1, 'not_forks': 1, 'successful': 0, 'unsuccessful': 0,
+            'na': 1, 'rate': None})
+
+        by_type = self.table.success_rates('name')
+        self.assertEquals(by_type['Verified']['rate'], 0.5)
+        self.assertEquals((by_type['No Data']['forks'], by_type['No Data']['not_forks']), (0, 1))
+        self.assertEquals(by_type['No']['rate'], None)
+
+    def test_fork_density(self):
+        self.assertEquals(self.table.fork_density(300), {2: [3, 0], 3: [1, 0], 'all': [4, 0]})
+
+    def test_multi_fork_segments(self):
+        stats = self.table.multi_fork_segments()
+        self.assertEquals(stats['segments_by_forks'], {0: 2, 1: 2, 2: 1})
+        self.assertEquals(stats['single'], {'successful': 1, 'unsuccessful': 0, 'NA': 1, 'None': 0})
+        self.assertEquals(stats['multiple'], {'successful': 1, 'unsuccessful': 1, 'NA': 0, 'None': 0})
+
+
+class TestCommandActivity(unittest.TestCase):
+
+    def setUp(self):
+        from aggregate import CommandActivity
+        coded = CodedEvent.parse_rows([
+            '1\t11:00.0\t\t1\t\t\t\t\t\t\t0\t\t\t\tNo Data\t\t\t\t'.split('\t'),
+            '2\t11:30.0\t\t0\t\t\t\t\t\t\t0\t\t\t\tNo Data\t\t\t\t'.split('\t')], [3, 4], ParseReport())
+
+        def commands(*rows):
+            lines = ['2\t%d\t%s\t%s\tFoldPainter.java\tnull\t\t\t\t0\t""' % (i, t, c) for i, (t, c) in enumerate(rows, 1)]
+            return Command.parse_rows([line.split('\t', len(Command.FIELDS)) for line in lines], range(len(lines)), ParseReport())
+
+        # Three 30 second bins: the two segments, and one for the end of the last segment.
+        self.activity = CommandActivity(30)
+        self.activity.add(2, coded, commands(
+            ('10:55.000', 'Insert'), # Before the first segment
+            ('11:00.000', 'Insert'),
+            ('11:29.000', 'FileOpenCommand'),
+            ('11:30.000', 'Insert'),
+            ('11:45.000', 'MoveCaretCommand'), # Not drawn
+            ('12:01.000', 'Insert'),
+            ('12:35.000', 'Insert'))) # After the last bin
+        self.activity.add(3, coded, commands(('11:01.000', 'Insert'), ('11:02.000', 'Insert')))
+
+    def test_bins_and_lane_totals(self):
+        self.assertEquals(self.activity.bins[2], 3)
+        self.assertEquals(list(self.activity.lane_counts(2, 'edit')), [1, 1, 1])
+        self.assertEquals(list(self.activity.lane_counts(2, 'open')), [1, 0, 0])
+        self.assertEquals(sum(self.activity.counts[2]), 4)
+        self.assertEquals(self.activity.count(3, 'edit', 0), 2)
+        maximums = dict(zip(self.activity.lanes, self.activity.lane_maximums()))
+        self.assertEquals((maximums['edit'], maximums['open'], maximums['select']), (2, 1, 0))
+
+    def test_participant_without_segments_or_commands(self):
+        self.activity.add(4, [], Command.parse_rows([], [], ParseReport()))
+        self.activity.add(5, CodedEvent.parse_rows([], [], ParseReport()), [])
+        self.assertEquals(self.activity.participants, [2, 3])
+        self.assertEquals(len(self.activity.lane_maximums()), len(self.activity.lanes))
+
+    def test_chart_cells(self):
+        import re
+        import shutil
+        import tempfile
+        from aggregate import ActivityChart
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, "activity.svg")
+            ActivityChart(self.activity, filename).draw()
+            with open(filename) as f:
+                svg = f.read()
+        finally:
+            shutil.rmtree(directory)
+
+        # A cell per non-empty bin, as opaque as its count over the busiest bin of its lane:
+        # P02's open and edit lanes, then P03's edit lane.
+        self.assertEquals(re.findall(r'opacity="([0-9.]+)"', svg), ['1.00', '0.50', '0.50', '0.50', '1.00'])
+
+
+class TestRowIndex(unittest.TestCase):
+
+    def test_ranges_of_each_participant(self):
+        import shutil
+        import tempfile
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, "matrix.txt")
+            with open(filename, 'w') as f:
+                f.write("h\nh\n2\ta\n2\tb\n3\tc\n2\td\n")
+            index = RowIndex(filename, 2)
+            self.assertEquals(index.read_rows(2), ([['2', 'a'], ['2', 'b'], ['2', 'd']], [3, 4, 6]))
+            self.assertTrue(os.path.exists(index.sidecar))
+
+            with open(filename, 'a') as f:
+                f.write("3\te") # No newline yet
+            self.assertEquals(RowIndex(filename, 2).read_rows(3), ([['3', 'c'], ['3', 'e']], [5, 7]))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_malformed_sidecar_is_rebuilt(self):
+        import shutil
+        import tempfile
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, "matrix.txt")
+            with open(filename, 'w') as f:
+                f.write("h\nh\n2\ta\n3\tb\n2\tc\n")
+            index = RowIndex(filename, 2)
+            expected = index.read_rows(2)
+            stamp = index.stamp
+
+            # Lines that don't parse, and sidecars cut short, inside a line or at the end of one.
+            for listing in ["\n2\t4\tx\t3\nend\t1\n", "\n2\t4\t8\nend\t1\n", "\n2\t4\t8\t3\n2\t12", "\n2\t4\t8\t3\n",
+                    "\n2\t4\t8\t3\nend\t2\n"]:
+                with open(index.sidecar, 'w') as f:
+                    f.write(stamp + listing)
+                self.assertEquals(RowIndex(filename, 2).read_rows(2), expected)
+                with open(index.sidecar) as f:
+                    self.assertEquals(f.read().split('\n')[1:], ['2\t4\t8\t3', '2\t12\t16\t5', '3\t8\t12\t4', 'end\t3', ''])
+        finally:
+            shutil.rmtree(directory)
+
+
+class TestSections(unittest.TestCase):
+
+    def test_default_layout(self):
+        from timeline_ift_forks import Timeline
+        sections = Timeline.default_sections()
+        self.assertEquals(sections.boundaries(), [0, 200, 220, 260, 450])
+        layout = [(s.__class__.__name__, top) for s, top in sections.positions()]
+        self.assertEquals(layout, [('ForagingSection', 0), ('FeatureTypesSection', 0),
+            ('ForkOutcomesSection', 200), ('PatchesSection', 220), ('MethodsSection', 260)])
+        self.assertEquals(sections.positions()[0][0].height, 220)
+
+    def test_reordered_sections_move_down(self):
+        from timeline_ift_forks import SectionStack, MethodsSection, PatchesSection
+        sections = SectionStack([MethodsSection(), PatchesSection(height=20)])
+        self.assertEquals([top for s, top in sections.positions(16)], [16, 206])
+        self.assertEquals(sections.height, 210)
+
+    def test_command_overlaps_marked_once_per_column(self):
+        from layout import Layout
+        from timeline_ift_forks import Timeline, EventLine, CommandEventsSection
+        lines = [
+            '2\t1\t11:05.000\tInsert\tFoldPainter.java\tnull\t\t\t\t0\t""',
+            '2\t2\t11:05.200\tInsert\tFoldPainter.java\tnull\t\t\t\t0\t""',
+            '2\t3\t11:05.300\tFileOpenCommand\tFoldPainter.java\tnull\t\t\t\t0\t""',
+            '2\t4\t11:20.000\tInsert\tTextArea.java\tnull\t\t\t\t0\t""',
+        ]
+        commands = Command.parse_rows([line.split('\t', len(Command.FIELDS)) for line in lines], range(4), ParseReport())
+        coded = CodedEvent.parse_rows(['1\t11:00.0\t\t1\t\t\t\t\t\t\t0\t\t\t\tNo Data\t\t\t\t'.split('\t')], [3], ParseReport())
+        timeline = Timeline(2, coded, commands, [])
+        section = CommandEventsSection()
+        layout = Layout()
+        section.render(timeline, layout)
+
+        # Two lines at 5 seconds and one at 20, and a marker 2 high at 5 seconds.
+        self.assertEquals(list(layout.x0), [85, 85, 100, 85])
+        self.assertEquals(list(layout.y1)[-1], -2)
+
+
+    def test_density_runs_of_one_color_are_one_rect(self):
+        from collections import Counter
+        from layout import Layout
+        from timeline_ift_forks import CommandDensitySection
+        section = CommandDensitySection(bin_seconds=5)
+        layout = Layout()
+        section._draw_bins(layout, Counter({('edit', 0): 1, ('edit', 1): 1, ('edit', 2): 20, ('edit', 4): 20}))
+        self.assertEquals(list(layout.x0), [80, 90, 100])
+        self.assertEquals(list(layout.x1), [90, 95, 105])
+        self.assertEquals(layout.styles.values[0], (('fill', '#ffcccc'),))
+
+    def test_method_visits_drawn_per_segment(self):
+        from layout import Layout
+        from timeline_ift_forks import Timeline, MethodVisitsSection
+        lines = [
+            '2\t1\t11:05.000\tInsert\tFoldPainter.java\tnull\t\t\t\t0\t""',
+            '2\t2\t11:10.000\tInsert\tTextArea.java\tnull\t\t\t\t0\t""',
+            '2\t3\t11:35.000\tInsert\tTextArea.java\tnull\t\t\t\t0\t""',
+        ]
+        commands = Command.parse_rows([line.split('\t', len(Command.FIELDS)) for line in lines], range(3), ParseReport())
+        coded = CodedEvent.parse_rows([('%d\t%s\t\t1\t\t\t\t\t\t\t0\t\t\t\tNo Data\t\t\t\t' % (i, t)).split('\t')
+            for i, t in [(1, '11:00.0'), (2, '11:30.0')]], [3, 4], ParseReport())
+        timeline = Timeline(2, coded, commands, [])
+        section = MethodVisitsSection()
+        layout = Layout()
+        section.render(timeline, layout)
+
+        # Two visits start in the first segment, and none in the second.
+        self.assertEquals(list(layout.x0), [80, 110])
+        self.assertEquals([dict(s)['fill'] for s in layout.styles.values], ['#d9d9d9', 'white'])
+
+
+class TestTimelineWatcher(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        self.directory = tempfile.mkdtemp()
+        self.dir, DataLoader.DIR = DataLoader.DIR, self.directory
+        self.append(DataLoader.codedevents(2), "h\nh\n")
+        self.append(DataLoader.commands(2), "h\nstart\n")
+
+    def tearDown(self):
+        import shutil
+        DataLoader.DIR = self.dir
+        shutil.rmtree(self.directory)
+
+    def append(self, filename, text):
+        with open(filename, 'a') as f:
+            f.write(text)
+
+    def append_segment(self, index, time):
+        self.append(DataLoader.codedevents(2), '%d\t%s\t\t1\t\t\t\t\t\t\t0\t\t\t\tNo Data\t\t\t\t\n' % (index, time))
+
+    def append_command(self, id, time, active_file):
+        self.append(DataLoader.commands(2), '2\t%d\t%s\tInsert\t%s\tnull\t\t\t\t0\t""\n' % (id, time, active_file))
+
+    def test_partial_line_held_back(self):
+        filename = os.path.join(self.directory, "tail.txt")
+        self.append(filename, "h\nh\n2\ta\n2\tb")
+        reader = TailReader(filename, 2)
+        self.assertEquals(reader.read_rows(), ([['2', 'a']], [3]))
+        self.append(filename, "c\n")
+        self.assertEquals(reader.read_rows(), ([['2', 'bc']], [4]))
+        self.assertEquals(reader.read_rows(), ([], []))
+
+    def test_appended_rows_extend_the_timeline(self):
+        from timeline_ift_forks import TimelineWatcher
+        watcher = TimelineWatcher(2)
+        self.append_command(1, '10:59.000', 'FoldPainter.java')
+        self.assertFalse(watcher.poll()) # Held until the first segment
+
+        self.append_segment(1, '11:00.0')
+        self.append_command(2, '11:05.000', 'FoldPainter.java')
+        self.assertTrue(watcher.poll())
+        self.assertEquals([c['CommandID'] for c in watcher.timeline.data.commands], [1, 2])
+
+        self.append_segment(2, '11:30.0')
+        self.append_command(3, '11:40.000', 'TextArea.java')
+        self.assertTrue(watcher.poll())
+        self.assertEquals(len(watcher.timeline.data.coded_events), 2)
+        self.assertEquals([c['CommandID'] for c in watcher.timeline.data.commands], [1, 2, 3])
+        self.assertFalse(watcher.poll())
+
+    def test_open_method_bar_continues_after_the_next_poll(self):
+        from layout import Layout
+        from timeline_ift_forks import Timeline, TimelineWatcher, MethodsSection
+        watcher = TimelineWatcher(2)
+        self.append_segment(1, '11:00.0')
+        self.append_command(1, '11:05.000', 'FoldPainter.java')
+        self.append_command(2, '11:10.000', 'FoldPainter.java')
+        watcher.poll()
+        self.append_segment(2, '11:30.0')
+        self.append_command(3, '11:20.000', 'FoldPainter.java')
+        self.append_command(4, '11:40.000', 'TextArea.java')
+        self.append_command(5, '11:50.000', 'TextArea.java')
+        watcher.poll()
+
+        def methods(timeline):
+            return [(section, layout) for section, top, layout in timeline.layers if isinstance(section, MethodsSection)][0]
+
+        section, layout = methods(watcher.timeline)
+        live = Layout()
+        section.render_live(watcher.timeline, live)
+        grown = list(layout.primitives()) + list(live.primitives())
+
+        full = Timeline(2, DataLoader.load_codedevents(2), DataLoader.load_commands(2), [], sections=Timeline.live_sections())
+        full.lay_out()
+        self.assertEquals(grown, list(methods(full)[1].primitives()))
+        # The visit to FoldPainter.java is one bar, from 5 seconds to the command in TextArea.java at 40.
+        self.assertEquals([(p[1], p[3]) for p in grown if p[0] == Layout.RECT], [(85, 120), (120, 130)])
+
+
+class TestBatchRenderer(unittest.TestCase):
+
+    def renderer(self, writer):
+        """P4 fails to load, P5 to render and P3 to save."""
+        from timeline_ift_forks import BatchRenderer, LoadedParticipant
+        coded = [CodedEvent.from_record(CodedEvent.make_record(1, datetime(1900, 1, 1, 0, 11), True, []))]
+        saved = []
+
+        class Renderer(BatchRenderer):
+            def _load_all(self, loaded):
+                for p in self.participants:
+                    participant = LoadedParticipant(p)
+                    if p == 4:
+                        participant.error = IOError('missing')
+                    else:
+                        participant.data = ParticipantData(p, coded if p != 5 else [], [], [])
+                    loaded.put(participant)
+
+            def _save(self, timeline):
+                if timeline.pid == 3:
+                    raise IOError('disk full')
+                saved.append(timeline.pid)
+
+        return Renderer([3, 4, 2, 5, 6], writer=writer), saved
+
+    def test_failures_are_reported_in_order(self):
+        import sys
+        from StringIO import StringIO
+        outputs = []
+        for writer in (False, True):
+            renderer, saved = self.renderer(writer)
+            stdout, sys.stdout = sys.stdout, StringIO()
+            try:
+                errors = renderer.run()
+                outputs.append(sys.stdout.getvalue())
+            finally:
+                sys.stdout = stdout
+            self.assertEquals(saved, [2, 6])
+            self.assertEquals(sorted(errors), [3, 4, 5])
+
+        self.assertEquals(outputs[0], outputs[1])
+        lines = outputs[0].splitlines()
+        self.assertEquals([l for l in lines if l.startswith('Participant')],
+            ['Participant 3', 'Participant 4', 'Participant 2', 'Participant 5', 'Participant 6'])
+        self.assertEquals([l.split(':')[0] for l in lines if l.startswith('Could not')],
+            ['Could not load P04', 'Could not render P05', 'Could not save P03'])
+
+
+class TestLayout(unittest.TestCase):
+
+    def setUp(self):
+        from layout import Layout
+        self.layout = Layout()
+        self.layout.rect(insert=(80, 0), size=(30, 220), fill="beige", stroke_width="0")
+        self.layout.rect(insert=(110, 0), size=(30, 220), fill="beige", stroke_width="0")
+        self.layout.text("P02", insert=(0, 486), font_size="14")
+
+    def test_columns_share_styles(self):
+        self.assertEquals(list(self.layout.kind), [0, 0, 2])
+        self.assertEquals(list(self.layout.x1), [110, 140, 0])
+        self.assertEquals(list(self.layout.style), [0, 0, 1])
+        self.assertEquals(self.layout.styles.values[0], (('fill', 'beige'), ('stroke-width', '0')))
+
+    def test_svg_emitter(self):
+        import svgwrite
+        from layout import SVGEmitter
+        drawing = svgwrite.Drawing()
+        group = SVGEmitter(drawing).group(self.layout, 16)
+        self.assertEquals(group.tostring(), '<g transform="translate(0,16)">'
+            '<rect fill="beige" height="220" stroke-width="0" width="30" x="80" y="0" />'
+            '<rect fill="beige" height="220" stroke-width="0" width="30" x="110" y="0" />'
+            '<text font-size="14" x="0" y="486">P02</text></g>')
+
+    def test_streamed_svg_matches_svgwrite(self):
+        import io
+        import svgwrite
+        from StringIO import StringIO
+        from layout import SVGEmitter, write_svg
+        drawing = svgwrite.Drawing(size=("200px", "500px"))
+        drawing.add_stylesheet("timeline_information_forks.css", title="ift_forks")
+        SVGEmitter(drawing).emit([(16, self.layout)], clip=(80, 0, 60, 500))
+        whole = io.StringIO()
+        drawing.write(whole)
+        streamed = StringIO()
+        write_svg(drawing, streamed)
+        self.assertEquals(streamed.getvalue(), whole.getvalue().encode('utf-8'))
+
+    def test_append_codes_styles_again(self):
+        from layout import Layout
+        sheet = Layout()
+        sheet.text("Legend", insert=(0, 10), font_size="14")
+        sheet.append(self.layout, dy=20)
+        self.assertEquals(list(sheet.style), [0, 1, 1, 0])
+        self.assertEquals(list(sheet.y0), [10, 20, 20, 506])
+        self.assertEquals(len(sheet.styles.values), 2)
+
+
+class TestRaster(unittest.TestCase):
+
+    def test_fill_blends_over_background(self):
+        from raster import Raster
+        raster = Raster(4, 2)
+        raster.fill(1, 0, 3, 1, (0, 0, 0), 0.5)
+        self.assertEquals(list(raster.planes[0]), [255, 128, 128, 255, 255, 255, 255, 255])
+
+    def test_png_signature_and_size(self):
+        import struct
+        from StringIO import StringIO
+        from raster import Raster
+        f = StringIO()
+        Raster(3, 2).write_png(f)
+        png = f.getvalue()
+        self.assertEquals(png[:8], '\x89PNG\r\n\x1a\n')
+        self.assertEquals(struct.unpack('>II', png[16:24]), (3, 2))
+
+
+class TestCommandLine(unittest.TestCase):
+
+    def test_participant_list(self):
+        from cli import participant_list
+        self.assertEquals(participant_list(['2', '5-7', '3,5']), [2, 5, 6, 7, 3])
+        self.assertEquals(participant_list([]), PARTICIPANTS)
+
+    def test_render_fails_when_a_participant_does_not_load(self):
+        from cli import main
+        self.assertEquals(main(['render', '--format', 'json', '99']), 1)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -46,12 +46,11 @@ EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."""
 
 import os
 from datetime import timedelta
-from pyparsing import *
 from math import ceil
 import svgwrite
 from collections import OrderedDict
 
-from events import CodeError, DataLoader
+from events import CodeError, DataLoader, Command
 
 class TimelineDecorations:
     def __init__(self, svg_timeline, coded_events, participant):
@@ -773,30 +772,30 @@ class Timeline:
         # Draw everything in the queue
 
     def _event_at_session_start(self, event):
-        ev_start_at_session = event
-        ev_start_at_session['Time'] = self.start_time
-        return ev_start_at_session
+        """A copy of an event that happened before the session, moved to its start."""
+        moved = Command.from_record(OrderedDict(event.record))
+        moved.record['Time'] = self.start_time
+        return moved
 
     def _draw_methods(self):
         start_event = None
         xpos = 0
         
         for event in self.commands:
-            if 'error' not in event:
-                if self.before_start(event):
-                    start_event = MethodBar(self.svg_timeline, self._event_at_session_start(event), self.start_time, self.visited_methods)
-                else:
-                    if not start_event:
-                        start_event = MethodBar(self.svg_timeline, event, self.start_time, self.visited_methods)
+            if self.before_start(event):
+                start_event = MethodBar(self.svg_timeline, self._event_at_session_start(event), self.start_time, self.visited_methods)
+            else:
+                if not start_event:
+                    start_event = MethodBar(self.svg_timeline, event, self.start_time, self.visited_methods)
 
-                    if not start_event.same_method(event):
-                        self.visited_methods = start_event.draw(event)
-                        start_event = MethodBar(self.svg_timeline, event, self.start_time, self.visited_methods)
-                    
+                if not start_event.same_method(event):
+                    self.visited_methods = start_event.draw(event)
+                    start_event = MethodBar(self.svg_timeline, event, self.start_time, self.visited_methods)
+                
             xpos += Timeline.SQUARE_WIDTH
 
         # Draw the final event
-        if 'error' not in event:
+        if start_event:
             self.visited_methods = start_event.draw(event)
 
     def draw(self):
@@ -35,38 +35,38 @@ NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
 EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."""
 
 import os
+import sys
+import copy
+import time
+import Queue
+import threading
+import multiprocessing
 from datetime import timedelta
-from pyparsing import *
 from math import ceil
-import svgwrite
-from collections import OrderedDict
+from collections import OrderedDict, Counter
 
-from events import CodeError, DataLoader
+from events import CodeError, DataLoader, TailReader, ParseReport, Command, CodedEvent, Feature, ParticipantData, PairClassifier
+from layout import Layout, SVGEmitter, JSONEmitter, save_svg
+from raster import PNGEmitter, parse_color
 
 
 class ForagingSegment:
-    def __init__(self, svg_timeline, event, section=None):
-        self.svg_timeline = svg_timeline
+    def __init__(self, layout, event, section=None):
+        self.layout = layout
         self.foraging = event['Foraging']
+        self.height = section.height if section else Timeline.CHART_HEIGHT
 
     def _draw_text(self, xpos):
         size = "14"
-        style = None
 
-        text = self.svg_timeline.text(
+        self.layout.text(
             self._fork_text(),
-            insert=(xpos + Timeline.SQUARE_WIDTH/2 + Timeline.X_OFFSET, Timeline.CHART_HEIGHT - 10 + Timeline.Y_OFFSET),
+            insert=(xpos + Timeline.SQUARE_WIDTH/2 + Timeline.X_OFFSET, self.height - 10),
             font_family="sans-serif",
             font_size=size,
             text_anchor="middle",
             dy="5")
 
-        if style:
-            style.add(text)
-            self.svg_timeline.add(style)
-        else:
-            self.svg_timeline.add(text)
-
     def draw(self, xpos):
         """Draws the square according to its properties"""
 
@@ -78,19 +78,20 @@ class ForagingSegment:
             opacity = "0.7"
 
         # Foraging Background
-        self.svg_timeline.add(self.svg_timeline.rect(
-            insert=(xpos + Timeline.X_OFFSET, Timeline.Y_OFFSET),
-            size=(Timeline.SQUARE_WIDTH, Timeline.CHART_HEIGHT),
+        self.layout.rect(
+            insert=(xpos + Timeline.X_OFFSET, 0),
+            size=(Timeline.SQUARE_WIDTH, self.height),
             fill=fill,
             opacity=opacity,
-            stroke_width="0"))
+            stroke_width="0")
 
 
 class ForkOutcomeSegment(object):
-    def __init__(self, svg_timeline, event, section=None):
-        self.svg_timeline = svg_timeline
+    def __init__(self, layout, event, section=None):
+        self.layout = layout
         self.index = event['Index']
         self.forks = event['Forks']
+        self.height = section.height if section else EventLine.HEIGHT * 2
 
         self.lane = 0
         self.total = len(self.forks)
@@ -104,7 +105,6 @@ class ForkOutcomeSegment(object):
             # Since we can't really plot two forks at the same spot on the graph, plot the first one only.
             if fork_type == "Verified":
                 fork_text = 'v'
-                style = self.svg_timeline.g(style='text-decoration:underline; font-weight:bold')
             elif fork_type == "Undetected":
                 fork_text = 'u'
             elif fork_type == "False":
@@ -125,26 +125,20 @@ class ForkOutcomeSegment(object):
         return fork_text
 
     def _draw_text(self, xpos, fork):
-        style = None
         h = 12
         size = int(14 - (2 * self.total))
         x = Timeline.SQUARE_WIDTH/self.total
 
-        text = self.svg_timeline.text(
+        self.layout.text(
             self._fork_text(fork),
-            insert=(xpos + x/2 + Timeline.X_OFFSET, Timeline.CHART_HEIGHT - h + Timeline.Y_OFFSET),
+            insert=(xpos + x/2 + Timeline.X_OFFSET, self.height - h),
             font_family="sans-serif",
             font_size=str(size),
             text_anchor="middle",
             dy="5")
 
-        if style:
-            style.add(text)
-            self.svg_timeline.add(style)
-        else:
-            self.svg_timeline.add(text)
-
-    def _success_fill(self, fork):
+    @staticmethod
+    def success_fill(fork):
         successful = fork.success
         success_fill = "white"
 
@@ -165,12 +159,12 @@ class ForkOutcomeSegment(object):
         h = EventLine.HEIGHT * 2
 
         # Successful/Not Successful Background
-        self.svg_timeline.add(self.svg_timeline.rect(
-            insert=(xpos + Timeline.X_OFFSET, Timeline.CHART_HEIGHT - h + Timeline.Y_OFFSET),
+        self.layout.rect(
+            insert=(xpos + Timeline.X_OFFSET, self.height - h),
             size=(Timeline.SQUARE_WIDTH * 1.0/self.total, h),
-            fill=self._success_fill(fork),
+            fill=ForkOutcomeSegment.success_fill(fork),
             opacity=1.0,
-            stroke_width="0"))
+            stroke_width="0")
 
     def draw(self, xpos):
         """Draws the square according to its properties"""
@@ -215,11 +209,16 @@ class ForkFeatureType:
 
     # COLOR['default'] = ('darkslategrey', 250, 21)
 
-    def __init__(self, svg_timeline, events, start):
-        self.svg_timeline = svg_timeline
+    # The colors in the order of the bits of a Feature's FeatureType mask.
+    COLOR_BY_BIT = [COLOR[k] for k in Feature.FEATURE_TYPES]
+
+    def __init__(self, layout, events, start, segment_time):
+        """events are the features of one fork, and segment_time the start of its segment."""
+        self.layout = layout
         self.events = events
         self.num_events = len(events)
         self.start_time = start
+        self.segment_time = segment_time
 
     def _draw(self, fork, point, xpos):
         """Draw a line between two points horizontally on the lane."""
@@ -230,27 +229,24 @@ class ForkFeatureType:
         color = point[0]
         lane = point[1]
 
-        print (fork['Fork'], fork['Order'], color)
-        print start_offset
-
-        x_baseline = Timeline.X_OFFSET + xpos - segment_width
+        x_baseline = Timeline.X_OFFSET + xpos
 
         start = (x_baseline + start_offset,
-            ((lane - 1) * EventLine.HEIGHT) + Timeline.Y_OFFSET + EventLine.HEIGHT/2)
+            ((lane - 1) * EventLine.HEIGHT) + EventLine.HEIGHT/2)
         end = (x_baseline + start_offset + fractional_width,
-            ((lane - 1) * EventLine.HEIGHT) + Timeline.Y_OFFSET + EventLine.HEIGHT/2)
+            ((lane - 1) * EventLine.HEIGHT) + EventLine.HEIGHT/2)
 
-        self.svg_timeline.add(self.svg_timeline.line(
-            start=start, end=end).
-            stroke(color=color, width=EventLine.HEIGHT, opacity=0.9))
+        self.layout.line(start=start, end=end,
+            stroke=color, stroke_width=EventLine.HEIGHT, stroke_opacity=0.9)
 
 
     def draw(self):
-        xpos = Timeline.calculate_x_position(self.start_time, self.events[0]['Time'])
+        # Not calculate_x_position: in a window, a segment may start before the window does.
+        xpos = round((self.segment_time - self.start_time).total_seconds(), 0)
 
         for fork in self.events:
-            for ft in fork['FeatureType']:
-                self._draw(fork, self.COLOR[ft], xpos)
+            for bit in Feature.bits(fork['FeatureType']):
+                self._draw(fork, self.COLOR_BY_BIT[bit], xpos)
 
 
 class EventLine:
@@ -282,274 +278,188 @@ class EventLine:
     
     COLOR['default'] = 'darkslategrey'
 
-    def __init__(self, svg_timeline, event, start):
-        self.svg_timeline = svg_timeline
+    # Each tuple represents the starting 'top' position and the lane of a kind of command.
+    LANE = OrderedDict()
+    LANE['open'] = (0, 1)
+    LANE['select'] = (30, 2)
+    LANE['move'] = (60, 3)
+    LANE['move_keyboard'] = (60, 4)
+    LANE['edit'] = (70, 5)
+    LANE['text_search'] = (140, 6)
+    LANE['find_next'] = (140, 7)
+    LANE['search_declarations'] = (140, 9)
+    LANE['file_search'] = (140, 10)
+    LANE['search_references'] = (140, 11)
+    LANE['assist'] = (140, 12)
+    LANE['save'] = (180, 13)
+    LANE['run'] = (180, 14)
+    LANE['debugging'] = (200, 15)
+    LANE['breakpoint_ruler'] = (210, 16)
+    LANE['java_perspective'] = (210, 17)
+    LANE['terminate'] = (190, 18)
+    LANE['open_editor'] = (220, 19)
+    LANE['call_hierarchy'] = (140, 20)
+    LANE['default'] = (240, 21)
+
+    # The kind of command for each Command. None means the command is not drawn.
+    COMMANDS = {
+        # Occurs whenever a 'file is brought into focus'. Ex: Opening files, switching tabs, closing other tabs, etc.
+        'FileOpenCommand': 'open',
+        # When user selects/highlights text
+        'SelectTextCommand': 'select',
+        # When the user moves the editor caret
+        'MoveCaretCommand': None,
+        # Cut, copy, paste
+        'CopyCommand': None,
+        'CutCommand': None,
+        'PasteCommand': None,
+        # Runs program in Eclipse
+        'RunCommand': 'run',
+        # Inserting, deleting, or replacing data. Also undo.
+        'Insert': 'edit',
+        'Delete': 'edit',
+        'Replace': 'edit',
+        'UndoCommand': 'edit',
+        # This overlaps with 'Insert'
+        'InsertStringCommand': None,
+        # Using one kind of 'find', not exactly sure which one
+        'FindCommand': 'text_search',
+        # Assistance when editing files, the AutoComplete in Eclipse
+        'AssistCommand': None,
+    }
+
+    # The kind of command for each EclipseCommand. None means the command is not drawn.
+    ECLIPSE_COMMANDS = {
+        # Clicking in the Java Code Editor breakpoint gutter
+        'AUTOGEN:::org.eclipse.jdt.debug.CompilationUnitEditor.BreakpointRulerActions/org.eclipse.jdt.debug.ui.actions.ManageBreakpointRulerAction': 'debugging',
+        # Clicking in the Java Code Editor gutter
+        'AUTOGEN:::org.eclipse.jdt.internal.ui.CompilationUnitEditor.ruler.actions/org.eclipse.jdt.internal.ui.javaeditor.JavaSelectRulerAction': None,
+        # Using the keyboard
+        'eventLogger.styledTextCommand.COLUMN_NEXT': 'move_keyboard',
+        'eventLogger.styledTextCommand.COLUMN_PREVIOUS': 'move_keyboard',
+        'eventLogger.styledTextCommand.DELETE_PREVIOUS': 'move_keyboard',
+        'eventLogger.styledTextCommand.LINE_DOWN': 'move_keyboard',
+        'eventLogger.styledTextCommand.LINE_UP': 'move_keyboard',
+        'eventLogger.styledTextCommand.SELECT_COLUMN_NEXT': 'move_keyboard',
+        'eventLogger.styledTextCommand.SELECT_COLUMN_PREVIOUS': 'move_keyboard',
+        'eventLogger.styledTextCommand.SELECT_LINE_UP': 'move_keyboard',
+        # Debuggung, run the program in debug mode
+        'org.eclipse.debug.ui.commands.DebugLast': 'run',
+        'org.eclipse.debug.ui.commands.Resume': 'debugging',
+        'org.eclipse.debug.ui.commands.RunLast': 'run',
+        'org.eclipse.debug.ui.commands.StepInto': 'debugging',
+        'org.eclipse.debug.ui.commands.StepOver': 'debugging',
+        'org.eclipse.debug.ui.commands.StepReturn': 'debugging',
+        'org.eclipse.debug.ui.commands.Terminate': 'terminate',
+        # Some kind of keyboard command
+        'org.eclipse.debug.ui.commands.eof': None,
+        # Change to the Java Perspective
+        'org.eclipse.jdt.ui.JavaPerspective': 'debugging',
+        # The breadcrumbs outlining a file path
+        'org.eclipse.jdt.ui.edit.text.java.gotoBreadcrumb': None,
+        'org.eclipse.jdt.ui.edit.text.java.open.call.hierarchy': 'call_hierarchy',
+        # Opens an editor in a special way
+        'org.eclipse.jdt.ui.edit.text.java.open.editor': 'open',
+        # Organizing the import statements of the file
+        'org.eclipse.jdt.ui.edit.text.java.organize.imports': None,
+        'org.eclipse.jdt.ui.edit.text.java.search.declarations.in.project': 'search_declarations',
+        'org.eclipse.jdt.ui.edit.text.java.search.declarations.in.workspace': 'search_declarations',
+        'org.eclipse.jdt.ui.edit.text.java.search.references.in.project': 'search_references',
+        'org.eclipse.jdt.ui.edit.text.java.search.references.in.workspace': 'search_references',
+        'org.eclipse.jdt.ui.edit.text.java.show.outline': 'search_references',
+        # Opening a type declaration in one of the explicit Dialogs
+        'org.eclipse.jdt.ui.navigate.open.type': None,
+        'org.eclipse.jdt.ui.navigate.open.type.in.hierarchy': 'call_hierarchy',
+        'org.eclipse.search.ui.openFileSearchPage': 'file_search',
+        'org.eclipse.search.ui.openSearchDialog': 'text_search',
+        # Trying to open text search from menu (P10) and failing
+        'org.eclipse.search.ui.performTextSearchFile': 'text_search',
+        'org.eclipse.search.ui.performTextSearchWorkspace': 'text_search',
+        'org.eclipse.ui.edit.findNext': 'find_next',
+        # Select all text
+        'org.eclipse.ui.edit.selectAll': None,
+        # Suggestions for autocompletion
+        'org.eclipse.ui.edit.text.contentAssist.proposals': None,
+        # Collapse folds
+        'org.eclipse.ui.edit.text.folding.collapse_all': None,
+        # Moving using keyboard commands
+        'org.eclipse.ui.edit.text.goto.lineEnd': 'move_keyboard',
+        'org.eclipse.ui.edit.text.goto.lineStart': 'move_keyboard',
+        'org.eclipse.ui.edit.text.goto.textStart': 'move_keyboard',
+        'org.eclipse.ui.edit.text.goto.wordNext': 'move_keyboard',
+        'org.eclipse.ui.edit.text.goto.wordPrevious': 'move_keyboard',
+        'org.eclipse.ui.edit.text.select.lineStart': 'move_keyboard',
+        'org.eclipse.ui.edit.text.select.wordNext': 'move_keyboard',
+        'org.eclipse.ui.edit.text.select.wordPrevious': 'move_keyboard',
+        # When JavaDoc tooltip is made editable
+        'org.eclipse.ui.edit.text.showInformation': None,
+        # Looking at file properties
+        'org.eclipse.ui.file.properties': None,
+        # Refreshing a file, kind of like open
+        'org.eclipse.ui.file.refresh': 'open',
+        'org.eclipse.ui.file.save': 'save',
+        # Using the Open Resource window
+        'org.eclipse.ui.navigate.openResource': 'open',
+        # Overlaps with Java perspective
+        'org.eclipse.ui.perspectives.showPerspective': None,
+        # Show a plugin view Eclipse
+        'org.eclipse.ui.views.showView': None,
+        # **Check this.
+        'org.eclipse.ui.window.newEditor': None,
+    }
+
+    # The kind returned by classify for an EclipseCommand that is missing from ECLIPSE_COMMANDS.
+    MISSED = 'missed'
+
+    def __init__(self, layout, event, start):
+        self.layout = layout
         self.event = event
         self.start_time = start
 
-    def _draw_open(self, xpos):
-        self._draw(EventLine.COLOR['open'], 0, 1, xpos)
-
-    def _draw_select(self, xpos):
-        self._draw(EventLine.COLOR['select'], 30, 2, xpos)
-
-    def _draw_move(self, xpos):
-        self._draw(EventLine.COLOR['move'], 60, 3, xpos)
-
-    def _draw_keyboard_move(self, xpos):
-        self._draw(EventLine.COLOR['move_keyboard'], 60, 4, xpos)
-
-    def _draw_edit(self, xpos):
-        self._draw(EventLine.COLOR['edit'], 70, 5, xpos)
-
-    def _draw_find(self, xpos):
-        self._draw(EventLine.COLOR['text_search'], 140, 6, xpos)
-
-    def _draw_find_next(self, xpos):
-        self._draw(EventLine.COLOR['find_next'], 140, 7, xpos)
-
-    def _draw_search_declarations(self, xpos):
-        self._draw(EventLine.COLOR['search_declarations'], 140, 9, xpos)
-
-    def _draw_search_file(self, xpos):
-        self._draw(EventLine.COLOR['file_search'], 140, 10, xpos)
-
-    def _draw_search_references(self, xpos):
-        self._draw(EventLine.COLOR['search_references'], 140, 11, xpos)
-
-    def _draw_assist(self, xpos):
-        self._draw(EventLine.COLOR['assist'], 140, 12, xpos)
-        
-    def _draw_save(self, xpos):
-        self._draw(EventLine.COLOR['save'], 180, 13, xpos)
-
-    def _draw_run(self, xpos):
-        self._draw(EventLine.COLOR['run'], 180, 14, xpos)
-
-    def _draw_debugging(self, xpos):
-        self._draw(EventLine.COLOR['debugging'], 200, 15, xpos)
-
-    def _draw_breakpoint_ruler(self, xpos):
-        self._draw(EventLine.COLOR['breakpoint_ruler'], 210, 16, xpos)
-
-    def _draw_java_perspective(self, xpos):
-        self._draw(EventLine.COLOR['java_perspective'], 210, 17, xpos)
-
-    def _draw_terminate(self, xpos):
-        self._draw(EventLine.COLOR['terminate'], 190, 18, xpos)
-
-    def _draw_open_editor(self, xpos):
-        self._draw(EventLine.COLOR['open_editor'], 220, 19, xpos)
-
-    def _draw_call_hierarchy(self, xpos):
-        self._draw(EventLine.COLOR['call_hierarchy'], 140, 20, xpos)
-
-    def _draw_default(self, xpos):
-        self._draw(EventLine.COLOR['default'], 240, 21, xpos)
-
-    def _draw(self, color, top, lane, xpos):
-
-        # self.svg_timeline.add(self.svg_timeline.line(
-        #       start=(xpos + Timeline.X_OFFSET, top + Timeline.Y_OFFSET),
-        #       end=(xpos + Timeline.X_OFFSET, Timeline.HEIGHT + Timeline.Y_OFFSET)).
-        #       stroke(color=color, width=1, opacity=0.9))
-
-        self.svg_timeline.add(self.svg_timeline.line(
-            start=(xpos + Timeline.X_OFFSET, ((lane - 1) * EventLine.HEIGHT) + Timeline.Y_OFFSET),
-            end=(xpos + Timeline.X_OFFSET, ((lane - 1) * EventLine.HEIGHT) + EventLine.HEIGHT + Timeline.Y_OFFSET)).
-            stroke(color=color, width=1, opacity=0.9))
-
-    def _eclipseCommand(self, xpos):
-        ec = self.event['EclipseCommand']
-
-        if self.event['EclipseCommand'] == 'AUTOGEN:::org.eclipse.jdt.debug.CompilationUnitEditor.BreakpointRulerActions/org.eclipse.jdt.debug.ui.actions.ManageBreakpointRulerAction':
-            # Clicking in the Java Code Editor breakpoint gutter
-            self._draw_debugging(xpos)
-        elif ec == "AUTOGEN:::org.eclipse.jdt.internal.ui.CompilationUnitEditor.ruler.actions/org.eclipse.jdt.internal.ui.javaeditor.JavaSelectRulerAction":
-            # Clicking in the Java Code Editor gutter
-            pass
-        elif ec == "eventLogger.styledTextCommand.COLUMN_NEXT":
-            # Using the keyboard
-            self._draw_keyboard_move(xpos)
-        elif ec == "eventLogger.styledTextCommand.COLUMN_PREVIOUS":
-            # Using the keyboard
-            self._draw_keyboard_move(xpos)
-        elif ec == "eventLogger.styledTextCommand.DELETE_PREVIOUS":
-            # Using the keyboard
-            self._draw_keyboard_move(xpos)
-        elif ec == "eventLogger.styledTextCommand.LINE_DOWN":
-            # Using the keyboard
-            self._draw_keyboard_move(xpos)
-        elif ec == "eventLogger.styledTextCommand.LINE_UP":
-            # Using the keyboard
-            self._draw_keyboard_move(xpos)
-        elif ec == "eventLogger.styledTextCommand.SELECT_COLUMN_NEXT":
-            # Using the keyboard
-            self._draw_keyboard_move(xpos)
-        elif ec == "eventLogger.styledTextCommand.SELECT_COLUMN_PREVIOUS":
-            # Using the keyboard
-            self._draw_keyboard_move(xpos)
-        elif ec == "eventLogger.styledTextCommand.SELECT_LINE_UP":
-            # Using the keyboard
-            self._draw_keyboard_move(xpos)
-        elif ec == "org.eclipse.debug.ui.commands.DebugLast":
-            # Debuggung, run the program in debug mode
-            self._draw_run(xpos)
-        elif ec == "org.eclipse.debug.ui.commands.Resume":
-            self._draw_debugging(xpos)
-        elif ec == "org.eclipse.debug.ui.commands.RunLast":
-            self._draw_run(xpos)
-        elif ec == "org.eclipse.debug.ui.commands.StepInto":
-            self._draw_debugging(xpos)
-        elif ec == "org.eclipse.debug.ui.commands.StepOver":
-            self._draw_debugging(xpos)
-        elif ec == "org.eclipse.debug.ui.commands.StepReturn":
-            self._draw_debugging(xpos)
-        elif ec == "org.eclipse.debug.ui.commands.Terminate":
-            self._draw_terminate(xpos)
-        elif ec == "org.eclipse.debug.ui.commands.eof":
-            # Some kind of keyboard command
-            pass
-        elif ec == "org.eclipse.jdt.ui.JavaPerspective":
-            # Change to the Java Perspective
-            self._draw_debugging(xpos)
-        elif ec == "org.eclipse.jdt.ui.edit.text.java.gotoBreadcrumb":
-            # The breadcrumbs outlining a file path
-            pass
-        elif ec == "org.eclipse.jdt.ui.edit.text.java.open.call.hierarchy":
-            self._draw_call_hierarchy(xpos)
-        elif ec == "org.eclipse.jdt.ui.edit.text.java.open.editor":
-            # Opens an editor in a special way
-            self._draw_open(xpos)
-        elif ec == "org.eclipse.jdt.ui.edit.text.java.organize.imports":
-            # Organizing the import statements of the file
-            pass
-        elif ec == "org.eclipse.jdt.ui.edit.text.java.search.declarations.in.project":
-            self._draw_search_declarations(xpos)
-        elif ec == "org.eclipse.jdt.ui.edit.text.java.search.declarations.in.workspace":
-            self._draw_search_declarations(xpos)
-        elif ec == "org.eclipse.jdt.ui.edit.text.java.search.references.in.project":
-            self._draw_search_references(xpos)
-        elif ec == "org.eclipse.jdt.ui.edit.text.java.search.references.in.workspace":
-            self._draw_search_references(xpos)
-        elif ec == "org.eclipse.jdt.ui.edit.text.java.show.outline":
-            self._draw_search_references(xpos)
-        elif ec == "org.eclipse.jdt.ui.navigate.open.type":
-            # Opening a type declaration in one of the explicit Dialogs
-            pass
-        elif ec == "org.eclipse.jdt.ui.navigate.open.type.in.hierarchy":
-            self._draw_call_hierarchy(xpos)
-        elif ec == "org.eclipse.search.ui.openFileSearchPage":
-            self._draw_search_file(xpos)
-        elif ec == "org.eclipse.search.ui.openSearchDialog":
-            self._draw_find(xpos)
-        elif ec == "org.eclipse.search.ui.performTextSearchFile":
-            # Trying to open text search from menu (P10) and failing
-            self._draw_find(xpos)
-        elif ec == "org.eclipse.search.ui.performTextSearchWorkspace":
-            self._draw_find(xpos)
-        elif ec == "org.eclipse.ui.edit.findNext":
-            self._draw_find_next(xpos)
-        elif ec == "org.eclipse.ui.edit.selectAll":
-            # Select all text
-            pass
-        elif ec == "org.eclipse.ui.edit.text.contentAssist.proposals":
-            # Suggestions for autocompletion
-            pass
-        elif ec == "org.eclipse.ui.edit.text.folding.collapse_all":
-            # Collapse folds
-            pass
-        elif ec == "org.eclipse.ui.edit.text.goto.lineEnd":
-            # Moving using keyboard commands
-            self._draw_keyboard_move(xpos)
-        elif ec == "org.eclipse.ui.edit.text.goto.lineStart":
-            # Moving using keyboard commands
-            self._draw_keyboard_move(xpos)
-        elif ec == "org.eclipse.ui.edit.text.goto.textStart":
-            # Moving using keyboard commands
-            self._draw_keyboard_move(xpos)
-        elif ec == "org.eclipse.ui.edit.text.goto.wordNext":
-            # Moving using keyboard commands
-            self._draw_keyboard_move(xpos)
-        elif ec == "org.eclipse.ui.edit.text.goto.wordPrevious":
-            # Moving using keyboard commands
-            self._draw_keyboard_move(xpos)
-        elif ec == "org.eclipse.ui.edit.text.select.lineStart":
-            # Moving using keyboard commands
-            self._draw_keyboard_move(xpos)
-        elif ec == "org.eclipse.ui.edit.text.select.wordNext":
-            # Moving using keyboard commands
-            self._draw_keyboard_move(xpos)
-        elif ec == "org.eclipse.ui.edit.text.select.wordPrevious":
-            # Moving using keyboard commands
-            self._draw_keyboard_move(xpos)
-        elif ec == "org.eclipse.ui.edit.text.showInformation":
-            # When JavaDoc tooltip is made editable
-            pass
-        elif ec == "org.eclipse.ui.file.properties":
-            # Looking at file properties
-            pass
-        elif ec == "org.eclipse.ui.file.refresh":
-            # Refreshing a file, kind of like open
-            self._draw_open(xpos)
-        elif ec == "org.eclipse.ui.file.save":
-            self._draw_save(xpos)
-        elif ec == "org.eclipse.ui.navigate.openResource":
-            # Using the Open Resource window
-            self._draw_open(xpos)
-        elif ec == "org.eclipse.ui.perspectives.showPerspective":
-            # Overlaps with Java perspective
-            pass
-        elif ec == "org.eclipse.ui.views.showView":
-            # Show a plugin view Eclipse
-            pass
-        elif ec == "org.eclipse.ui.window.newEditor":
-            # **Check this.
-            pass
-        else:
-            print "We missed an event %s" % self.event
+    @staticmethod
+    def kind(event):
+        """Returns the kind of command (a key of LANE) of an event, None if the event is not
+        drawn, or MISSED if it is an EclipseCommand we haven't classified yet."""
+        command = event['Command']
 
-    def draw(self):
-        xpos = Timeline.calculate_x_position(self.start_time, self.event['Time'])
-
-        if self.event['Command'] == 'FileOpenCommand':
-            # Occurs whenever a 'file is brought into focus'. Ex: Opening files, switching tabs, closing other tabs, etc.
-            self._draw_open(xpos)
-        elif self.event['Command'] == 'SelectTextCommand':
-            # When user selects/highlights text
-            self._draw_select(xpos)
-        elif self.event['Command'] == 'MoveCaretCommand':
-            # When the user moves the editor caret
-            # self._draw_move(xpos)
-            pass
-        elif self.event['Command'] == 'CopyCommand' \
-            or self.event['Command'] == 'CutCommand' \
-            or self.event['Command'] == 'PasteCommand':
-            # Cut, copy, paste
-            pass
-        elif self.event['Command'] == 'RunCommand':
-            # Runs program in Eclipse
-            self._draw_run(xpos)
-        elif self.event['Command'] == 'Insert' \
-            or self.event['Command'] == 'Delete' \
-            or self.event['Command'] == 'Replace' \
-            or self.event['Command'] == 'UndoCommand':
-            # Inserting, deleting, or replacing data. Also undo.
-            self._draw_edit(xpos)
-        elif self.event['Command'] == 'InsertStringCommand':
-            # This overlaps with 'Insert'
-            pass
-        elif self.event['Command'] == 'FindCommand':
-            # Using one kind of 'find', not exactly sure which one
-            self._draw_find(xpos)
-        elif self.event['Command'] == 'AssistCommand':
-            # Assistance when editing files, the AutoComplete in Eclipse
-            pass
-        elif self.event['Command'] == 'EclipseCommand':
+        if command == 'EclipseCommand':
             # This brings ups to a set of other events, which are described above
-            self._eclipseCommand(xpos)          
+            return EventLine.ECLIPSE_COMMANDS.get(event['EclipseCommand'], EventLine.MISSED)
         else:
-            self._draw_default(xpos)
+            return EventLine.COMMANDS.get(command, 'default')
+
+    # The kind of an event, found once per (Command, EclipseCommand) pair: by the pair's code
+    # for commands loaded in a CommandTable.
+    classify = PairClassifier(kind.__func__)
+
+    @staticmethod
+    def place(commands, start):
+        """The x position and kind of each command that is drawn, in the order of commands.
+        Commands before start and commands that are not drawn are left out."""
+        placed = []
+        for event in commands:
+            seconds = (event['Time'] - start).total_seconds()
+            if seconds < 0:
+                continue
+
+            kind = EventLine.classify(event)
+            if kind == EventLine.MISSED:
+                print "We missed an event %s" % event
+            elif kind:
+                placed.append((round(seconds, 0), kind))
+        return placed
+
+    @staticmethod
+    def draw_line(layout, xpos, kind):
+        top, lane = EventLine.LANE[kind]
+        layout.line(
+            start=(xpos + Timeline.X_OFFSET, (lane - 1) * EventLine.HEIGHT),
+            end=(xpos + Timeline.X_OFFSET, (lane - 1) * EventLine.HEIGHT + EventLine.HEIGHT),
+            stroke=EventLine.COLOR[kind], stroke_width=1, stroke_opacity=0.9)
+
+    def draw(self):
+        for xpos, kind in EventLine.place([self.event], self.start_time):
+            EventLine.draw_line(self.layout, xpos, kind)
 
 
 class MethodLaneException(Exception):
@@ -557,17 +467,18 @@ class MethodLaneException(Exception):
 
 class MethodBar:
     TEXT_WIDTH = 120
-    METHOD_NULL = "Other"
+    METHOD_NULL = Command.METHOD_NULL
 
     # Threshold in seconds, if visits are less or equal to this value, don't draw it as visited.
     VISIT_THRESHOLD = 0.1 
 
-    def __init__(self, svg_timeline, event_start, timeline_start, timeline_height, visited_methods):
-        self.svg_timeline = svg_timeline
+    def __init__(self, layout, event_start, timeline_start, top, visited_methods):
+        self.layout = layout
         self.start = event_start
         self.my_name = MethodBar.method_name(event_start)
+        self.my_code = event_start.method_code
         self.timeline_start = timeline_start
-        self.timeline_height = timeline_height
+        self.top = top
 
         self.visited_methods = visited_methods
         method_decorations = visited_methods.get(self.my_name)
@@ -577,39 +488,19 @@ class MethodBar:
 
     def same_method(self, new_event):
         """Is the incoming method the same as the current method?"""
-        if new_event and (MethodBar.method_name(new_event) == self.my_name):
+        if not new_event:
+            return False
+        elif self.my_code is not None and new_event.codes is self.start.codes:
+            # Both were loaded with the same CommandCodes, so compare their method codes.
+            return new_event.method_code == self.my_code
+        elif MethodBar.method_name(new_event) == self.my_name:
             return True
         else:
             return False
 
     @staticmethod
     def method_name(event):
-        ast_method = event['ASTMethod']
-
-        if ast_method and ast_method != 'null':
-
-            try:
-                index_semicolon = ast_method.index(';')
-                index_slash = ast_method.rfind('/', 0, index_semicolon)
-
-                filename = ast_method[index_slash + 1: index_semicolon ]
-
-                index_period = ast_method.index('.')
-                index_open = ast_method.index('(')
-                method = ast_method[index_period + 1: index_open]
-
-                if not method:
-                    method = "Constructor"
-
-                text_string = filename + ":" + method
-
-            except ValueError:
-                text_string = ast_method
-
-        else:
-            text_string = event['ActiveFile'] + ":" + MethodBar.METHOD_NULL
-
-        return text_string
+        return Command.method_name(event)
 
     def _xstart(self):
         return Timeline.calculate_x_position(self.timeline_start, self.start['Time'])
@@ -628,12 +519,12 @@ class MethodBar:
         self.background = "grey" # Overwrite the background to create a null color.
 
         duration = self.end['Time'] - self.start['Time']
-        self.svg_timeline.add(self.svg_timeline.rect(
-            insert=(x_start, Timeline.METHOD_LANE_HEIGHT * self.lane + self.timeline_height + Timeline.Y_OFFSET),
+        self.layout.rect(
+            insert=(x_start, Timeline.METHOD_LANE_HEIGHT * self.lane + self.top),
             size=(duration.total_seconds(), Timeline.METHOD_LANE_HEIGHT),
             fill=self.background,
             opacity="0.4",
-            stroke_width="0"))
+            stroke_width="0")
 
     def _draw_method(self, x_start):
         """Draws the method text"""
@@ -642,14 +533,14 @@ class MethodBar:
             textcolor = "black"
 
         self.last_text = x_start
-        self.svg_timeline.add(self.svg_timeline.text(
+        self.layout.text(
             self.my_name,
-            insert=(x_start, 2 + self.timeline_height + Timeline.METHOD_LANE_HEIGHT * self.lane + Timeline.Y_OFFSET),
+            insert=(x_start, 2 + self.top + Timeline.METHOD_LANE_HEIGHT * self.lane),
             font_family="sans-serif",
             font_size="8",
             text_anchor="start",
             fill=textcolor,
-            dy="5"))
+            dy="5")
 
     def draw(self, end):
         """Draws the method's bar from start (stored in the instance) to the end parameter"""
@@ -692,8 +583,8 @@ class PatchBar(object):
         'Misc': 'lightgray'
     }
 
-    def __init__(self, svg_timeline, fork_event, lane, timeline_start, timeline_height):
-        self.svg_timeline = svg_timeline
+    def __init__(self, layout, fork_event, lane, timeline_start, top):
+        self.layout = layout
 
         self.label = fork_event["Patch"]
         self._lane = lane
@@ -702,9 +593,8 @@ class PatchBar(object):
         self._end = fork_event["End"]
 
         self._timeline_start = timeline_start
-        self._timeline_height = timeline_height
 
-        self._y = self._timeline_height + Timeline.METHOD_LANE_HEIGHT * self._lane + Timeline.Y_OFFSET
+        self._y = top + Timeline.METHOD_LANE_HEIGHT * self._lane
 
     @property
     def label(self):
@@ -712,8 +602,7 @@ class PatchBar(object):
 
     @label.setter
     def label(self, patch):
-        patch_name = patch.split(":")
-        self._patch_label = patch_name[0].strip()
+        self._patch_label = Feature.patch_type(patch)
 
     @property
     def color(self):
@@ -731,26 +620,26 @@ class PatchBar(object):
         x_start = self.xstart + Timeline.X_OFFSET
 
         duration = self._end - self._start
-        self.svg_timeline.add(self.svg_timeline.rect(
+        self.layout.rect(
             insert=(x_start, self._y),
             size=(duration.total_seconds(), Timeline.METHOD_LANE_HEIGHT),
             fill=self.color,
             opacity="0.4",
-            stroke_width="0"))
+            stroke_width="0")
 
     def _svg_text(self):
         """Draws the patch label"""
         x_start = self.xstart + Timeline.X_OFFSET
         textcolor = "black"
 
-        self.svg_timeline.add(self.svg_timeline.text(
+        self.layout.text(
             self.label,
             insert=(x_start, 2 + self._y),
             font_family="sans-serif",
             font_size="8",
             text_anchor="start",
             fill=textcolor,
-            dy="5"))
+            dy="5")
 
     def draw(self):
         """Draws the method's bar from start (stored in the instance) to the end"""
@@ -760,60 +649,44 @@ class PatchBar(object):
 
 class FeatureTypesChart(object):
     @staticmethod
-    def draw_legend(legend):
-        startpos = Timeline.X_OFFSET - 2
-        for key, value in ForkFeatureType.COLOR.items():
-            legend.add(svgwrite.text.TSpan(key.replace("_", " ").capitalize(), insert=None, fill=value[0],
-                x=[startpos], dy=[10]))
-
-        return legend
+    def legend():
+        return [(key, value[0]) for key, value in ForkFeatureType.COLOR.items()]
 
 
 class EventLinesChart(object):
     @staticmethod
-    def draw_legend(legend):
-        startpos = Timeline.X_OFFSET - 2
-        for key, value in EventLine.COLOR.items():
-                legend.add(svgwrite.text.TSpan(key.replace("_", " ").capitalize(), insert=None, fill=value,
-                    x=[startpos], dy=[10]))
-        return legend
+    def legend():
+        return EventLine.COLOR.items()
 
 
 class TimelineDecorations:
-    def __init__(self, svg_timeline, coded_events, participant):
-        self.svg_timeline = svg_timeline
+    """The axes, labels and legend drawn around the sections of a timeline.
+
+    boundaries are the tops of the sections and the bottom of the last one, as given by
+    Section.boundaries."""
+
+    def __init__(self, layout, coded_events, participant, boundaries, window=None):
+        self.layout = layout
         self.coded_events = coded_events
         self.participant = participant
+        self.boundaries = boundaries
+        self.height = boundaries[-1]
+        self.window = window
 
     def draw(self):
 
-        self._draw_x_axis() # The top line
-
-        # These are divisions for EventLine.
-        # self._draw_x_axis(30)
-        # self._draw_x_axis(50)
-        # self._draw_x_axis(110)
-        # self._draw_x_axis(130)
-        # self._draw_x_axis(180)
-        # self._draw_x_axis(200)
-
-        # The line above the Success/Not Success section
-        self._draw_x_axis(Timeline.CHART_HEIGHT - 2 * EventLine.HEIGHT)
-
-        # THe line above the Patches
-        self._draw_x_axis(Timeline.CHART_HEIGHT)
-
-        # THe line above the methods
-        self._draw_x_axis(Timeline.CHART_AND_PATCH_HEIGHT)
-
-        # The bottom line
-        self._draw_x_axis(Timeline.HEIGHT)
+        # The top line, a line above each section after it, and the bottom line
+        for ypos in self.boundaries:
+            self._draw_x_axis(ypos)
 
         self._draw_x_tickmarks()
         self._draw_x_labels()
         self._draw_participant_label()
 
     def _calculate_timeline_duration(self, events):
+        if self.window:
+            return self.window[1] - self.window[0]
+
         start = events[0]
         end = events[-1]
         start_time = start['Time']
@@ -823,10 +696,10 @@ class TimelineDecorations:
     def _draw_x_axis(self, ypos=0):
         duration = self._calculate_timeline_duration(self.coded_events)
 
-        self.svg_timeline.add(self.svg_timeline.line(
+        self.layout.line(
             start=(Timeline.X_OFFSET, Timeline.Y_OFFSET + ypos),
-            end=(Timeline.X_OFFSET + duration.total_seconds(), Timeline.Y_OFFSET + ypos)).
-            stroke(color='black', width=1))
+            end=(Timeline.X_OFFSET + duration.total_seconds(), Timeline.Y_OFFSET + ypos),
+            stroke='black', stroke_width=1)
 
     def _draw_x_tickmarks(self):
         duration = self._calculate_timeline_duration(self.coded_events)
@@ -834,16 +707,15 @@ class TimelineDecorations:
         alternate = 0
         for xpos in range(0, int(ceil(duration.total_seconds())), Timeline.X_GAP):
 
-            tickmark = self.svg_timeline.line(
-                start=(xpos + Timeline.X_OFFSET, Timeline.Y_OFFSET), \
-                end=(xpos + Timeline.X_OFFSET, Timeline.Y_OFFSET + Timeline.HEIGHT),
-                opacity="0.5") \
-                .stroke(color='black', width=1)
-
+            dashes = {}
             if alternate % 2:
-                tickmark.dasharray("3,1")
+                dashes['stroke_dasharray'] = "3,1"
 
-            self.svg_timeline.add(tickmark)
+            self.layout.line(
+                start=(xpos + Timeline.X_OFFSET, Timeline.Y_OFFSET),
+                end=(xpos + Timeline.X_OFFSET, Timeline.Y_OFFSET + self.height),
+                opacity="0.5",
+                stroke='black', stroke_width=1, **dashes)
 
             alternate += 1
 
@@ -852,10 +724,10 @@ class TimelineDecorations:
         minute = 1
         for xpos in range(0, int(ceil(duration.total_seconds())), Timeline.X_LABEL_GAP):
 
-            self.svg_timeline.add(self.svg_timeline.text(minute,
+            self.layout.text(minute,
                 insert=(xpos + Timeline.X_OFFSET, 14),
                 font_family="sans-serif",
-                font_size="14"))
+                font_size="14")
             minute += 1
 
     def _draw_videotime(self):
@@ -864,10 +736,15 @@ class TimelineDecorations:
         ce_index = 0
         for xpos in range(0, int(ceil(duration.total_seconds())), Timeline.X_LABEL_GAP):
             try:
-                self.svg_timeline.add(self.svg_timeline.text(self.coded_events[ce_index]['Time'].strftime(Timeline.TIMELABEL),
-                    insert=(xpos + Timeline.X_OFFSET, Timeline.Y_OFFSET + Timeline.HEIGHT + 20),
+                if self.window:
+                    label_time = self.window[0] + timedelta(0, xpos)
+                else:
+                    label_time = self.coded_events[ce_index]['Time']
+
+                self.layout.text(label_time.strftime(Timeline.TIMELABEL),
+                    insert=(xpos + Timeline.X_OFFSET, Timeline.Y_OFFSET + self.height + 20),
                     font_family="sans-serif",
-                    font_size="14"))
+                    font_size="14")
             except IndexError:
                 pass
 
@@ -878,39 +755,50 @@ class TimelineDecorations:
         self._draw_sessiontime()
 
     def _draw_participant_label(self):
-        self.svg_timeline.add(self.svg_timeline.text("P%02d" % (self.participant),
-            insert=(0, Timeline.Y_OFFSET + Timeline.HEIGHT + 20),
+        self.layout.text("P%02d" % (self.participant),
+            insert=(0, Timeline.Y_OFFSET + self.height + 20),
             font_family="sans-serif",
-            font_size="14"))
+            font_size="14")
 
     def draw_legend(self, legend_types):
-        legend = self.svg_timeline.text("",
-            insert=(0, Timeline.Y_OFFSET),
-            font_family="sans-serif",
-            text_anchor="end",
-            font_size="8")
-
         if legend_types == 'EventLine':
-            legend = EventLinesChart.draw_legend(legend)
+            legend = EventLinesChart.legend()
         elif legend_types == 'FeatureType':
-            legend = FeatureTypesChart.draw_legend(legend)
-
-        self.svg_timeline.add(legend)
+            legend = FeatureTypesChart.legend()
+        else:
+            legend = []
+
+        # One line per entry, right-aligned against the chart
+        ypos = Timeline.Y_OFFSET
+        for key, color in legend:
+            ypos += 10
+            self.layout.text(key.replace("_", " ").capitalize(),
+                insert=(Timeline.X_OFFSET - 2, ypos),
+                font_family="sans-serif",
+                text_anchor="end",
+                font_size="8",
+                fill=color)
 
 
-class Timeline:
+class Timeline(object):
     """The representation of a timeline., including the graphical SVG view.
 
+    The chart is a SectionStack of sections, each drawn in its own group and moved down
+    by the heights of the sections above it. The *_HEIGHT constants are the default
+    heights of the sections.
+
     X_OFFSET: The space of the chart away from the left edge of the screen.
     Y_OFFSET: The space of the chart away from the top of the screen.
-    HEIGHT: The height of the chart.
+    Y_MARGIN: The space below the chart, for the x-axis labels.
     SQUARE_WIDTH: The width of one square
     X_GAP: The gap between tickmarks on x-axis
-    TIMELABEL: The strftime label on x-axis"""
+    TIMELABEL: The strftime label on x-axis
+    COMPRESS_LEVEL: The gzip level of .svgz files"""
     OUTPUT_DIR = "../timeline_forks_data"
     X_MARGIN = 10
     X_OFFSET = 80
     Y_OFFSET = 16
+    Y_MARGIN = 54
 
     CHART_HEIGHT = 220 # The height of the "main" area of the graph.
 
@@ -921,33 +809,112 @@ class Timeline:
     METHOD_LANE_HEIGHT = 10
     METHOD_HEIGHT = METHOD_LANES * METHOD_LANE_HEIGHT
 
-    CHART_AND_PATCH_HEIGHT = CHART_HEIGHT + PATCH_LANE_HEIGHT # If we add more parts of the chart, it's going to need
-                                                              # refactoring so that we can add arbitrary sections.
-
     SQUARE_WIDTH = 30
-    HEIGHT = CHART_HEIGHT + PATCH_LANE_HEIGHT + METHOD_HEIGHT
 
     X_GAP = 30
     X_LABEL_GAP = 60
 
     TIMELABEL = "%M:%S"
 
-    def __init__(self, pid, codedevents_list, commands_list, feature_type_matrix):
+    COMPRESS_LEVEL = 6
+
+    def __init__(self, pid, codedevents_list, commands_list, feature_type_matrix, data=None, window=None, sections=None):
+        """window is an optional (start, end) pair of times. When given, only that stretch
+        of the session is drawn, and the x axis starts at the start of the window.
+
+        sections is the SectionStack to draw, by default Timeline.default_sections()."""
 
-        # One day, break this chart into composable sections.
-        self.sections = []
+        self.sections = sections or Timeline.default_sections()
 
-        self.coded_events = codedevents_list
-        self.commands = commands_list
-        self.feature_type_matrix = feature_type_matrix
+        # (section, top, layout) for each section laid out in this process, in drawing order.
+        self.layers = []
+
+        # The participant's data and its indexes, shared with anything else that queries it.
+        self.data = data or ParticipantData(pid, codedevents_list, commands_list, feature_type_matrix, EventLine.classify)
+
+        self.coded_events = self.data.coded_events
+        self.commands = self.data.commands
+        self.feature_type_matrix = self.data.features
 
         self.pid = pid
-        self.svg_timeline = svgwrite.Drawing(filename = os.path.join(Timeline.OUTPUT_DIR, "%02d-forks.svg" % pid), size=("2220px", "520px"))
+        self.window = window
 
-        self.start_time = self.coded_events[0]['Time']
+        self.height = Timeline.Y_OFFSET + self.sections.height + Timeline.Y_MARGIN
+        if window:
+            self._slice_to_window(*window)
+            self.width = Timeline.X_OFFSET + (window[1] - window[0]).total_seconds() + Timeline.X_MARGIN
+            self.filename = os.path.join(Timeline.OUTPUT_DIR, "%02d-forks-%s.svg" % (pid, window[0].strftime("%M%S")))
+        else:
+            self.width = 2220
+            self.filename = os.path.join(Timeline.OUTPUT_DIR, "%02d-forks.svg" % pid)
 
-        self.visited_methods = VisitedMethods()
+            self.start_time = self.coded_events[0]['Time']
+
+        self._svg_timeline = None
 
+    @property
+    def svg_timeline(self):
+        """The SVG drawing, made on first use, so that timelines only laid out for PNG or JSON
+        don't load svgwrite."""
+        if self._svg_timeline is None:
+            self._svg_timeline = self._new_drawing()
+        return self._svg_timeline
+
+    @svg_timeline.setter
+    def svg_timeline(self, drawing):
+        self._svg_timeline = drawing
+
+    @staticmethod
+    def default_sections():
+        """Feature types and fork outcomes over the foraging background, then patches and methods."""
+        return SectionStack([
+            SectionStack([FeatureTypesSection(), ForkOutcomesSection()], background=ForagingSection()),
+            PatchesSection(),
+            MethodsSection()])
+
+    @staticmethod
+    def live_sections():
+        """The sections of a session that is still going on, with commands in place of feature types."""
+        return SectionStack([
+            SectionStack([CommandEventsSection(), ForkOutcomesSection()], background=ForagingSection()),
+            PatchesSection(),
+            MethodsSection()])
+
+    @staticmethod
+    def density_sections():
+        """The live sections, with a heatmap of commands per kind in place of their lines,
+        and one of method visits per segment below the methods."""
+        return SectionStack([
+            SectionStack([CommandDensitySection(), ForkOutcomesSection()], background=ForagingSection()),
+            PatchesSection(),
+            MethodsSection(),
+            MethodVisitsSection()])
+
+    @staticmethod
+    def from_data(data, window=None, sections=None):
+        """A timeline drawn from an already loaded ParticipantData."""
+        return Timeline(data.pid, data.coded_events, data.commands, data.features, data, window, sections)
+
+    def _new_drawing(self):
+        import svgwrite
+        drawing = svgwrite.Drawing(filename=self.filename, size=("%dpx" % self.width, "%dpx" % self.height))
+        drawing.add_stylesheet("timeline_information_forks.css", title="ift_forks")
+        return drawing
+
+    def _slice_to_window(self, t0, t1):
+        """Keeps only the rows inside [t0, t1), found through the time indexes of the data,
+        and re-bases the x axis to t0.
+
+        The last command before t0 is kept too, so the method being visited when the window
+        opens is drawn from the start of the window."""
+        self.start_time = t0
+        self.coded_events = self.data.segments_between(t0, t1)
+        self.feature_type_matrix = self.data.features_between(t0, t1)
+
+        self.commands = list(self.data.commands_between(t0, t1))
+        lead_in = self.data.command_before(t0)
+        if lead_in:
+            self.commands.insert(0, lead_in)
 
     @staticmethod
     def calculate_x_position(start_time, event_time):
@@ -965,6 +932,13 @@ class Timeline:
         else:
             return False
 
+    def coded_events_start(self):
+        """The x position of the first coded segment drawn."""
+        if self.window and self.coded_events:
+            # The first segment in the window may have started before it.
+            return (self.coded_events[0]['Time'] - self.start_time).total_seconds()
+        return 0
+
     def _aggregate(self):
         """Aggregates some data from one data list into another."""
         pass
@@ -975,137 +949,127 @@ class Timeline:
     def __str__(self):
         return '\n'.join(str(i) for i in self.commands_list)
 
-    def _draw_timeline_decorations(self, legend_type):
-        decorations = TimelineDecorations(self.svg_timeline, self.coded_events, self.pid)
+    def lay_out_decorations(self):
+        """The axes, labels and legend, in a Layout of their own with y = 0 at the top of the drawing."""
+        layout = Layout()
+        decorations = TimelineDecorations(layout, self.coded_events, self.pid, self.sections.boundaries(), self.window)
         decorations.draw()
-        decorations.draw_legend(legend_type)
-
-    def _draw_coded_event(self, event, xpos):
-        square = ForagingSegment(self.svg_timeline, event)
-        square.draw(xpos)
-
-        outcome = ForkOutcomeSegment(self.svg_timeline, event)
-        outcome.draw(xpos)
-
-    def _draw_coded_events(self):
-        xpos = 0
+        decorations.draw_legend(self.sections.legend())
+        return layout
 
-        for event in self.coded_events:
-            self._draw_coded_event(event, xpos)
-            xpos += Timeline.SQUARE_WIDTH
-
-    def _draw_command_event(self, event):
-        line = EventLine(self.svg_timeline, event, self.start_time)
-        line.draw()
-
-    def _draw_overlap(self, xpos):
-        self.svg_timeline.add(self.svg_timeline.line(
-                start=(xpos + Timeline.X_OFFSET, Timeline.Y_OFFSET),
-                end=(xpos + Timeline.X_OFFSET, -5 + Timeline.Y_OFFSET)).
-                stroke(color="black", width=1, opacity=1.0))
-
-    def _draw_command_events(self):
-        event_queue = {}
-        for event in self.commands:
+    def clip_to_window(self, fork_event):
+        """A copy of a patch visit with its start and end clipped to the window."""
+        t0, t1 = self.window
+        return {
+            'Patch': fork_event['Patch'],
+            'Start': max(fork_event['Start'], t0),
+            'End': min(fork_event['End'], t1)}
 
-            event_time = self._lookup_fork_time(event['Forks'])
+    def draw(self):
+        """Converts the textual commands_list to a graphical timeline view in SVG."""
+        self.render()
+        self.save()
+
+    def render(self, processes=None):
+        """Lays the timeline out and adds it to the SVG drawing, without saving it. See
+        lay_out for processes."""
+        self.lay_out(processes)
+        self._emit(SVGEmitter(self.svg_timeline), self.section_layers())
+
+    def _emit(self, emitter, section_layers):
+        emitter.emit(section_layers, self._window_clip())
+        emitter.emit([(0, self.lay_out_decorations())])
+
+    def _window_clip(self):
+        """The rect that segments and bars crossing the edges of the window are cut off at."""
+        if self.window:
+            duration = (self.window[1] - self.window[0]).total_seconds()
+            return (Timeline.X_OFFSET, 0, duration, self.sections.height + Timeline.Y_OFFSET)
+        return None
+
+    def lay_out(self, processes=None):
+        """Lays out every section in its own Layout, with y = 0 at the top of the section.
+
+        With processes, the sections are laid out by that many worker processes, which send
+        back their layouts."""
+        positions = self.sections.positions(Timeline.Y_OFFSET)
+
+        if processes:
+            global _laying_out
+            _laying_out = (self, positions)
+            pool = multiprocessing.Pool(processes)
             try:
-                xpos = Timeline.calculate_x_position(self.start_time, event[''])
-                if xpos in event_queue:
-                    self._draw_overlap(xpos)
-                else:
-                    event_queue[xpos] = event
+                layouts = pool.map(_lay_out_section, range(len(positions)))
+            finally:
+                pool.close()
+                pool.join()
+                _laying_out = None
+        else:
+            layouts = [self._lay_out_section(section) for section, top in positions]
 
-                self._draw_command_event(event)
-            except CommandTooSoonException:
-                pass
+        self.layers = [(section, top, layout) for (section, top), layout in zip(positions, layouts)]
 
-        # Draw everything in the queue
+    def _lay_out_section(self, section):
+        layout = Layout()
+        section.render(self, layout)
+        return layout
 
-    def _draw_featuretype_events(self):
-        event_queue = {}
+    def section_layers(self):
+        """(top, layout) for each section, as the emitters take them."""
+        return [(top, layout) for section, top, layout in self.layers]
 
-        for i in range(0, len(self.feature_type_matrix)):
-            event = self.feature_type_matrix[i]
-            events = []
-            events.append(event)
+    def save(self, filename=None, level=COMPRESS_LEVEL):
+        """Writes the SVG to filename, by default self.filename. A filename ending in .svgz
+        is gzipped at level as it is written. See save_svg."""
+        save_svg(self.svg_timeline, filename or self.filename, level)
 
-            try:
-                event['Time'] = self._lookup_fork_time(event["Fork"])
-                xpos = Timeline.calculate_x_position(self.start_time, event['Time'])
+    def save_layout(self, filename):
+        """Writes the layout of the sections and the decorations as JSON. See JSONEmitter."""
+        layers = self.section_layers() + [(0, self.lay_out_decorations())]
+        JSONEmitter(self.width, self.height).save(layers, filename)
 
-                if event['Order'] == 1:
-                    next = self.feature_type_matrix[i + 1]
-                    while event['Fork'] == next['Fork'] \
-                        and event['Order'] < next['Order']:
-                        events.append(next)
-                        i += 1
-                        next = self.feature_type_matrix[i + 1]
+    def save_png(self, filename, scale=0.5, markers=False):
+        """Writes a PNG thumbnail of the laid out timeline, scale times its size. See PNGEmitter."""
+        emitter = PNGEmitter(self.width, self.height, scale, markers)
+        self._emit(emitter, self.section_layers())
+        emitter.save(filename)
 
-                    self._draw_featuretype_event(events, xpos)
+    def extend(self, coded_events, commands):
+        """Appends rows that were added to the session since the timeline was last laid out,
+        and lays out only those rows."""
+        for section, top, layout in self.layers:
+            section.extend(self, layout, coded_events, commands)
 
-            except CommandTooSoonException:
-                print "Command Too Soon!"
-                pass
-            except IndexError:
-                pass
+        self.data.extend(coded_events, commands)
 
-    def _draw_featuretype_event(self, events, xpos):
-        line = ForkFeatureType(self.svg_timeline, events, self.start_time)
-        line.draw()
+    def save_live(self):
+        """Saves the timeline of a session that is still going on.
 
-    def _draw_patches(self):
-        lane = 0
-        for fork_event in self.feature_type_matrix:
-            patch_bar = PatchBar(self.svg_timeline, fork_event, lane % Timeline.PATCH_LANES, self.start_time, Timeline.CHART_HEIGHT)
-            patch_bar.draw()
-            lane += 1
+        The sections lay out what only holds until more rows come in, such as the open
+        method bar, in layouts of their own. Those and the decorations are laid out again
+        for every save, and the drawing is emitted anew."""
+        layers = self.section_layers()
+        for section, top, layout in self.layers:
+            live = Layout()
+            section.render_live(self, live)
+            if len(live):
+                layers.append((top, live))
 
+        self.svg_timeline = self._new_drawing()
+        self._emit(SVGEmitter(self.svg_timeline), layers)
+        self.save()
 
-    def _event_at_session_start(self, event):
-        ev_start_at_session = event
-        ev_start_at_session['Time'] = self.start_time
-        return ev_start_at_session
 
-    def _draw_methods(self):
-        start_event = None
-        
-        for event in self.commands:
-            if 'error' not in event:
-                if self.before_start(event):
-                    start_event = MethodBar(self.svg_timeline, self._event_at_session_start(event), self.start_time, Timeline.CHART_AND_PATCH_HEIGHT, self.visited_methods)
-                else:
-                    if not start_event:
-                        start_event = MethodBar(self.svg_timeline, event, self.start_time, Timeline.CHART_AND_PATCH_HEIGHT, self.visited_methods)
+# The timeline and sections that the worker processes of Timeline.lay_out lay out.
+# Workers are forked, so they find them here instead of having them pickled to them.
+_laying_out = None
 
-                    if not start_event.same_method(event):
-                        self.visited_methods = start_event.draw(event)
-                        start_event = MethodBar(self.svg_timeline, event, self.start_time, Timeline.CHART_AND_PATCH_HEIGHT, self.visited_methods)
 
-        # Draw the final event
-        if 'error' not in event:
-            self.visited_methods = start_event.draw(event)
+def _lay_out_section(i):
+    timeline, positions = _laying_out
+    section, top = positions[i]
+    return timeline._lay_out_section(section)
 
-    def _lookup_fork_time(self, fork_index):
-        try:
-            return self.coded_events[fork_index]['Time']
-        except IndexError, e:
-            print len(self.coded_events)
-            print fork_index
-            raise e
-
-    def draw(self):
-        """Converts the textual commands_list to a graphical timeline view in SVG."""
-        self._draw_coded_events()
-        #self._draw_command_events()
-        self._draw_featuretype_events()
-        self._draw_patches()
-        self._draw_methods()
-        self._draw_timeline_decorations("FeatureType")
-
-        self.svg_timeline.add_stylesheet("timeline_information_forks.css", title="ift_forks")
-        self.svg_timeline.save()
-        
 
 class VisitedMethods:
     """Keeps track of methods visited so far for this participant and assigns them different
@@ -1148,11 +1112,539 @@ class VisitedMethods:
         self.methods[method_name] = m
 
 
+class Section(object):
+    """A horizontal band of the timeline, drawn with y = 0 at its own top.
+
+    Sections don't know what is above or below them: Timeline.lay_out lays out each one
+    into its own Layout, and the emitters move it into place. HEIGHT is the default
+    height, and LEGEND the legend drawn for the section, if any."""
+    HEIGHT = 0
+    LEGEND = None
+
+    def __init__(self, height=None):
+        self.height = self.HEIGHT if height is None else height
+
+    def positions(self, top=0):
+        """(section, top) for every section to lay out, in drawing order."""
+        return [(self, top)]
+
+    def boundaries(self, top=0):
+        """The y of the top of each band, and of the bottom of the last one."""
+        return [top, top + self.height]
+
+    def legend(self):
+        return self.LEGEND
+
+    def render(self, timeline, layout):
+        raise NotImplementedError
+
+    def extend(self, timeline, layout, coded_events, commands):
+        """Lays out rows appended to the session after it was rendered."""
+        pass
+
+    def render_live(self, timeline, layout):
+        """Lays out what only holds until more rows are appended. See Timeline.save_live."""
+        pass
+
+
+class SectionStack(Section):
+    """Sections stacked from top to bottom. The background, if any, is drawn behind them
+    and as high as all of them together."""
+
+    def __init__(self, sections, background=None):
+        Section.__init__(self, sum(s.height for s in sections))
+        self.sections = sections
+        self.background = background
+        if background:
+            background.height = self.height
+
+    def positions(self, top=0):
+        positions = self.background.positions(top) if self.background else []
+        for section in self.sections:
+            positions.extend(section.positions(top))
+            top += section.height
+        return positions
+
+    def boundaries(self, top=0):
+        boundaries = [top]
+        for section in self.sections:
+            boundaries.extend(section.boundaries(top)[1:])
+            top += section.height
+        return boundaries
+
+    def legend(self):
+        for section in self.sections:
+            if section.legend():
+                return section.legend()
+        return None
+
+
+class CodedEventsSection(Section):
+    """Draws a SEGMENT for each coded segment, one SQUARE_WIDTH after the other."""
+    SEGMENT = None
+
+    def _draw(self, layout, coded_events, xpos):
+        for event in coded_events:
+            self.SEGMENT(layout, event, self).draw(xpos)
+            xpos += Timeline.SQUARE_WIDTH
+
+    def render(self, timeline, layout):
+        self._draw(layout, timeline.coded_events, timeline.coded_events_start())
+
+    def extend(self, timeline, layout, coded_events, commands):
+        self._draw(layout, coded_events, len(timeline.coded_events) * Timeline.SQUARE_WIDTH)
+
+
+class ForagingSection(CodedEventsSection):
+    HEIGHT = Timeline.CHART_HEIGHT
+    SEGMENT = ForagingSegment
+
+
+class ForkOutcomesSection(CodedEventsSection):
+    HEIGHT = EventLine.HEIGHT * 2
+    SEGMENT = ForkOutcomeSegment
+
+
+class FeatureTypesSection(Section):
+    """A lane per feature type, with a line in each segment where a feature of the type was seen."""
+    HEIGHT = Timeline.CHART_HEIGHT - EventLine.HEIGHT * 2
+    LEGEND = 'FeatureType'
+
+    def render(self, timeline, layout):
+        features = timeline.feature_type_matrix
+        segments = timeline.data.feature_segments(features)
+
+        # The features of a fork are drawn together: one of Order 1, then the ones of the
+        # same fork right after it.
+        i = 0
+        while i < len(features):
+            j = i + 1
+            if features[i]['Order'] == 1:
+                while j < len(features) and features[j]['Fork'] == features[i]['Fork'] \
+                    and features[j]['Order'] > features[i]['Order']:
+                    j += 1
+
+                if segments[i] >= 0:
+                    segment_time = timeline.data.coded_events[segments[i]]['Time']
+                    ForkFeatureType(layout, [features[k] for k in range(i, j)], timeline.start_time, segment_time).draw()
+            i = j
+
+
+class CommandEventsSection(Section):
+    """A lane per kind of command, with a line where commands of the kind happened. See EventLine.
+
+    Commands that land in the same pixel column are drawn as one line per kind, and the
+    column gets a marker above the section, as tall as the number of commands in it beyond
+    the first, up to OVERLAP_HEIGHT."""
+    HEIGHT = Timeline.CHART_HEIGHT - EventLine.HEIGHT * 2
+    LEGEND = 'EventLine'
+    OVERLAP_HEIGHT = 5
+
+    def __init__(self, height=None):
+        Section.__init__(self, height)
+        self._reset()
+
+    def _reset(self):
+        self.lines = set()
+        self.columns = Counter()
+
+        # The number of commands in each column when its marker was last laid out for good.
+        self.marked = {}
+
+    def render(self, timeline, layout):
+        self._reset()
+        self.extend(timeline, layout, [], timeline.commands)
+        self._draw_overlaps(layout, self.columns)
+        self.marked = dict(self.columns)
+
+    def extend(self, timeline, layout, coded_events, commands):
+        placed = EventLine.place(commands, timeline.start_time)
+        self.columns.update(xpos for xpos, kind in placed)
+        for line in placed:
+            if line not in self.lines:
+                self.lines.add(line)
+                EventLine.draw_line(layout, *line)
+
+    def render_live(self, timeline, layout):
+        # The markers are opaque, so a taller one drawn over an old one hides it.
+        self._draw_overlaps(layout, [x for x, n in self.columns.iteritems() if self.marked.get(x) != n])
+
+    def _draw_overlaps(self, layout, columns):
+        for xpos in sorted(columns):
+            overlaps = self.columns[xpos] - 1
+            if overlaps > 0:
+                layout.line(
+                    start=(xpos + Timeline.X_OFFSET, 0),
+                    end=(xpos + Timeline.X_OFFSET, -min(overlaps, CommandEventsSection.OVERLAP_HEIGHT)),
+                    stroke="black", stroke_width=1)
+
+
+class CommandDensitySection(Section):
+    """A heatmap lane per kind of command, in the lanes of EventLine: the number of commands
+    of the kind in each bin of bin_seconds, in the kind's color, paler for fewer commands.
+
+    ramp gives the strength of the color for a count: that of the first (limit, strength)
+    with count <= limit, or with limit None. Strength 0 is left blank. Runs of bins of the
+    same color are drawn as one rect, so a lane has at most a rect per change of color,
+    however many commands it holds."""
+    HEIGHT = CommandEventsSection.HEIGHT
+    LEGEND = 'EventLine'
+    BIN_SECONDS = 5
+    RAMP = [(0, 0.0), (1, 0.2), (3, 0.4), (10, 0.7), (None, 1.0)]
+
+    def __init__(self, height=None, bin_seconds=BIN_SECONDS, ramp=RAMP):
+        Section.__init__(self, height)
+        self.bin_seconds = bin_seconds
+        self.ramp = ramp
+        self._reset()
+
+    def _reset(self):
+        # The number of commands in each (kind, bin), and those counts when last rendered.
+        self.counts = Counter()
+        self.drawn = Counter()
+
+    def _fill(self, kind, count):
+        for limit, strength in self.ramp:
+            if limit is None or count <= limit:
+                break
+        if not strength:
+            return None
+        # Blended with the white background, so that a redrawn bin hides the old one.
+        return '#%02x%02x%02x' % tuple(int(round(255 + (c - 255) * strength)) for c in parse_color(EventLine.COLOR[kind]))
+
+    def _draw_run(self, layout, kind, first, last, fill):
+        if fill:
+            top, lane = EventLine.LANE[kind]
+            layout.rect(
+                insert=(Timeline.X_OFFSET + first * self.bin_seconds, (lane - 1) * EventLine.HEIGHT),
+                size=((last - first + 1) * self.bin_seconds, EventLine.HEIGHT),
+                fill=fill)
+
+    def _draw_bins(self, layout, counts):
+        run = None # [kind, first bin, last bin, fill]
+        for kind, i in sorted(counts):
+            fill = self._fill(kind, counts[kind, i])
+            if run and run[0] == kind and run[2] == i - 1 and run[3] == fill:
+                run[2] = i
+            else:
+                if run:
+                    self._draw_run(layout, *run)
+                run = [kind, i, i, fill]
+        if run:
+            self._draw_run(layout, *run)
+
+    def render(self, timeline, layout):
+        self._reset()
+        self.extend(timeline, layout, [], timeline.commands)
+        self._draw_bins(layout, self.counts)
+        self.drawn = Counter(self.counts)
+
+    def extend(self, timeline, layout, coded_events, commands):
+        self.counts.update((kind, int(xpos // self.bin_seconds)) for xpos, kind in EventLine.place(commands, timeline.start_time))
+
+    def render_live(self, timeline, layout):
+        self._draw_bins(layout, dict((key, n) for key, n in self.counts.iteritems() if self.drawn[key] != n))
+
+
+class MethodVisitsSection(Section):
+    """A lane with a cell per coded segment, darker for more method visits started in it.
+    See SegmentTable.visits.
+
+    ramp gives the fill for a number of visits: that of the first (limit, fill) with
+    visits <= limit, or with limit None. Cells are opaque, so that one drawn again when
+    more rows come in hides the old one."""
+    HEIGHT = EventLine.HEIGHT
+    RAMP = [(0, 'white'), (2, '#d9d9d9'), (5, '#a6a6a6'), (10, '#6e6e6e'), (None, '#333333')]
+
+    def __init__(self, height=None, ramp=RAMP):
+        Section.__init__(self, height)
+        self.ramp = ramp
+        self.drawn = []
+
+    def _fill(self, visits):
+        for limit, fill in self.ramp:
+            if limit is None or visits <= limit:
+                return fill
+
+    def _draw_cells(self, timeline, layout, segments):
+        table = timeline.data.segment_table()
+        first = (timeline.data.coded_events[0]['Time'] - timeline.start_time).total_seconds()
+        end = (timeline.window[1] - timeline.window[0]).total_seconds() if timeline.window else None
+        for i in segments:
+            xpos = first + table.seconds[i]
+            if xpos + Timeline.SQUARE_WIDTH <= 0 or (end is not None and xpos >= end):
+                continue
+            layout.rect(
+                insert=(xpos + Timeline.X_OFFSET, 0),
+                size=(Timeline.SQUARE_WIDTH, self.height),
+                fill=self._fill(table.visits[i]),
+                stroke_width="0")
+
+    def render(self, timeline, layout):
+        if not timeline.data.coded_events:
+            self.drawn = []
+            return
+        self.drawn = list(timeline.data.segment_table().visits)
+        self._draw_cells(timeline, layout, range(len(self.drawn)))
+
+    def render_live(self, timeline, layout):
+        if not timeline.data.coded_events:
+            return
+        visits = timeline.data.segment_table().visits
+        self._draw_cells(timeline, layout,
+            [i for i, n in enumerate(visits) if i >= len(self.drawn) or self.drawn[i] != n])
+
+
+class PatchesSection(Section):
+    HEIGHT = Timeline.PATCH_LANE_HEIGHT
+
+    def render(self, timeline, layout):
+        lane = 0
+        for fork_event in timeline.feature_type_matrix:
+            if timeline.window:
+                fork_event = timeline.clip_to_window(fork_event)
+            patch_bar = PatchBar(layout, fork_event, lane % Timeline.PATCH_LANES, timeline.start_time, 0)
+            patch_bar.draw()
+            lane += 1
+
+
+class MethodsSection(Section):
+    """A bar for each visit to a method, in the method's lane."""
+    HEIGHT = Timeline.METHOD_HEIGHT
+
+    def __init__(self, height=None):
+        Section.__init__(self, height)
+        self._reset()
+
+    def _reset(self):
+        self.visited_methods = VisitedMethods()
+
+        # The method bar that the most recent command is still inside of, and that command.
+        self.open_method = None
+        self.last_command = None
+
+    def _event_at_session_start(self, event, timeline):
+        """A copy of an event that happened before the session, moved to its start."""
+        moved = Command.from_record(OrderedDict(event.record))
+        moved.record['Time'] = timeline.start_time
+        return moved
+
+    def extend(self, timeline, layout, coded_events, commands):
+        """Draws the method bars that the given commands close. The bar of the method that
+        the last command is in stays open, so later commands can continue it."""
+        for event in commands:
+            if timeline.before_start(event):
+                self.open_method = MethodBar(layout, self._event_at_session_start(event, timeline), timeline.start_time, 0, self.visited_methods)
+            else:
+                if not self.open_method:
+                    self.open_method = MethodBar(layout, event, timeline.start_time, 0, self.visited_methods)
+
+                if not self.open_method.same_method(event):
+                    self.visited_methods = self.open_method.draw(event)
+                    self.open_method = MethodBar(layout, event, timeline.start_time, 0, self.visited_methods)
+
+            self.last_command = event
+
+    def _close(self, timeline):
+        # Draw the final event
+        if self.open_method:
+            end = self.last_command
+            if timeline.window:
+                # The method is still being visited when the window closes.
+                end = {'Time': timeline.window[1]}
+            self.visited_methods = self.open_method.draw(end)
+
+    def render(self, timeline, layout):
+        # Only extend carries the bars over from earlier calls; a render starts afresh.
+        self._reset()
+        self.extend(timeline, layout, [], timeline.commands)
+        self._close(timeline)
+
+    def render_live(self, timeline, layout):
+        if self.open_method:
+            bar = copy.copy(self.open_method)
+            bar.layout = layout
+            bar.visited_methods = copy.deepcopy(self.visited_methods)
+            bar.draw(self.last_command)
+
+
+class TimelineWatcher(object):
+    """Watches a participant's commands and coded files while the session is still running,
+    and grows their timeline from the rows appended since the last poll.
+
+    The SVG is rewritten at most once per poll_interval seconds, and only when new rows came in."""
+    POLL_INTERVAL = 1.0
+
+    def __init__(self, pid, poll_interval=POLL_INTERVAL):
+        self.pid = pid
+        self.poll_interval = poll_interval
+        self.report = ParseReport()
+
+        self.commands = TailReader(DataLoader.commands(pid), 2, len(Command.FIELDS)) # Header and start timestamp
+        self.coded = TailReader(DataLoader.codedevents(pid), 2) # Two header rows
+
+        self.timeline = None
+        self.pending_commands = []
+
+    def poll(self):
+        """Parses the appended rows into the timeline. Returns True if anything was added."""
+        rows, line_numbers = self.coded.read_rows()
+        coded_events = CodedEvent.parse_rows(rows, line_numbers, self.report)
+        rows, line_numbers = self.commands.read_rows()
+        commands = self.pending_commands + Command.parse_rows(rows, line_numbers, self.report, DataLoader.CODES)
+
+        if self.timeline is not None and not coded_events and not commands:
+            return False
+
+        if self.timeline is None:
+            if not coded_events:
+                # The timeline starts at the first coded segment, so hold commands until then.
+                self.pending_commands = commands
+                return False
+
+            self.timeline = Timeline(self.pid, coded_events, [], [], sections=Timeline.live_sections())
+            self.timeline.lay_out()
+            coded_events = []
+            self.pending_commands = []
+
+        self.timeline.extend(coded_events, commands)
+        return True
+
+    def run(self):
+        while True:
+            if self.poll():
+                self.timeline.save_live()
+            time.sleep(self.poll_interval)
+
+
+class LoadedParticipant(object):
+    """A participant's data, or the error that stopped it from loading, and the reports of
+    the rows that could not be parsed."""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.data = None
+        self.error = None
+        self.reports = [
+            ParseReport(DataLoader.codedevents(pid)),
+            ParseReport(DataLoader.commands(pid)),
+            ParseReport(DataLoader.feature_types())]
+
+    def load(self):
+        try:
+            self.data = ParticipantData(self.pid,
+                DataLoader.load_codedevents(self.pid, self.reports[0]),
+                DataLoader.load_commands(self.pid, self.reports[1]),
+                DataLoader.load_feature_types(self.pid, self.reports[2]),
+                EventLine.classify)
+        except Exception, e:
+            self.error = e
+        return self
+
+
+class BatchRenderer(object):
+    """Renders the timelines of many participants, reading the next participants' files while
+    the current one is drawn.
+
+    One loader thread reads and parses up to prefetch participants ahead, through a bounded
+    queue. With writer, another thread saves the SVGs while the next one is drawn. Timelines
+    are drawn in the order given, and all messages are printed from the calling thread in
+    that order, so the output is the same as a plain loop.
+
+    extension is '.svg' or '.svgz'; .svgz files are gzipped at level as they are written.
+    sections makes the sections of each timeline, such as Timeline.density_sections."""
+
+    def __init__(self, participants, prefetch=1, writer=False, extension='.svg', level=Timeline.COMPRESS_LEVEL,
+            sections=Timeline.default_sections):
+        self.participants = participants
+        self.sections = sections
+        self.prefetch = prefetch
+        self.writer = writer
+        self.extension = extension
+        self.level = level
+        self.errors = {}
+
+    def _load_all(self, loaded):
+        for p in self.participants:
+            loaded.put(LoadedParticipant(p).load())
+
+    def _save_all(self, rendered):
+        while True:
+            timeline = rendered.get()
+            if timeline is None:
+                break
+            self._try_save(timeline)
+
+    def _try_save(self, timeline):
+        try:
+            self._save(timeline)
+        except Exception, e:
+            self.errors[timeline.pid] = e
+
+    def _save(self, timeline):
+        timeline.save(os.path.splitext(timeline.filename)[0] + self.extension, self.level)
+
+    def _report(self, participant):
+        print "Participant %d" % participant.pid
+        for report in participant.reports:
+            if len(report):
+                print str(report)
+        if participant.error:
+            print "Could not load P%02d: %s" % (participant.pid, participant.error)
+
+    def run(self):
+        """Renders and saves every participant, and returns the errors that stopped any of
+        them, by participant. A participant that fails doesn't stop the others."""
+        loaded = Queue.Queue(self.prefetch)
+        loader = threading.Thread(target=self._load_all, args=(loaded,))
+        loader.daemon = True
+        loader.start()
+
+        if self.writer:
+            rendered = Queue.Queue(self.prefetch)
+            writer = threading.Thread(target=self._save_all, args=(rendered,))
+            writer.daemon = True
+            writer.start()
+
+        reported = set()
+        for p in self.participants:
+            participant = loaded.get()
+            self._report(participant)
+            if participant.error:
+                self.errors[p] = participant.error
+                reported.add(p)
+                continue
+
+            try:
+                timeline = Timeline.from_data(participant.data, sections=self.sections())
+                timeline.render()
+            except Exception, e:
+                print "Could not render P%02d: %s" % (p, e)
+                self.errors[p] = e
+                reported.add(p)
+                continue
+
+            if self.writer:
+                rendered.put(timeline)
+            else:
+                self._try_save(timeline)
+
+        if self.writer:
+            rendered.put(None)
+            writer.join()
+
+        # Report the saves that failed in participant order, whichever finished first.
+        for pid in self.participants:
+            if pid in self.errors and pid not in reported:
+                print "Could not save P%02d: %s" % (pid, self.errors[pid])
+
+        return self.errors
+
+
 if __name__ == "__main__":
-    participants = [2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12] # P11 has incomplete commands data
-    #participants = [7]
+    from events import PARTICIPANTS
 
-    for p in participants:
-        print "Participant %d" % p
-        t = Timeline(p, DataLoader.load_codedevents(p), DataLoader.load_commands(p), DataLoader.load_feature_types(p))
-        t.draw()
\ No newline at end of file
+    if len(sys.argv) == 3 and sys.argv[1] == "--watch":
+        TimelineWatcher(int(sys.argv[2])).run()
+    else:
+        BatchRenderer(PARTICIPANTS, prefetch=2, writer=True).run()